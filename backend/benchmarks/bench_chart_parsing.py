@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Chart page parsing throughput and event-loop responsiveness
+
+Parses the saved Melon, Genie and Bugs pages in ``tests/fixtures/charts``
+(whose parsing is checked by tests/test_chart_scraper.py): measures pages
+per second parsed inline versus through ChartScraper's process pool at
+each worker count, and the longest event-loop stall while a batch of
+pages is parsed each way. Finally scrapes the pages from the local stub
+upstream, fetching over HTTP as a refresh would.
+
+    python benchmarks/bench_chart_parsing.py --pages 60 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.chart_scraper import CHART_LAYOUTS, ChartScraper, parse_chart
+from stub_upstream import CHART_FIXTURES, StubUpstream
+
+
+def _load_fixtures():
+    fixtures = {}
+    for chart in CHART_LAYOUTS:
+        with open(os.path.join(CHART_FIXTURES, f"{chart}.html"), "rb") as f:
+            fixtures[chart] = f.read()
+    return fixtures
+
+
+async def _max_stall(work) -> tuple:
+    """Run ``work`` while a 1 ms ticker measures how late the loop wakes it"""
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - start - 0.001)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    done = True
+    await task
+    return elapsed, stall
+
+
+async def run(args, fixtures) -> list:
+    pages = [(chart, fixtures[chart], "utf-8") for chart in list(fixtures) * (args.pages // len(fixtures) + 1)][:args.pages]
+    rows = []
+
+    async def inline():
+        for page in pages:
+            parse_chart(*page)
+
+    elapsed, stall = await _max_stall(inline)
+    rows.append(("inline", len(pages) / elapsed, stall))
+
+    for workers in args.workers:
+        scraper = ChartScraper(workers)
+        try:
+            # Worker start-up is paid once per process, not per refresh
+            await scraper.parse_many(pages[:workers])
+            elapsed, stall = await _max_stall(lambda: scraper.parse_many(pages))
+        finally:
+            scraper.shutdown()
+        rows.append((f"pool x{workers}", len(pages) / elapsed, stall))
+    return rows
+
+
+async def scrape_from_stub(fixtures) -> tuple:
+    import aiohttp
+
+    stub = await StubUpstream().start()
+    scraper = ChartScraper(1)
+    try:
+        async with aiohttp.ClientSession() as session:
+            await scraper.scrape(session, {chart: stub.chart_url(chart) for chart in fixtures})
+            start = time.perf_counter()
+            results = await scraper.scrape(session, {chart: stub.chart_url(chart) for chart in fixtures})
+            elapsed = time.perf_counter() - start
+    finally:
+        scraper.shutdown()
+        await stub.stop()
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    fixtures = _load_fixtures()
+
+    print(f"{os.cpu_count()} CPUs, {args.pages} pages")
+    print(f"{'mode':10s} {'pages/s':>9s} {'max loop stall ms':>18s}")
+    for mode, rate, stall in asyncio.run(run(args, fixtures)):
+        print(f"{mode:10s} {rate:9.1f} {stall * 1000:18.1f}")
+
+    results, elapsed = asyncio.run(scrape_from_stub(fixtures))
+    entries = sum(len(result) for result in results.values() if isinstance(result, list))
+    errors = sum(isinstance(result, Exception) for result in results.values())
+    print(f"stub scrape: {len(results)} charts, {entries} entries, {errors} errors in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the data collectors
+
+Runs the simulated collectors (charts, brand, trends, social) against two
+synthetic rosters, one ``--ratio`` times larger than the other, and records
+peak traced memory with tracemalloc. Collectors stream idols in batches and
+commit per batch, so the peak should stay roughly flat as the roster grows;
+tests/test_collector_memory.py enforces that bound on small rosters.
+
+    python benchmarks/bench_collector_memory.py --idols 100000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from synthetic_data import generate_dataset
+from models import DataSource
+from services.data_collector import DataCollectorService
+from services.refresh_telemetry import SourceTelemetry
+
+SOURCES = ("Chart Scraper", "Brand Reputation Scraper", "Trend Analysis", "Instagram Graph API")
+
+
+def measure(database_url: str, batch_size: int) -> int:
+    """Peak traced bytes while every simulated collector runs once"""
+    session_factory = sessionmaker(bind=create_engine(database_url))
+    collector = DataCollectorService()
+    collector.idol_batch_size = batch_size
+    collector.rate_limit_interval = 0
+
+    db = session_factory()
+    try:
+        sources = db.query(DataSource).filter(DataSource.name.in_(SOURCES)).all()
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        for source in sources:
+            stats = SourceTelemetry(source.name, source.type)
+            if source.type == "api":
+                asyncio.run(collector._collect_from_api(db, source, stats))
+            else:
+                asyncio.run(collector._collect_from_scraping(db, source, stats))
+            if stats.errors_by_type:
+                raise RuntimeError(f"{source.name}: {stats.last_error}")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idols", type=int, default=100000, help="Size of the large roster")
+    parser.add_argument("--ratio", type=int, default=10, help="Large roster size / small roster size")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    peaks = {}
+    with tempfile.TemporaryDirectory(prefix="kpop-memory-") as tmpdir:
+        for idols in (args.idols // args.ratio, args.idols):
+            database_url = f"sqlite:///{os.path.join(tmpdir, f'roster-{idols}.db')}"
+            generate_dataset(
+                database_url,
+                groups=max(1, idols // 10),
+                idols=idols,
+                metrics=0,
+                trend_rows=0,
+                verbose=False
+            )
+            peaks[idols] = measure(database_url, args.batch_size)
+            print(f"{idols:>9} idols: peak {peaks[idols] / 2 ** 20:8.1f} MiB "
+                  f"({peaks[idols] / idols:8.1f} B/idol)")
+
+    small, large = (peaks[idols] for idols in sorted(peaks))
+    growth = large / small
+    print(f"growth: {growth:.2f}x for a {args.ratio}x larger roster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+In-memory leaderboard read latency and memory footprint
+
+Publishes a ranking snapshot for a synthetic roster, then checks that
+pages served from the in-memory leaderboard encode to exactly the same
+JSON as the database query path for a spread of pages and filters.
+Reports the time to load a snapshot, the latency of a page read from
+memory (uncached and cached) against the database path, and the memory
+the leaderboards hold, scaled to 100k rows. Fails on any mismatch.
+
+    python benchmarks/bench_leaderboard.py --idols 100000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Far enough ahead that ``as_of`` resolves the latest snapshot through the database
+FUTURE = datetime(2999, 1, 1)
+
+
+def _median_us(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def _pages(db):
+    from models import Group, Idol
+
+    group = db.query(Group.name).join(Idol, Idol.group_id == Group.id).first()
+    gender = db.query(Idol.gender).filter(Idol.gender.isnot(None)).first()
+    pages = [
+        {"limit": 100, "offset": 0},
+        {"limit": 20, "offset": 1000},
+        {"limit": 50, "offset": 10 ** 9},
+        {"limit": 0, "offset": 0},
+        {"limit": 100, "offset": 0, "gender": gender[0] if gender else None},
+        {"limit": 100, "offset": 5, "group": group[0] if group else None},
+        {"limit": 100, "offset": 0, "group": "no such group"},
+    ]
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idols", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kpop-leaderboard-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'leaderboard.db')}"
+        os.environ["DATABASE_URL"] = database_url
+
+        from synthetic_data import generate_dataset
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        generate_dataset(database_url, groups=max(1, args.idols // 10), idols=args.idols,
+                         metrics=args.idols * 2, trend_rows=args.idols, verbose=False)
+        session_factory = sessionmaker(bind=create_engine(database_url))
+
+        from serializers import dumps
+        from services.data_collector import DataCollectorService
+        from services.leaderboard import LeaderboardStore
+        from services.ranking_service import RankingService
+        from services.scoring_engine import CATEGORY_COLUMNS
+
+        db = session_factory()
+        try:
+            result = DataCollectorService().update_rankings(db)
+            if result["status"] != "success":
+                print(f"FAIL: ranking update: {result}")
+                sys.exit(1)
+            version = result["version"]
+            service = RankingService()
+
+            store = LeaderboardStore()
+            start = time.perf_counter()
+            rows = store.publish(db, version, CATEGORY_COLUMNS)
+            load_seconds = time.perf_counter() - start
+
+            # Memory held by a second store, loaded on its own under tracemalloc
+            tracemalloc.start()
+            measured = LeaderboardStore()
+            measured.publish(db, version, CATEGORY_COLUMNS)
+            held, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del measured
+            service._leaderboards = store
+
+            failures = []
+            for category in CATEGORY_COLUMNS:
+                for page in _pages(db):
+                    served = service.get_current_rankings(db, category=category, **page)
+                    queried = service.get_current_rankings(db, category=category, as_of=FUTURE, **page)
+                    if dumps(served) != dumps(queried):
+                        failures.append(f"{category} {page}: {len(served)} rows differ from the database path")
+
+            board = store.get(db, "overall", lambda: version)
+            memory_us = _median_us(lambda: board.page(100, 0), args.repeat)
+            cached_us = _median_us(lambda: service.get_current_rankings(db, limit=100), args.repeat)
+
+            def database_read():
+                service.cache.clear()
+                service.get_current_rankings(db, limit=100, as_of=FUTURE)
+
+            database_us = _median_us(database_read, max(10, args.repeat // 10))
+        finally:
+            db.close()
+
+    print(f"{len(CATEGORY_COLUMNS)} categories, {rows} rows ({args.idols} idols), loaded in {load_seconds * 1000:.0f} ms")
+    print(f"memory held: {held / 2 ** 20:.1f} MiB, {held / rows:.0f} B/row, "
+          f"{held / rows * 100000 / 2 ** 20:.1f} MiB per 100k rows")
+    print(f"{'read (limit=100)':28s} {'median us':>10s}")
+    print(f"{'in-memory page':28s} {memory_us:10.1f}")
+    print(f"{'in-memory page, cached':28s} {cached_us:10.1f}")
+    print(f"{'database query':28s} {database_us:10.1f}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Fan-out benchmark for /api/rankings/stream
+
+Starts the API in a uvicorn subprocess (one worker) on a synthetic
+database, opens ``--clients`` concurrent SSE connections, publishes a new
+ranking snapshot and measures how long each client takes to receive the
+diff. Fails if any client misses it within ``--timeout`` seconds.
+
+    python benchmarks/bench_ranking_stream.py --clients 2000
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_for_server(session, url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not start")
+
+
+async def _client(session, url: str, connected: asyncio.Event, ready: list, received: dict, index: int):
+    """Read SSE events until the first ``rankings`` event arrives"""
+    async with session.get(url, timeout=None) as response:
+        event = None
+        async for line in response.content:
+            line = line.decode().rstrip("\n")
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "hello":
+                    ready.append(index)
+                    if len(ready) == connected.target:
+                        connected.set()
+                elif event in ("rankings", "resync"):
+                    received[index] = (time.perf_counter(), event, len(line))
+                    return
+
+
+async def run(args, base_url: str, database_url: str) -> dict:
+    import aiohttp
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from services.data_collector import DataCollectorService
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await _wait_for_server(session, f"{base_url}/")
+
+        connected = asyncio.Event()
+        connected.target = args.clients
+        ready, received = [], {}
+        url = f"{base_url}/api/rankings/stream?category=overall"
+        tasks = [
+            asyncio.create_task(_client(session, url, connected, ready, received, i))
+            for i in range(args.clients)
+        ]
+        await asyncio.wait_for(connected.wait(), timeout=args.timeout)
+
+        # Publish from this process, as a cron refresh or another worker would
+        session_factory = sessionmaker(bind=create_engine(database_url))
+        db = session_factory()
+        try:
+            result = await asyncio.to_thread(DataCollectorService().update_rankings, db)
+        finally:
+            db.close()
+        published = time.perf_counter()
+        if result["status"] != "success":
+            raise RuntimeError(result.get("message"))
+
+        done, pending = await asyncio.wait(tasks, timeout=args.timeout + args.poll_interval)
+        for task in pending:
+            task.cancel()
+
+    latencies = sorted(at - published for at, _, _ in received.values())
+    events = {event for _, event, _ in received.values()}
+    return {
+        "clients": args.clients,
+        "received": len(received),
+        "events": sorted(events),
+        "payload_bytes": max((size for _, _, size in received.values()), default=0),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        "max_ms": latencies[-1] * 1000 if latencies else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--idols", type=int, default=5000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kpop-stream-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'stream.db')}"
+        os.environ["DATABASE_URL"] = database_url
+
+        from synthetic_data import generate_dataset
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from services.data_collector import DataCollectorService
+
+        generate_dataset(database_url, groups=max(1, args.idols // 10), idols=args.idols,
+                         metrics=args.idols * 10, trend_rows=args.idols * 4, verbose=False)
+        db = sessionmaker(bind=create_engine(database_url))()
+        try:
+            # A previous snapshot so the published one has rank movement to diff against
+            DataCollectorService().update_rankings(db)
+        finally:
+            db.close()
+
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_URL=database_url)
+        )
+        try:
+            report = asyncio.run(run(args, f"http://127.0.0.1:{port}", database_url))
+        finally:
+            server.terminate()
+            server.wait()
+
+    for key, value in report.items():
+        print(f"{key:15s} {value:.1f}" if isinstance(value, float) else f"{key:15s} {value}")
+    if report["received"] < args.clients:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
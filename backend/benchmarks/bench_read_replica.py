@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Read latency during a ranking update, with and without a read replica
+
+Generates a synthetic database and copies it to stand in for a replica.
+Then, for each setup (reads on the primary; reads on the replica), serves
+the API with uvicorn, runs ``update_rankings`` against the primary from a
+separate process, as the refresh job would, and reports the latency of
+uncached leaderboard reads issued while it runs.
+
+    python benchmarks/bench_read_replica.py --idols 20000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ranking_stream import _free_port, _wait_for_server
+
+UPDATE_RANKINGS = (
+    "from database import SessionLocal\n"
+    "from services.data_collector import DataCollectorService\n"
+    "db = SessionLocal()\n"
+    "print(DataCollectorService().update_rankings(db)['status'])\n"
+)
+
+
+async def _read_while_writing(base_url: str, database_url: str, idols: int, concurrency: int):
+    import aiohttp
+
+    latencies, errors = [], 0
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        await _wait_for_server(session, f"{base_url}/")
+        writer = subprocess.Popen(
+            [sys.executable, "-c", UPDATE_RANKINGS], cwd=BACKEND_DIR,
+            env=dict(os.environ, DATABASE_URL=database_url), stdout=subprocess.DEVNULL
+        )
+
+        async def reader():
+            nonlocal errors
+            while writer.poll() is None:
+                # Random pages miss the leaderboard cache, so every read reaches the database
+                url = f"{base_url}/api/rankings?limit=50&offset={random.randrange(0, idols, 50)}"
+                start = time.perf_counter()
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(reader() for _ in range(concurrency)))
+    return sorted(latencies), errors
+
+
+def _run_setup(name: str, args, database_url: str, read_database_url: str) -> dict:
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, READ_DATABASE_URL=read_database_url)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        latencies, errors = asyncio.run(
+            _read_while_writing(f"http://127.0.0.1:{port}", database_url, args.idols, args.concurrency)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "setup": name,
+        "reads": len(latencies),
+        "errors": errors,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idols", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kpop-replica-") as tmpdir:
+        primary = os.path.join(tmpdir, "primary.db")
+        replica = os.path.join(tmpdir, "replica.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{primary}"
+
+        from synthetic_data import generate_dataset
+
+        generate_dataset(os.environ["DATABASE_URL"], groups=max(1, args.idols // 10), idols=args.idols,
+                         metrics=args.idols * 10, trend_rows=args.idols * 4, verbose=False)
+        # One snapshot to read from, then a copy standing in for a caught-up replica
+        subprocess.run([sys.executable, "-c", UPDATE_RANKINGS], cwd=BACKEND_DIR, check=True,
+                       stdout=subprocess.DEVNULL)
+        shutil.copyfile(primary, replica)
+
+        reports = [
+            _run_setup("primary only", args, f"sqlite:///{primary}", ""),
+            _run_setup("read replica", args, f"sqlite:///{primary}", f"sqlite:///{replica}")
+        ]
+
+    print(f"{'setup':15s} {'reads':>7s} {'errors':>7s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}")
+    for report in reports:
+        print(f"{report['setup']:15s} {report['reads']:7d} {report['errors']:7d} "
+              f"{report['p50_ms']:8.1f} {report['p99_ms']:8.1f} {report['max_ms']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
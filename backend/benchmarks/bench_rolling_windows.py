@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Rolling trend window aggregates: consistency and scoring read cost
+
+For each trend history size, builds a synthetic dataset and the 7/30/90-day
+window aggregates, then simulates ``--days`` of ingestion. Each simulated
+day writes fresh observations, re-ingests part of them with new scores
+(replacing the originals) and moves the windows forward. After every day
+the aggregates are checked against a full recomputation from trend_data.
+Reports how long reading the 30-day trend averages takes from the
+aggregates versus re-averaging trend_data, and fails on any inconsistency.
+
+    python benchmarks/bench_rolling_windows.py --idols 5000 --trend-rows 100000 1000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def _ingest_day(db, rng, idols: int, rows: int, day: datetime) -> int:
+    from synthetic_data import TREND_CATEGORIES
+    from services.ingestion import upsert_trend_data
+
+    batch = [
+        {
+            'idol_id': int(rng.integers(1, idols + 1)),
+            'category': TREND_CATEGORIES[int(rng.integers(0, len(TREND_CATEGORIES)))],
+            'score': float(rng.uniform(0, 100)),
+            'source': 'bench',
+            'date': day + timedelta(minutes=int(rng.integers(0, 24 * 60)))
+        }
+        for _ in range(rows)
+    ]
+    written = upsert_trend_data(db, batch)
+    # Same buckets again: these replace the rows above rather than adding to them
+    for row in batch[:rows // 4]:
+        row['score'] = float(rng.uniform(0, 100))
+    upsert_trend_data(db, batch[:rows // 4])
+    db.commit()
+    return written
+
+
+def run(args, trend_rows: int) -> dict:
+    import numpy as np
+
+    with tempfile.TemporaryDirectory(prefix="kpop-windows-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'windows.db')}"
+        os.environ["DATABASE_URL"] = database_url
+
+        from synthetic_data import generate_dataset
+        from sqlalchemy import create_engine, func
+        from sqlalchemy.orm import sessionmaker
+        from models import TrendData
+        from services import rolling_windows
+        from services.partitions import scan
+
+        generate_dataset(database_url, groups=max(1, args.idols // 10), idols=args.idols,
+                         metrics=args.idols, trend_rows=trend_rows, days=90, verbose=False)
+        db = sessionmaker(bind=create_engine(database_url))()
+        rng = np.random.default_rng(7)
+        failures = []
+        try:
+            now = datetime.now()
+            start = time.perf_counter()
+            rolling_windows.rebuild(db, now)
+            db.commit()
+            rebuild_seconds = time.perf_counter() - start
+
+            ingest_seconds = []
+            for offset in range(1, args.days + 1):
+                day = rolling_windows.day_start(now) + timedelta(days=offset)
+                began = time.perf_counter()
+                _ingest_day(db, rng, args.idols, args.rows_per_day, day)
+                rolling_windows.advance(db, day)
+                db.commit()
+                ingest_seconds.append(time.perf_counter() - began)
+
+                report = rolling_windows.verify(db, day)
+                db.commit()
+                if not report['consistent']:
+                    failures.append(f"{trend_rows} rows, day {offset}: {report['windows']} "
+                                    f"e.g. {report['mismatches'][:1]}")
+            now = rolling_windows.day_start(now) + timedelta(days=args.days, hours=12)
+
+            def from_aggregates():
+                rolling_windows.window_stats(db, 30, now)
+
+            def from_trend_data():
+                trend = scan(db, TrendData, now - timedelta(days=30), columns=('idol_id', 'category', 'score', 'date'))
+                db.query(trend.c.idol_id, trend.c.category, func.avg(trend.c.score)) \
+                    .group_by(trend.c.idol_id, trend.c.category).all()
+
+            aggregates_ms = _median_ms(from_aggregates, args.repeat)
+            scan_ms = _median_ms(from_trend_data, args.repeat)
+            db.commit()
+        finally:
+            db.close()
+
+    return {
+        'trend_rows': trend_rows,
+        'rebuild_seconds': rebuild_seconds,
+        'ingest_ms': statistics.median(ingest_seconds) * 1000,
+        'aggregates_ms': aggregates_ms,
+        'scan_ms': scan_ms,
+        'failures': failures
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idols", type=int, default=2000)
+    parser.add_argument("--trend-rows", type=int, nargs="+", default=[50000, 200000])
+    parser.add_argument("--days", type=int, default=10, help="Simulated days of ingestion")
+    parser.add_argument("--rows-per-day", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run(args, trend_rows) for trend_rows in args.trend_rows]
+
+    print(f"{args.idols} idols, {args.days} simulated days of {args.rows_per_day} observations (25% re-ingested)")
+    print(f"{'trend rows':>11s} {'rebuild s':>10s} {'ingest+advance ms/day':>22s} "
+          f"{'30d from aggregates ms':>23s} {'30d from trend_data ms':>23s}")
+    failures = []
+    for result in results:
+        print(f"{result['trend_rows']:11d} {result['rebuild_seconds']:10.2f} {result['ingest_ms']:22.1f} "
+              f"{result['aggregates_ms']:23.1f} {result['scan_ms']:23.1f}")
+        failures += result['failures']
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"aggregates matched a full recomputation after every simulated day")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the rankings payload
+
+Compares the per-row cost of the old path (Pydantic validation of the
+RankingResponse model followed by JSON encoding) with the fast path in
+serializers.py (row tuple -> dict -> orjson). That the fast path matches the
+schema is checked by tests/test_serializers.py.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas import RankingResponse
+from serializers import (
+    RANKING_FIELDS, IDOL_FIELDS, GROUP_FIELDS, ranking_from_row, dumps
+)
+
+
+def build_rows(count: int) -> List[Tuple]:
+    """Build synthetic rows laid out like RANKING_COLUMNS + IDOL_COLUMNS + GROUP_COLUMNS"""
+    now = datetime.now()
+    rows = []
+    for i in range(count):
+        ranking = (i + 1, i + 1, "overall", i + 1, 90.0, 90.0, 88.0, 75.5, 60.1, 42.0, 10.0, now, now)
+        idol = (
+            i + 1, f"Idol {i}", f"Idol {i}", None, i % 500 + 1, "HYBE", "female",
+            "main vocal", now, "KR", False, True, None, now, now,
+        )
+        group = (i % 500 + 1, f"Group {i % 500}", "HYBE", now, True, None)
+        rows.append(ranking + idol + group)
+    assert len(rows[0]) == len(RANKING_FIELDS) + len(IDOL_FIELDS) + len(GROUP_FIELDS)
+    return rows
+
+
+def bench_pydantic(rows: List[Tuple]) -> float:
+    start = time.perf_counter()
+    payload = [
+        RankingResponse.model_validate(ranking_from_row(row)).model_dump(mode="json")
+        for row in rows
+    ]
+    dumps(payload)
+    return time.perf_counter() - start
+
+
+def bench_fast_path(rows: List[Tuple]) -> float:
+    start = time.perf_counter()
+    dumps([ranking_from_row(row) for row in rows])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+
+    slow = min(bench_pydantic(rows) for _ in range(args.repeat))
+    fast = min(bench_fast_path(rows) for _ in range(args.repeat))
+
+    print(f"rows: {args.rows}")
+    print(f"pydantic + json: {slow / args.rows * 1e6:8.2f} us/row")
+    print(f"fast path:       {fast / args.rows * 1e6:8.2f} us/row")
+    print(f"speedup:         {slow / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Leaderboard snapshot shared between worker processes through a mapped file
+
+Publishes a ranking snapshot to a LEADERBOARD_SNAPSHOT_FILE and starts
+``--workers`` processes that map it and read every category in full, as
+API workers would. Checks each worker's pages encode to exactly the JSON
+the database path returns, and reports how much of the mapping each
+worker holds privately versus shared (one copy in RAM means the summed
+PSS is about the file size and private memory about zero). Then publishes
+a new snapshot and reports how long each worker takes to switch to it.
+
+    python benchmarks/bench_shared_snapshot.py --idols 20000 --workers 4
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Far enough ahead that ``as_of`` resolves the latest snapshot through the database
+FUTURE = datetime(2999, 1, 1)
+
+
+def _digest(service, db, categories, **params) -> str:
+    from serializers import dumps
+
+    digest = hashlib.sha256()
+    for category in categories:
+        digest.update(dumps(service.get_current_rankings(db, category=category, limit=0, **params)))
+    return digest.hexdigest()
+
+
+def _mapping_kib(path: str) -> dict:
+    """Rss, Pss and private KiB of this process's mappings of ``path`` from /proc/self/smaps"""
+    totals = {"Rss": 0, "Pss": 0, "Private": 0}
+    inside = False
+    with open("/proc/self/smaps") as f:
+        for line in f:
+            fields = line.split()
+            if "-" in fields[0] and not fields[0].endswith(":"):
+                inside = len(fields) >= 6 and fields[5].startswith(path)
+            elif inside and fields[0] in ("Rss:", "Pss:"):
+                totals[fields[0][:-1]] += int(fields[1])
+            elif inside and fields[0] in ("Private_Clean:", "Private_Dirty:"):
+                totals["Private"] += int(fields[1])
+    return totals
+
+
+def _worker(database_url: str, categories, connection):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from services.ranking_service import RankingService
+
+    db = sessionmaker(bind=create_engine(database_url))()
+    service = RankingService()
+    try:
+        digest = _digest(service, db, categories)
+        connection.send((service.leaderboards.version, digest, _mapping_kib(service.leaderboards.path)))
+
+        # Poll as a busy worker would until the next snapshot shows up
+        target = connection.recv()
+        while (service.leaderboards.version or 0) < target:
+            service.get_current_rankings(db, limit=10)
+            time.sleep(0.001)
+        connection.send((service.leaderboards.version, time.monotonic()))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idols", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kpop-shared-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'shared.db')}"
+        snapshot_path = os.path.join(tmpdir, "leaderboard.snapshot")
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["LEADERBOARD_SNAPSHOT_FILE"] = snapshot_path
+
+        from synthetic_data import generate_dataset
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        generate_dataset(database_url, groups=max(1, args.idols // 10), idols=args.idols,
+                         metrics=args.idols * 2, trend_rows=args.idols, verbose=False)
+        session_factory = sessionmaker(bind=create_engine(database_url))
+
+        from services.data_collector import DataCollectorService
+        from services.ranking_service import RankingService
+        from services.scoring_engine import CATEGORY_COLUMNS
+
+        categories = list(CATEGORY_COLUMNS)
+        collector = DataCollectorService()
+        db = session_factory()
+        try:
+            start = time.perf_counter()
+            version = collector.update_rankings(db)["version"]
+            publish_seconds = time.perf_counter() - start
+            expected = _digest(RankingService(), db, categories, as_of=FUTURE)
+        finally:
+            db.close()
+        file_kib = os.path.getsize(snapshot_path) / 1024
+
+        context = multiprocessing.get_context("spawn")
+        workers = []
+        for _ in range(args.workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, args=(database_url, categories, child))
+            process.start()
+            workers.append((process, parent))
+
+        try:
+            reports = [connection.recv() for _, connection in workers]
+
+            db = session_factory()
+            try:
+                next_version = collector.update_rankings(db)["version"]
+                published = time.monotonic()
+            finally:
+                db.close()
+            for _, connection in workers:
+                connection.send(next_version)
+            switches = [connection.recv() for _, connection in workers]
+        finally:
+            for process, _ in workers:
+                process.join(timeout=30)
+                if process.is_alive():
+                    process.terminate()
+
+    failures = []
+    print(f"snapshot v{version}: {file_kib / 1024:.1f} MiB file, {args.idols} idols x {len(categories)} categories, "
+          f"refresh incl. publish {publish_seconds:.2f} s")
+    print(f"{'worker':>6s} {'version':>8s} {'rss KiB':>9s} {'pss KiB':>9s} {'private KiB':>12s}  pages")
+    for index, (served, digest, kib) in enumerate(reports):
+        matches = digest == expected
+        print(f"{index:6d} {served:8d} {kib['Rss']:9d} {kib['Pss']:9d} {kib['Private']:12d}  "
+              f"{'match database' if matches else 'DIFFER'}")
+        if not matches:
+            failures.append(f"worker {index}: pages differ from the database path")
+        if served != version:
+            failures.append(f"worker {index}: served v{served}, expected v{version}")
+    print(f"summed pss {sum(kib['Pss'] for _, _, kib in reports) / 1024:.1f} MiB "
+          f"across {args.workers} workers for a {file_kib / 1024:.1f} MiB snapshot")
+
+    lags = [(seen - published) * 1000 for _, seen in switches]
+    print(f"switch to v{next_version}: max {max(lags):.0f} ms after publish")
+    failures += [f"worker {index}: ended on v{served}" for index, (served, _) in enumerate(switches)
+                 if served != next_version]
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the API module
+
+Imports ``main`` in fresh interpreters under ``python -X importtime`` and
+reports the cumulative import time and the slowest direct imports. Fails
+when the median exceeds ``--budget-ms``. That heavy dependencies stay lazy
+is checked by tests/test_startup.py.
+
+    python benchmarks/bench_startup.py --budget-ms 1500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module: str, env: Dict[str, str]) -> List[Tuple[str, int, int]]:
+    """(name, depth, cumulative microseconds) for every module imported by ``module``"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    profile = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        profile.append((name.strip(), depth, int(cumulative)))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest direct imports to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kpop-startup-") as tmpdir:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'startup.db')}")
+        profiles = [import_profile(args.module, env) for _ in range(args.rounds)]
+
+    totals = [
+        next(cumulative for name, depth, cumulative in profile if name == args.module and depth == 0)
+        for profile in profiles
+    ]
+    median_ms = statistics.median(totals) / 1000
+
+    direct = {}
+    for profile in profiles:
+        for name, depth, cumulative in profile:
+            if depth == 1:
+                direct.setdefault(name, []).append(cumulative)
+    slowest = sorted(direct.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.rounds} rounds (budget {args.budget_ms:.0f} ms)")
+    for name, timings in slowest:
+        print(f"  {name:40s} {statistics.median(timings) / 1000:8.1f} ms")
+
+    if median_ms > args.budget_ms:
+        print("FAIL: over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Thundering-herd benchmark for the coalesced read endpoints
+
+Starts the API in a uvicorn subprocess (one worker) on a synthetic
+database. For each herd size, publishes a new ranking snapshot so the
+leaderboard cache is cold, fires that many identical concurrent
+``/api/rankings?limit=100`` requests and reads the database query count
+the herd caused from ``/metrics``. With request coalescing the count stays
+roughly flat as the herd grows; fails if the largest herd issues more than
+``--max-ratio`` times the queries of the smallest.
+
+    python benchmarks/bench_thundering_herd.py --herds 10 100 1000
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ranking_stream import _free_port, _wait_for_server
+
+QUERY_SUM = re.compile(r'^http_request_db_queries_sum\{method="GET",route="/api/rankings"\} (\S+)$', re.M)
+
+
+async def _query_total(session, base_url: str) -> float:
+    async with session.get(f"{base_url}/metrics") as response:
+        match = QUERY_SUM.search(await response.text())
+    return float(match.group(1)) if match else 0.0
+
+
+async def _herd(session, url: str, clients: int):
+    async def fetch():
+        start = time.perf_counter()
+        async with session.get(url) as response:
+            body = await response.read()
+            if response.status != 200:
+                raise RuntimeError(f"{response.status}: {body[:200]!r}")
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(fetch() for _ in range(clients)))
+
+
+async def run(args, base_url: str, session_factory):
+    import aiohttp
+
+    from services.data_collector import DataCollectorService
+
+    collector = DataCollectorService()
+    url = f"{base_url}/api/rankings?limit=100"
+    rows = []
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        await _wait_for_server(session, f"{base_url}/")
+        for clients in args.herds:
+            db = session_factory()
+            try:
+                await asyncio.to_thread(collector.update_rankings, db)
+            finally:
+                db.close()
+
+            before = await _query_total(session, base_url)
+            latencies = sorted(await _herd(session, url, clients))
+            queries = await _query_total(session, base_url) - before
+            rows.append((clients, queries, statistics.median(latencies) * 1000, latencies[-1] * 1000))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--herds", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--idols", type=int, default=5000)
+    parser.add_argument("--max-ratio", type=float, default=5.0)
+    parser.add_argument("--app", default="main:app", help="ASGI app to serve, e.g. a baseline copy for comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kpop-herd-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'herd.db')}"
+        os.environ["DATABASE_URL"] = database_url
+
+        from synthetic_data import generate_dataset
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        generate_dataset(database_url, groups=max(1, args.idols // 10), idols=args.idols,
+                         metrics=args.idols * 10, trend_rows=args.idols * 4, verbose=False)
+        session_factory = sessionmaker(bind=create_engine(database_url))
+
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", args.app, "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_URL=database_url)
+        )
+        try:
+            rows = asyncio.run(run(args, f"http://127.0.0.1:{port}", session_factory))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'clients':>8s} {'queries':>8s} {'p50 ms':>8s} {'max ms':>8s}")
+    for clients, queries, p50, worst in rows:
+        print(f"{clients:8d} {queries:8.0f} {p50:8.1f} {worst:8.1f}")
+
+    smallest, largest = rows[0][1], rows[-1][1]
+    if largest > max(smallest, 1) * args.max_ratio:
+        print(f"FAIL: {largest:.0f} queries for {rows[-1][0]} clients vs {smallest:.0f} for {rows[0][0]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
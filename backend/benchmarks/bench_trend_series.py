@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Batched trend series: one aligned request versus one request per idol
+
+For each series count, picks that many idols and loads their trend data
+twice: once through the batched ``/api/trends?ids=`` read, which resamples
+every idol onto a shared time axis in one query, and once the way the
+charts did before, calling the per-idol read for each idol and aligning the
+irregular timestamps in Python. Checks both give the same matrix and
+reports the latency and the number of queries of each.
+
+    python benchmarks/bench_trend_series.py --idols 2000 --trend-rows 500000 --series 10 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def _align_per_idol(service, db, idol_ids, days: int, interval: str, timestamps) -> dict:
+    """Per-idol reads aligned client-side: {(idol_id, category): (scores, ranks)}"""
+    from services.ranking_service import TREND_INTERVALS, _interval_start
+
+    start = datetime.fromisoformat(timestamps[0])
+    step = TREND_INTERVALS[interval]
+    cells = defaultdict(lambda: [[0.0, 0, None] for _ in timestamps])
+    for idol_id in idol_ids:
+        # The aligned axis starts at the beginning of the first interval, up to a week before ``days`` ago
+        trends = service.get_idol_trends(db, idol_id, days + 8) or {'trends': []}
+        for point in trends['trends']:
+            date = datetime.fromisoformat(point['date'])
+            if date < start:
+                continue
+            cell = cells[(idol_id, point['category'])][(_interval_start(date, interval) - start) // step]
+            cell[0] += point['score']
+            cell[1] += 1
+            if point['rank'] is not None:
+                cell[2] = point['rank']
+    return {
+        key: ([total / count if count else None for total, count, _ in row],
+              [rank if count else None for _, count, rank in row])
+        for key, row in cells.items()
+    }
+
+
+def _differences(batched: dict, aligned: dict) -> int:
+    got = {(series['idol_id'], series['category']): (series['score'], series['rank'])
+           for series in batched['series']}
+    differences = len(got.keys() ^ aligned.keys())
+    for key in got.keys() & aligned.keys():
+        (scores, ranks), (want_scores, want_ranks) = got[key], aligned[key]
+        differences += sum(
+            (a is None) != (b is None) or (a is not None and abs(a - b) > 1e-9)
+            for a, b in zip(scores, want_scores)
+        )
+        differences += sum(a != b for a, b in zip(ranks, want_ranks))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idols", type=int, default=2000)
+    parser.add_argument("--trend-rows", type=int, default=500000)
+    parser.add_argument("--series", type=int, nargs="+", default=[10, 50], help="Idols per request")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", default="day")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kpop-trend-series-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'trends.db')}"
+        os.environ["DATABASE_URL"] = database_url
+
+        from synthetic_data import generate_dataset
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.orm import sessionmaker
+        from serializers import dumps
+        from services.ranking_service import RankingService
+
+        generate_dataset(database_url, groups=max(1, args.idols // 10), idols=args.idols,
+                         metrics=args.idols, trend_rows=args.trend_rows, days=90, verbose=False)
+        engine = create_engine(database_url)
+        queries = [0]
+        event.listen(engine, "before_cursor_execute", lambda *_: queries.__setitem__(0, queries[0] + 1))
+        db = sessionmaker(bind=engine)()
+        service = RankingService()
+
+        failures = []
+        print(f"{args.idols} idols, {args.trend_rows} trend rows, last {args.days} days by {args.interval}")
+        print(f"{'series':>7s} {'points':>7s} {'batched ms':>11s} {'queries':>8s} "
+              f"{'per-idol ms':>12s} {'queries':>8s} {'payload KiB':>12s}")
+        try:
+            for count in args.series:
+                idol_ids = list(range(1, args.idols + 1, max(1, args.idols // count)))[:count]
+
+                def batched():
+                    return dumps(service.get_trend_series(db, idol_ids, args.days, args.interval))
+
+                series = service.get_trend_series(db, idol_ids, args.days, args.interval)
+                aligned = _align_per_idol(service, db, idol_ids, args.days, args.interval, series['timestamps'])
+                differences = _differences(series, aligned)
+                if differences:
+                    failures.append(f"{count} idols: {differences} cells differ from the per-idol alignment")
+
+                queries[0] = 0
+                batched_ms = _median_ms(batched, args.repeat)
+                batched_queries = queries[0] // args.repeat
+                queries[0] = 0
+                per_idol_ms = _median_ms(lambda: _align_per_idol(
+                    service, db, idol_ids, args.days, args.interval, series['timestamps']), args.repeat)
+                per_idol_queries = queries[0] // args.repeat
+
+                print(f"{len(series['series']):7d} {len(series['timestamps']):7d} {batched_ms:11.1f} "
+                      f"{batched_queries:8d} {per_idol_ms:12.1f} {per_idol_queries:8d} "
+                      f"{len(batched()) / 1024:12.1f}")
+        finally:
+            db.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("batched series matched the per-idol reads aligned client-side")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Collector behaviour against failing, throttling and slow upstreams
+
+Runs the YouTube and Spotify collectors against the local stub upstream on
+a synthetic roster, once per scenario, with faults injected into Spotify
+while YouTube stays healthy. Reports the requests each upstream received,
+rows written and time taken. That failing upstreams are shed and healthy
+ones unaffected is checked by tests/test_upstream_faults.py.
+
+    python benchmarks/bench_upstream_faults.py --idols 1000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ranking_stream import _free_port
+from stub_upstream import Fault, StubUpstream
+
+SCENARIOS = [
+    ("healthy", None),
+    ("spotify down (503)", Fault(status=503)),
+    ("spotify throttled (429, Retry-After 60)", Fault(status=429, retry_after="60")),
+    ("spotify flaky (20% 500)", Fault(status=500, rate=0.2)),
+    ("spotify slow (+100 ms)", Fault(rate=0.0, latency=0.1)),
+]
+
+
+async def _run_scenario(stub: StubUpstream, session_factory, fault) -> dict:
+    from models import DataSource
+    from services.data_collector import DataCollectorService
+    from services.refresh_telemetry import RefreshTelemetry
+
+    stub.inject("spotify", fault)
+    stub.requests_by_api.clear()
+    collector = DataCollectorService()
+    telemetry = RefreshTelemetry()
+    report = {}
+    db = session_factory()
+    try:
+        async with collector:
+            for source in db.query(DataSource).filter(DataSource.type == "api").order_by(DataSource.id):
+                api = "youtube" if "youtube" in source.name.lower() else "spotify" if "spotify" in source.name.lower() else None
+                if api is None:
+                    continue
+                start = time.perf_counter()
+                with telemetry.source(source) as stats:
+                    stats.record_rows(await collector._collect_from_api(db, source, stats))
+                guard = collector.upstream_guard(source.name).to_dict()
+                report[api] = {
+                    "requests": stub.requests_by_api[api],
+                    "rows": stats.rows_written,
+                    "errors": stats.error_count,
+                    "seconds": time.perf_counter() - start,
+                    "state": guard["state"],
+                    "limit": guard["limit"]
+                }
+    finally:
+        db.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idols", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.01, help="Baseline stub latency per request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="UPSTREAM_RATE_LIMIT_SECONDS for the run")
+    args = parser.parse_args()
+
+    stub_port = _free_port()
+    os.environ["YOUTUBE_API_URL"] = f"http://127.0.0.1:{stub_port}/youtube/v3"
+    os.environ["SPOTIFY_API_URL"] = f"http://127.0.0.1:{stub_port}/spotify/v1"
+    os.environ["UPSTREAM_RATE_LIMIT_SECONDS"] = str(args.rate_limit)
+
+    with tempfile.TemporaryDirectory(prefix="kpop-faults-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'faults.db')}"
+        os.environ["DATABASE_URL"] = database_url
+
+        from synthetic_data import generate_dataset
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        generate_dataset(database_url, groups=max(1, args.idols // 10), idols=args.idols, metrics=args.idols,
+                         trend_rows=args.idols, upstream_url=f"http://127.0.0.1:{stub_port}", verbose=False)
+        session_factory = sessionmaker(bind=create_engine(database_url))
+
+        async def run_all():
+            stub = await StubUpstream(latency=args.latency).start(port=stub_port)
+            try:
+                return [(name, await _run_scenario(stub, session_factory, fault)) for name, fault in SCENARIOS]
+            finally:
+                await stub.stop()
+
+        results = asyncio.run(run_all())
+
+    print(f"{'scenario':42s} {'api':8s} {'requests':>9s} {'rows':>6s} {'errors':>7s} {'seconds':>8s} {'limit':>6s}  state")
+    for name, report in results:
+        for api, row in report.items():
+            print(f"{name:42s} {api:8s} {row['requests']:9d} {row['rows']:6d} {row['errors']:7d} "
+                  f"{row['seconds']:8.2f} {row['limit']:6.1f}  {row['state']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the K-Pop Ranking Platform backend
+
+Generates a synthetic dataset (see synthetic_data.py), then times every
+RankingService read method, update_rankings and refresh_all_data against a
+local stub upstream. Results are written as JSON and can be compared with a
+previous run to catch regressions:
+
+    python benchmarks/run_benchmarks.py --idols 50000 --output results/main.json
+    python benchmarks/run_benchmarks.py --idols 50000 --compare results/main.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, function, rounds); registered with @benchmark in execution order
+BENCHMARKS: List[Tuple[str, Callable, Optional[int]]] = []
+
+
+def benchmark(name: str, rounds: Optional[int] = None):
+    """Register a benchmark; ``rounds`` overrides --rounds for slow cases"""
+    def decorator(func: Callable) -> Callable:
+        BENCHMARKS.append((name, func, rounds))
+        return func
+    return decorator
+
+
+class BenchmarkContext:
+    """Shared state handed to every benchmark function"""
+
+    def __init__(self, session_factory, loop: asyncio.AbstractEventLoop, idol_ids: List[int]):
+        self.session_factory = session_factory
+        self.loop = loop
+        self.idol_ids = idol_ids
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Benchmarks ----------------------------------------------------------------
+
+@benchmark("ranking_service.get_current_rankings")
+def bench_get_current_rankings(ctx: BenchmarkContext, db):
+    ctx.ranking_service.get_current_rankings(db, limit=100)
+
+
+@benchmark("ranking_service.get_current_rankings[category]")
+def bench_get_current_rankings_category(ctx: BenchmarkContext, db):
+    ctx.ranking_service.get_current_rankings(db, category="overall", limit=100)
+
+
+@benchmark("ranking_service.get_movers")
+def bench_get_movers(ctx: BenchmarkContext, db):
+    ctx.ranking_service.get_movers(db, category="overall", limit=10)
+
+
+@benchmark("ranking_service.get_idols")
+def bench_get_idols(ctx: BenchmarkContext, db):
+    ctx.ranking_service.get_idols(db)
+
+
+@benchmark("ranking_service.get_idols[gender]")
+def bench_get_idols_gender(ctx: BenchmarkContext, db):
+    ctx.ranking_service.get_idols(db, gender="female")
+
+
+@benchmark("ranking_service.get_idol_by_id")
+def bench_get_idol_by_id(ctx: BenchmarkContext, db):
+    for idol_id in ctx.idol_ids[:100]:
+        ctx.ranking_service.get_idol_by_id(db, idol_id)
+
+
+@benchmark("ranking_service.get_idol_document")
+def bench_get_idol_document(ctx: BenchmarkContext, db):
+    for idol_id in ctx.idol_ids[:100]:
+        ctx.ranking_service.get_idol_document(db, "detail", idol_id)
+        ctx.ranking_service.get_idol_document(db, "trends", idol_id)
+
+
+@benchmark("idol_documents.warm", rounds=1)
+def bench_warm_idol_documents(ctx: BenchmarkContext, db):
+    ctx.ranking_service.documents.warm(db, ctx.ranking_service.get_latest_version(db))
+
+
+@benchmark("ranking_service.compare_idols")
+def bench_compare_idols(ctx: BenchmarkContext, db):
+    for idol_id in ctx.idol_ids[:50]:
+        ctx.ranking_service.compare_idols(db, idol_id, ctx.idol_ids[-1])
+
+
+@benchmark("ranking_service.get_idol_trends")
+def bench_get_idol_trends(ctx: BenchmarkContext, db):
+    for idol_id in ctx.idol_ids[:100]:
+        ctx.ranking_service.get_idol_trends(db, idol_id, 30)
+
+
+@benchmark("search_index.search")
+def bench_search_index(ctx: BenchmarkContext, db):
+    if not hasattr(ctx, "search_index"):
+        from services.search_index import SearchIndex
+
+        ctx.search_index = SearchIndex()
+        ctx.search_index.sync(db, force=True)
+    for query in ("Idol 42", "idol 4", "Group 17", "idl 123", "HYBE", "Real Name 99"):
+        ctx.search_index.search(query, limit=20)
+
+
+@benchmark("change_log.get_changes")
+def bench_get_changes(ctx: BenchmarkContext, db):
+    from services.change_log import IDOL, UPDATE, get_changes, record_changes
+
+    if not hasattr(ctx, "change_log_since"):
+        # Synthetic data is bulk-loaded, so seed the log with one update per idol
+        ctx.change_log_since = get_changes(db, None)["version"]
+        record_changes(db, IDOL, ctx.idol_ids, UPDATE)
+        db.commit()
+    page = get_changes(db, ctx.change_log_since, limit=1000)
+    get_changes(db, page["version"], limit=1000)
+
+
+@benchmark("scoring_engine.compute", rounds=3)
+def bench_scoring_engine_compute(ctx: BenchmarkContext, db):
+    ctx.data_collector.scoring_engine.compute(db)
+
+
+@benchmark("scoring_engine.score[50k idols]")
+def bench_scoring_engine_score(ctx: BenchmarkContext, db):
+    import numpy as np
+    import pandas as pd
+    from services.scoring_engine import DEFAULT_WEIGHTS, SIGNAL_SUB_SCORES
+
+    rng = np.random.default_rng(0)
+    idol_ids = np.arange(1, 50001)
+    raw = rng.lognormal(10, 2, size=(len(idol_ids), len(SIGNAL_SUB_SCORES)))
+    raw[rng.random(raw.shape) < 0.2] = np.nan
+    signals = pd.DataFrame(raw, index=idol_ids, columns=list(SIGNAL_SUB_SCORES))
+    for normalization in ("percentile", "zscore"):
+        ctx.data_collector.scoring_engine.score(idol_ids, signals, DEFAULT_WEIGHTS, normalization, datetime.now())
+
+
+@benchmark("data_collector.update_rankings", rounds=3)
+def bench_update_rankings(ctx: BenchmarkContext, db):
+    result = ctx.data_collector.update_rankings(db)
+    if result["status"] != "success":
+        raise RuntimeError(result.get("message"))
+
+
+@benchmark("data_collector.refresh_all_data", rounds=1)
+def bench_refresh_all_data(ctx: BenchmarkContext, db):
+    ctx.run_async(ctx.data_collector.refresh_all_data(db))
+
+
+# Runner --------------------------------------------------------------------
+
+def run_suite(ctx: BenchmarkContext, rounds: int, selected: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name, func, bench_rounds in BENCHMARKS:
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        timings = []
+        for _ in range(bench_rounds or rounds):
+            db = ctx.session_factory()
+            try:
+                start = time.perf_counter()
+                func(ctx, db)
+                timings.append(time.perf_counter() - start)
+            finally:
+                db.close()
+        results[name] = {
+            "rounds": len(timings),
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+            "max": max(timings)
+        }
+        print(f"{name:55s} min {results[name]['min'] * 1000:10.2f} ms  "
+              f"median {results[name]['median'] * 1000:10.2f} ms")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """Print a comparison with a previous run; returns False on regression"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    ok = True
+    print(f"\nComparison against {baseline_path} (threshold {threshold:.2f}x on median)")
+    for name, current in results.items():
+        if name not in baseline:
+            print(f"{name:55s} new")
+            continue
+        ratio = current["median"] / baseline[name]["median"] if baseline[name]["median"] else float("inf")
+        marker = "REGRESSION" if ratio > threshold else ""
+        ok = ok and ratio <= threshold
+        print(f"{name:55s} {ratio:6.2f}x {marker}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite")
+    parser.add_argument("--database-url", default=None,
+                        help="Existing database to benchmark; a temporary SQLite file is generated otherwise")
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--idols", type=int, default=5000)
+    parser.add_argument("--metrics", type=int, default=500000)
+    parser.add_argument("--trend-rows", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--upstream-latency", type=float, default=0.0)
+    parser.add_argument("--only", action="append", help="Run only benchmarks whose name contains this text")
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    # Configuration is read at import time, so it has to be in place first
+    stub_port = _free_port()
+    os.environ["YOUTUBE_API_URL"] = f"http://127.0.0.1:{stub_port}/youtube/v3"
+    os.environ["SPOTIFY_API_URL"] = f"http://127.0.0.1:{stub_port}/spotify/v1"
+    os.environ["UPSTREAM_RATE_LIMIT_SECONDS"] = "0"
+
+    dataset = None
+    tmpdir = None
+    database_url = args.database_url
+    if not database_url:
+        tmpdir = tempfile.TemporaryDirectory(prefix="kpop-bench-")
+        database_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    # database.py builds its engine on import, which synthetic_data triggers
+    os.environ["DATABASE_URL"] = database_url
+
+    if tmpdir:
+        from synthetic_data import generate_dataset
+
+        dataset = generate_dataset(
+            database_url,
+            groups=args.groups,
+            idols=args.idols,
+            metrics=args.metrics,
+            trend_rows=args.trend_rows,
+            seed=args.seed,
+            upstream_url=f"http://127.0.0.1:{stub_port}"
+        )
+
+    from database import SessionLocal
+    from models import Idol
+    from services.ranking_service import RankingService
+    from services.data_collector import DataCollectorService
+    from stub_upstream import StubUpstream
+
+    loop = asyncio.new_event_loop()
+    stub = loop.run_until_complete(StubUpstream(latency=args.upstream_latency).start(port=stub_port))
+
+    db = SessionLocal()
+    try:
+        idol_ids = [row[0] for row in db.query(Idol.id).order_by(Idol.id)]
+        ctx = BenchmarkContext(SessionLocal, loop, idol_ids)
+        ctx.ranking_service = RankingService()
+        ctx.data_collector = DataCollectorService()
+        # Read benchmarks need a published leaderboard
+        ctx.data_collector.update_rankings(db)
+    finally:
+        db.close()
+
+    try:
+        results = run_suite(ctx, args.rounds, args.only)
+    finally:
+        loop.run_until_complete(stub.stop())
+        loop.close()
+        if tmpdir:
+            tmpdir.cleanup()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split(":", 1)[0],
+            "dataset": dataset,
+            "upstream_requests": stub.request_count
+        },
+        "results": results
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
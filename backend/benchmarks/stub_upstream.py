@@ -0,0 +1,138 @@
+"""
+Local stub of the YouTube Data and Spotify Web APIs and the chart pages
+
+Serves just enough of both APIs for DataCollectorService to run a full
+refresh without network access, and the saved chart pages in
+``tests/fixtures/charts`` at ``/charts/<chart>``. Responses are deterministic per query and
+an optional artificial latency simulates a remote upstream. Faults can be
+injected per API: error statuses at a given rate (optionally with
+``Retry-After``) and extra latency.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import socket
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from aiohttp import web
+
+CHART_FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures", "charts")
+
+
+def _stable_number(text: str, low: int, high: int) -> int:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return low + int.from_bytes(digest, "big") % (high - low)
+
+
+@dataclass
+class Fault:
+    """Misbehaviour for one API: ``rate`` of requests answered with ``status``"""
+    status: int = 503
+    rate: float = 1.0
+    retry_after: Optional[str] = None
+    latency: float = 0.0
+
+
+class StubUpstream:
+    """In-process aiohttp server emulating the upstream APIs"""
+
+    def __init__(self, latency: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.request_count = 0
+        self.requests_by_api: Counter = Counter()
+        self.faults: Dict[str, Fault] = {}
+        self._random = random.Random(seed)
+        self.base_url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/youtube/v3/search", self._youtube_search)
+        self.app.router.add_get("/youtube/v3/channels", self._youtube_channels)
+        self.app.router.add_get("/spotify/v1/search", self._spotify_search)
+        self.app.router.add_get("/spotify/v1/artists/{artist_id}", self._spotify_artist)
+        self.app.router.add_get("/charts/{chart}", self._chart_page)
+
+    @property
+    def youtube_url(self) -> str:
+        return f"{self.base_url}/youtube/v3"
+
+    @property
+    def spotify_url(self) -> str:
+        return f"{self.base_url}/spotify/v1"
+
+    def chart_url(self, chart: str) -> str:
+        return f"{self.base_url}/charts/{chart}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        if not port:
+            with socket.socket() as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.base_url = f"http://{host}:{port}"
+        return self
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def inject(self, api: str, fault: Optional[Fault]):
+        """Make ``api`` ("youtube", "spotify" or a chart name) misbehave; None restores it"""
+        if fault is None:
+            self.faults.pop(api, None)
+        else:
+            self.faults[api] = fault
+
+    async def _respond(self, api: str, payload) -> web.Response:
+        self.request_count += 1
+        self.requests_by_api[api] += 1
+        fault = self.faults.get(api)
+        latency = self.latency + (fault.latency if fault else 0.0)
+        if latency:
+            await asyncio.sleep(latency)
+        if fault and fault.rate and self._random.random() < fault.rate:
+            headers = {"Retry-After": fault.retry_after} if fault.retry_after else None
+            return web.json_response({"error": {"code": fault.status}}, status=fault.status, headers=headers)
+        return web.json_response(payload)
+
+    async def _youtube_search(self, request: web.Request) -> web.Response:
+        query = request.query.get("q", "")
+        return await self._respond("youtube", {"items": [{"id": {"channelId": f"UC{_stable_number(query, 10**9, 10**10)}"}}]})
+
+    async def _youtube_channels(self, request: web.Request) -> web.Response:
+        channel_id = request.query.get("id", "")
+        return await self._respond("youtube", {"items": [{"statistics": {
+            "subscriberCount": str(_stable_number(channel_id, 10**4, 10**8)),
+            "viewCount": str(_stable_number(channel_id + "views", 10**6, 10**11))
+        }}]})
+
+    async def _spotify_search(self, request: web.Request) -> web.Response:
+        query = request.query.get("q", "")
+        return await self._respond("spotify", {"artists": {"items": [{"id": str(_stable_number(query, 10**9, 10**10))}]}})
+
+    async def _spotify_artist(self, request: web.Request) -> web.Response:
+        artist_id = request.match_info["artist_id"]
+        return await self._respond("spotify", {"id": artist_id, "followers": {"total": _stable_number(artist_id, 10**3, 10**8)}})
+
+    async def _chart_page(self, request: web.Request) -> web.Response:
+        chart = request.match_info["chart"]
+        path = os.path.join(CHART_FIXTURES, f"{os.path.basename(chart)}.html")
+        if not os.path.exists(path):
+            raise web.HTTPNotFound()
+        self.request_count += 1
+        self.requests_by_api[chart] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        fault = self.faults.get(chart)
+        if fault and fault.rate and self._random.random() < fault.rate:
+            headers = {"Retry-After": fault.retry_after} if fault.retry_after else None
+            return web.Response(text="unavailable", status=fault.status, headers=headers)
+        with open(path, "rb") as f:
+            return web.Response(body=f.read(), content_type="text/html", charset="utf-8")
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for K-Pop Ranking Platform benchmarks
+
+Builds a configurable dataset (groups, idols, metrics, trend data and data
+sources) with chunked bulk inserts, so performance problems that only show
+at production scale can be reproduced locally.
+
+    python benchmarks/synthetic_data.py --database-url sqlite:///./bench.db \
+        --groups 5000 --idols 50000 --metrics 100000000
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Group, Idol, Metric, TrendData, DataSource
+from init_db import migrate_database
+from services.partitions import route_rows
+from services.ingestion import DEFAULT_BUCKET_MINUTES, bucket_start
+
+METRIC_TYPES = [
+    'youtube_subscribers', 'youtube_views', 'spotify_followers', 'instagram_followers',
+    'twitter_followers', 'tiktok_followers', 'melon_chart', 'gaon_chart',
+    'brand_reputation_ranking', 'google_trends', 'twitter_mentions'
+]
+
+# Rough magnitude per metric type: (log-mean, log-sigma) for count-like
+# metrics, None for metrics already on a 0-100 scale
+METRIC_SCALES = {
+    'youtube_subscribers': (13.0, 1.5),
+    'youtube_views': (19.0, 1.8),
+    'spotify_followers': (13.0, 1.5),
+    'instagram_followers': (14.0, 1.2),
+    'twitter_followers': (13.0, 1.3),
+    'tiktok_followers': (14.0, 1.4),
+    'melon_chart': None,
+    'gaon_chart': None,
+    'brand_reputation_ranking': None,
+    'google_trends': None,
+    'twitter_mentions': (9.0, 1.0),
+}
+
+TREND_CATEGORIES = ['music', 'social', 'streaming']
+
+# Observations are written the way ingestion writes them: one row per
+# (idol, type, source, bucket), with default-width buckets
+SOURCE = 'synthetic'
+
+COMPANIES = [
+    'HYBE', 'YG Entertainment', 'JYP Entertainment', 'SM Entertainment', 'PLEDIS Entertainment',
+    'ADOR', 'Starship Entertainment', 'Source Music', 'EDAM Entertainment', 'Cube Entertainment'
+]
+
+POSITIONS = ['main vocal', 'lead vocal', 'main dancer', 'lead dancer', 'main rapper', 'visual', 'leader']
+
+
+def _chunks(total: int, chunk_size: int) -> Iterator[int]:
+    """Yield chunk sizes summing to ``total``"""
+    while total > 0:
+        size = min(chunk_size, total)
+        yield size
+        total -= size
+
+
+def _random_dates(rng: np.random.Generator, count: int, days: int, now: np.datetime64) -> List[datetime]:
+    """Uniformly spread timestamps over the last ``days`` days"""
+    offsets = rng.integers(0, days * 86400, size=count).astype('timedelta64[s]')
+    return (now - offsets).astype('datetime64[us]').tolist()
+
+
+class _Buckets:
+    """Dates in distinct ingestion buckets for each (idol, type) cell.
+
+    Each cell starts at a random bucket of the last ``days`` days and steps
+    by a stride coprime with the bucket count, so its n-th row never lands
+    in a bucket it already used and the unique observation keys hold.
+    """
+
+    def __init__(self, rng: np.random.Generator, cells: int, days: int, now: np.datetime64):
+        self.rng = rng
+        self.width = np.timedelta64(DEFAULT_BUCKET_MINUTES, 'm')
+        self.count = days * 24 * 60 // DEFAULT_BUCKET_MINUTES
+        self.stride = max(1, int(self.count * 0.618))
+        while math.gcd(self.stride, self.count) != 1:
+            self.stride += 1
+        self.latest = np.datetime64(bucket_start(now.astype(datetime), DEFAULT_BUCKET_MINUTES), 's')
+        self.now = now
+        self.offsets = rng.integers(0, self.count, size=cells)
+        self.used = np.zeros(cells, dtype=np.int64)
+
+    def dates(self, cells: np.ndarray) -> Tuple[List[datetime], List[datetime]]:
+        """(date, bucket) of the next row of each cell, in order"""
+        order = np.argsort(cells, kind='stable')
+        ordered = cells[order]
+        first = np.searchsorted(ordered, ordered)
+        occurrence = np.empty(len(cells), dtype=np.int64)
+        occurrence[order] = np.arange(len(cells)) - first
+        occurrence += self.used[cells]
+        np.add.at(self.used, cells, 1)
+        if len(cells) and occurrence.max() >= self.count:
+            raise ValueError(f"More rows than distinct {DEFAULT_BUCKET_MINUTES}-minute buckets per idol and type")
+
+        index = (self.offsets[cells] + occurrence * self.stride) % self.count
+        buckets = self.latest - index * self.width
+        seconds = self.rng.integers(0, DEFAULT_BUCKET_MINUTES * 60, size=len(cells)).astype('timedelta64[s]')
+        dates = np.minimum(buckets + seconds, self.now)
+        return dates.astype('datetime64[us]').tolist(), buckets.astype('datetime64[us]').tolist()
+
+
+def _bulk_insert(engine: Engine, table, rows: List[Dict[str, Any]]):
+    with engine.begin() as conn:
+        conn.execute(insert(table), rows)
+
+
+def _bulk_insert_partitioned(engine: Engine, model, rows: List[Dict[str, Any]]):
+    with engine.begin() as conn:
+        for table, table_rows in route_rows(conn, model, rows):
+            conn.execute(insert(table), table_rows)
+
+
+def _speed_up_sqlite(engine: Engine):
+    """Trade durability for load speed; only ever used on throwaway databases"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=OFF")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA cache_size=-262144")
+        cursor.close()
+
+
+def generate_dataset(
+    database_url: str,
+    groups: int = 500,
+    idols: int = 5000,
+    metrics: int = 500000,
+    trend_rows: int = 200000,
+    days: int = 90,
+    seed: int = 42,
+    chunk_size: int = 50000,
+    upstream_url: Optional[str] = None,
+    verbose: bool = True
+) -> Dict[str, Any]:
+    """Create the schema and fill it with a reproducible synthetic dataset"""
+    rng = np.random.default_rng(seed)
+    engine = create_engine(database_url)
+    _speed_up_sqlite(engine)
+    migrate_database(engine)
+
+    now = np.datetime64(datetime.now().replace(microsecond=0), 's')
+    timings = {}
+
+    def log(message: str):
+        if verbose:
+            print(message)
+
+    # Groups
+    start = time.perf_counter()
+    debut_dates = _random_dates(rng, groups, 365 * 15, now)
+    company_ids = rng.integers(0, len(COMPANIES), size=groups)
+    _bulk_insert(engine, Group.__table__, [
+        {
+            'id': i + 1,
+            'name': f'Group {i + 1}',
+            'company': COMPANIES[company_ids[i]],
+            'debut_date': debut_dates[i],
+            'is_active': True
+        }
+        for i in range(groups)
+    ])
+    timings['groups'] = time.perf_counter() - start
+    log(f"✅ {groups} groups in {timings['groups']:.1f}s")
+
+    # Idols: ~10% soloists, the rest spread over groups
+    start = time.perf_counter()
+    next_id = 1
+    for size in _chunks(idols, chunk_size):
+        soloist = rng.random(size) < 0.1
+        group_ids = rng.integers(1, groups + 1, size=size) if groups else np.zeros(size, dtype=int)
+        genders = rng.choice(['male', 'female'], size=size)
+        positions = rng.integers(0, len(POSITIONS), size=size)
+        birth_dates = _random_dates(rng, size, 365 * 20, now - np.timedelta64(365 * 16, 'D'))
+        rows = []
+        for i in range(size):
+            idol_id = next_id + i
+            rows.append({
+                'id': idol_id,
+                'name': f'Idol {idol_id}',
+                'stage_name': f'Idol {idol_id}',
+                'real_name': f'Real Name {idol_id}',
+                'group_id': None if soloist[i] or not groups else int(group_ids[i]),
+                'company': COMPANIES[idol_id % len(COMPANIES)],
+                'gender': str(genders[i]),
+                'position': POSITIONS[positions[i]],
+                'birth_date': birth_dates[i],
+                'nationality': 'KR',
+                'is_soloist': bool(soloist[i]),
+                'is_active': True
+            })
+        _bulk_insert(engine, Idol.__table__, rows)
+        next_id += size
+    timings['idols'] = time.perf_counter() - start
+    log(f"✅ {idols} idols in {timings['idols']:.1f}s")
+
+    # Metrics
+    start = time.perf_counter()
+    written = 0
+    metric_buckets = _Buckets(rng, idols * len(METRIC_TYPES), days, now)
+    for size in _chunks(metrics, chunk_size):
+        idol_ids = rng.integers(1, idols + 1, size=size)
+        type_ids = rng.integers(0, len(METRIC_TYPES), size=size)
+        dates, buckets = metric_buckets.dates((idol_ids - 1) * len(METRIC_TYPES) + type_ids)
+        idol_ids = idol_ids.tolist()
+        values = np.empty(size)
+        for type_index, metric_type in enumerate(METRIC_TYPES):
+            mask = type_ids == type_index
+            scale = METRIC_SCALES[metric_type]
+            if scale is None:
+                values[mask] = rng.uniform(0, 100, size=mask.sum())
+            else:
+                values[mask] = rng.lognormal(scale[0], scale[1], size=mask.sum())
+        values = values.round(2).tolist()
+        type_ids = type_ids.tolist()
+        _bulk_insert_partitioned(engine, Metric, [
+            {
+                'idol_id': idol_ids[i],
+                'metric_type': METRIC_TYPES[type_ids[i]],
+                'value': values[i],
+                'source': SOURCE,
+                'date': dates[i],
+                'bucket': buckets[i]
+            }
+            for i in range(size)
+        ])
+        written += size
+        if verbose and written % (chunk_size * 20) == 0:
+            log(f"   {written}/{metrics} metrics")
+    timings['metrics'] = time.perf_counter() - start
+    log(f"✅ {metrics} metrics in {timings['metrics']:.1f}s")
+
+    # Trend data
+    start = time.perf_counter()
+    trend_buckets = _Buckets(rng, idols * len(TREND_CATEGORIES), days, now)
+    for size in _chunks(trend_rows, chunk_size):
+        idol_ids = rng.integers(1, idols + 1, size=size)
+        categories = rng.integers(0, len(TREND_CATEGORIES), size=size)
+        scores = rng.uniform(0, 100, size=size).round(2).tolist()
+        ranks = rng.integers(1, 201, size=size).tolist()
+        dates, buckets = trend_buckets.dates((idol_ids - 1) * len(TREND_CATEGORIES) + categories)
+        idol_ids, categories = idol_ids.tolist(), categories.tolist()
+        _bulk_insert_partitioned(engine, TrendData, [
+            {
+                'idol_id': idol_ids[i],
+                'category': TREND_CATEGORIES[categories[i]],
+                'score': scores[i],
+                'rank': ranks[i],
+                'source': SOURCE,
+                'date': dates[i],
+                'bucket': buckets[i]
+            }
+            for i in range(size)
+        ])
+    timings['trend_data'] = time.perf_counter() - start
+    log(f"✅ {trend_rows} trend rows in {timings['trend_data']:.1f}s")
+
+    # Data sources; API sources get a key only when a stub upstream is available.
+    # executemany needs the same keys in every row
+    api_key = 'synthetic' if upstream_url else None
+    _bulk_insert(engine, DataSource.__table__, [
+        {'name': 'YouTube Data API', 'type': 'api', 'url': upstream_url, 'api_key': api_key, 'is_active': True},
+        {'name': 'Spotify Web API', 'type': 'api', 'url': upstream_url, 'api_key': api_key, 'is_active': True},
+        {'name': 'Instagram Graph API', 'type': 'api', 'url': None, 'api_key': None, 'is_active': True},
+        {'name': 'Twitter API v2', 'type': 'api', 'url': None, 'api_key': None, 'is_active': True},
+        {'name': 'TikTok API', 'type': 'api', 'url': None, 'api_key': None, 'is_active': True},
+        {'name': 'Chart Scraper', 'type': 'scraping', 'url': None, 'api_key': None, 'is_active': True},
+        {'name': 'Brand Reputation Scraper', 'type': 'scraping', 'url': None, 'api_key': None, 'is_active': True},
+        {'name': 'Trend Analysis', 'type': 'scraping', 'url': None, 'api_key': None, 'is_active': True},
+    ])
+
+    engine.dispose()
+    return {
+        'groups': groups,
+        'idols': idols,
+        'metrics': metrics,
+        'trend_rows': trend_rows,
+        'days': days,
+        'seed': seed,
+        'timings': timings
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark dataset")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--idols", type=int, default=5000)
+    parser.add_argument("--metrics", type=int, default=500000)
+    parser.add_argument("--trend-rows", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--upstream-url", default=None)
+    args = parser.parse_args()
+
+    generate_dataset(
+        args.database_url,
+        groups=args.groups,
+        idols=args.idols,
+        metrics=args.metrics,
+        trend_rows=args.trend_rows,
+        days=args.days,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        upstream_url=args.upstream_url
+    )
+
+
+if __name__ == "__main__":
+    main()
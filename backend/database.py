@@ -1,33 +1,70 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Database URL - use environment variable or default to SQLite for development
 DATABASE_URL = os.getenv(
-    "DATABASE_URL", 
+    "DATABASE_URL",
     "sqlite:///./kpop_ranking.db"
 )
 
+# Optional read replica for GET traffic; reads use the primary when unset
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL") or None
+
+# How long after a write committed by this process reads stay on the primary,
+# so a client never reads back older data than it just caused to be written
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "10"))
+
+ECHO = True if os.getenv("DEBUG", "False").lower() == "true" else False
+
 # Create engine
 engine = create_engine(
     DATABASE_URL,
-    echo=True if os.getenv("DEBUG", "False").lower() == "true" else False
+    echo=ECHO
 )
+read_engine = create_engine(READ_DATABASE_URL, echo=ECHO) if READ_DATABASE_URL else engine
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Create Base class
 Base = declarative_base()
 
+_last_write = None
+
+@event.listens_for(engine, "commit")
+def _record_write(conn):
+    global _last_write
+    _last_write = time.monotonic()
+
+def replica_is_fresh() -> bool:
+    """Whether reads may go to the replica: one is configured and no write is still replicating"""
+    if read_engine is engine:
+        return False
+    return _last_write is None or time.monotonic() - _last_write >= READ_AFTER_WRITE_SECONDS
+
+def ReadSessionLocal():
+    """Session for read-only work: the replica, or the primary right after a write"""
+    return ReplicaSessionLocal() if replica_is_fresh() else SessionLocal()
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# Dependency for read-only routes
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
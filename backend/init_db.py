@@ -1,27 +1,90 @@
 #!/usr/bin/env python3
 """
 Database initialization script for K-Pop Ranking Platform
-Creates sample data for testing and development
+Creates or migrates the schema and loads sample data for testing and development
+
+    python init_db.py            # migrate the schema, then add sample data if empty
+    python init_db.py --migrate  # migrate the schema only
+    python init_db.py --check-windows [--repair]  # compare rolling trend windows with trend_data
 """
 
+import argparse
 import asyncio
 import sys
 import os
 
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.engine import Engine
+
 # Add the backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal, engine
 from models import Base, Idol, Group, DataSource
 from services.data_collector import DataCollectorService
+from services.partitions import PARTITIONED, migrate_partitions
+from services import rolling_windows
+
+PARTITIONED_TABLES = [model.__table__ for model in PARTITIONED]
+
+def migrate_database(bind: Engine = engine):
+    """Bring the schema in line with models.py.
+    
+    Additive only: creates missing tables, then adds missing columns, indexes
+    and unique constraints to tables that already exist. Columns are added
+    as nullable, since existing rows have no value for them.
+    """
+    # Postgres parents of monthly partitions are created by migrate_partitions
+    native = bind.dialect.name == 'postgresql'
+    tables = [table for table in Base.metadata.sorted_tables
+              if not (native and table in PARTITIONED_TABLES)]
+    Base.metadata.create_all(bind=bind, tables=tables)
+    changes = []
+    
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                changes.append(f"{table.name}.{column.name}")
+        if 'change_log.version' in changes:
+            # Entries logged before versions were assigned at commit keep their id, so client cursors stay valid
+            conn.execute(text('UPDATE change_log SET version = id WHERE version IS NULL'))
+    
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in tables:
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            existing |= {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    changes.append(index.name)
+            # A unique index backs ON CONFLICT just like a table constraint,
+            # and unlike one it can be added to an existing SQLite table
+            for constraint in table.constraints:
+                if isinstance(constraint, UniqueConstraint) and constraint.name not in existing:
+                    columns = ', '.join(column.name for column in constraint.columns)
+                    conn.execute(text(f'CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})'))
+                    changes.append(constraint.name)
+    
+    # Metrics and trend data live in monthly partitions; move any rows written before that
+    with bind.begin() as conn:
+        changes.extend(migrate_partitions(conn))
+    
+    return changes
 
 def init_database():
     """Initialize the database with sample data"""
     print("🚀 Initializing K-Pop Ranking Platform Database...")
     
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created")
+    # Create or migrate the schema
+    changes = migrate_database()
+    print(f"✅ Database schema up to date ({len(changes)} changes applied)")
     
     # Create database session
     db = SessionLocal()
@@ -268,4 +331,32 @@ def init_database():
         db.close()
 
 if __name__ == "__main__":
-    init_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create or migrate the database schema and load sample data")
+    parser.add_argument("--migrate", action="store_true", help="Only migrate the schema; do not add sample data")
+    parser.add_argument("--check-windows", action="store_true",
+                        help="Check the rolling trend window aggregates against a full recomputation")
+    parser.add_argument("--repair", action="store_true", help="With --check-windows, rebuild them if they differ")
+    args = parser.parse_args()
+    
+    if args.check_windows:
+        db = SessionLocal()
+        try:
+            report = rolling_windows.verify(db)
+            for days, window in report['windows'].items():
+                print(f"{days:3d}-day window: {window['groups']} idol/category groups, {window['mismatched']} mismatched")
+            for mismatch in report['mismatches']:
+                print(f"❌ {mismatch}")
+            if not report['consistent'] and args.repair:
+                print(f"✅ Rebuilt from {rolling_windows.rebuild(db)} observations")
+                report['consistent'] = True
+            db.commit()
+        finally:
+            db.close()
+        sys.exit(0 if report['consistent'] else 1)
+    elif args.migrate:
+        for change in migrate_database():
+            print(f"✅ Added {change}")
+        print("✅ Database schema up to date")
+    else:
+        init_database()
+ 
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Per-request latency and database instrumentation.
+
+SQLAlchemy cursor events count queries and DB time into a context variable
+scoped to the current request; an HTTP middleware records per-route latency
+histograms and adds a Server-Timing header. Totals are exposed in Prometheus
+text format by ``render_prometheus``.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from fastapi import Request
+
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class RequestStats:
+    """Database work attributed to a single request"""
+
+    __slots__ = ("query_count", "db_time")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram"""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per-route latency, query count and DB time histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str, int], Histogram] = {}
+        self._db_time: Dict[Tuple[str, str], Histogram] = {}
+        self._queries: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe(self, method: str, route: str, status: int, latency: float, stats: RequestStats):
+        with self._lock:
+            key = (method, route)
+            self._histogram(self._latency, (method, route, status), LATENCY_BUCKETS).observe(latency)
+            self._histogram(self._db_time, key, LATENCY_BUCKETS).observe(stats.db_time)
+            self._histogram(self._queries, key, QUERY_COUNT_BUCKETS).observe(stats.query_count)
+
+    def _histogram(self, family: Dict, key: Tuple, bounds: Tuple[float, ...]) -> Histogram:
+        histogram = family.get(key)
+        if histogram is None:
+            histogram = family[key] = Histogram(bounds)
+        return histogram
+
+    def render_prometheus(self) -> str:
+        """Render all histograms in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            self._render_family(
+                lines, "http_request_duration_seconds", "Request latency by route",
+                self._latency, ("method", "route", "status")
+            )
+            self._render_family(
+                lines, "http_request_db_duration_seconds", "Time spent in the database per request",
+                self._db_time, ("method", "route")
+            )
+            self._render_family(
+                lines, "http_request_db_queries", "Database queries issued per request",
+                self._queries, ("method", "route")
+            )
+        return "\n".join(lines) + "\n"
+
+    def _render_family(self, lines: List[str], name: str, help_text: str,
+                       family: Dict[Tuple, Histogram], label_names: Tuple[str, ...]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, histogram in sorted(family.items()):
+            labels = ",".join(f'{label}="{value}"' for label, value in zip(label_names, key))
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+registry = MetricsRegistry()
+
+
+def instrument_engine(engine: Engine):
+    """Attribute every cursor execution on ``engine`` to the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.query_count += 1
+            stats.db_time += elapsed
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Record latency and DB usage for the request and report it as Server-Timing"""
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current_stats.reset(token)
+    latency = time.perf_counter() - start
+
+    # Label by route template, not raw path, to keep label cardinality bounded
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    registry.observe(request.method, route_path, response.status_code, latency, stats)
+
+    app_time = max(latency - stats.db_time, 0.0)
+    response.headers["Server-Timing"] = (
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.query_count} queries", '
+        f"app;dur={app_time * 1000:.2f}, "
+        f"total;dur={latency * 1000:.2f}"
+    )
+    return response
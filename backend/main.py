@@ -1,23 +1,45 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 from typing import List, Optional
-import uvicorn
+from datetime import datetime, timedelta
 
-from database import get_db, engine
-from models import Base
-from schemas import IdolResponse, RankingResponse, ComparisonResponse
-from services.ranking_service import RankingService
+from database import get_db, get_read_db, engine, read_engine, ReadSessionLocal, ReplicaSessionLocal
+from schemas import (
+    IdolResponse, IdolDetailResponse, RankingResponse, ComparisonResponse, RefreshRunResponse,
+    MoversResponse, GroupRankingResponse, SearchResult, ChangesResponse
+)
+from serializers import EncodedJSONResponse, FastJSONResponse, dumps
+from instrumentation import instrument_engine, metrics_middleware, registry
+from services.ranking_service import (
+    RankingService, CATEGORY_COLUMNS, TREND_INTERVALS, MAX_TREND_SERIES_IDOLS, MAX_TREND_POINTS
+)
 from services.data_collector import DataCollectorService
+from services.search_index import SearchIndex
+from services.idol_documents import DETAIL, TRENDS, TREND_WINDOW_DAYS
+from services.ranking_stream import RankingBroadcaster
+from services.change_log import get_changes
+from services.single_flight import SingleFlight
+
+# The schema is managed by init_db.py (``python init_db.py --migrate``), not on import
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop the ranking stream poll loop and the chart parser processes
+    try:
+        await ranking_broadcaster.stop()
+    finally:
+        data_collector.close()
 
 app = FastAPI(
     title="K-Pop Ranking Platform API",
     description="Unified platform for K-Pop idol and group rankings",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -27,72 +49,224 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-route latency and query-count instrumentation
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
+app.middleware("http")(metrics_middleware)
+
 # Initialize services
 ranking_service = RankingService()
-data_collector = DataCollectorService()
+# Shares the ranking service so a refresh swaps in the new in-memory leaderboard
+data_collector = DataCollectorService(ranking_service)
+search_index = SearchIndex()
+# Only announce snapshots the replica can already serve
+ranking_broadcaster = RankingBroadcaster(ReplicaSessionLocal)
+read_flight = SingleFlight()
+
+def _encoded_read(method, params: dict) -> Optional[bytes]:
+    """Run a RankingService read in its own session and encode the result once"""
+    db = ReadSessionLocal()
+    try:
+        result = method(db, **params)
+    finally:
+        db.close()
+    return None if result is None else dumps(result)
+
+async def coalesced_read(method, **params) -> Optional[bytes]:
+    """Encoded result of ``method(db, **params)``, shared by concurrent identical requests"""
+    key = (method.__name__,) + tuple(sorted(params.items()))
+    return await read_flight.do(key, _encoded_read, method, params)
+
+def check_category(category: Optional[str]):
+    """Reject unknown leaderboard categories before they reach the caches"""
+    if category is not None and category not in CATEGORY_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"category must be one of {', '.join(CATEGORY_COLUMNS)}")
 
 @app.get("/")
 async def root():
     return {"message": "K-Pop Ranking Platform API", "version": "1.0.0"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Expose request and database metrics in Prometheus text format"""
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/rankings", response_model=List[RankingResponse])
 async def get_rankings(
     category: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    offset: int = 0,
+    as_of: Optional[datetime] = None,
+    group: Optional[str] = None,
+    gender: Optional[str] = None
+):
+    """Get current rankings, or the leaderboard as it stood at a past date"""
+    try:
+        check_category(category)
+        rankings = await coalesced_read(
+            ranking_service.get_current_rankings, category=category, limit=limit, offset=offset, as_of=as_of,
+            group=group, gender=gender
+        )
+        return EncodedJSONResponse(rankings)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/rankings/stream")
+async def stream_rankings(request: Request, category: str = "overall"):
+    """Server-Sent Events: changed ranks are pushed whenever a new snapshot is published"""
+    check_category(category)
+    return StreamingResponse(
+        ranking_broadcaster.stream(category, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/rankings/movers", response_model=MoversResponse)
+async def get_ranking_movers(
+    category: str = "overall",
+    limit: int = 10
+):
+    """Get the biggest rank risers and fallers since the previous snapshot"""
+    try:
+        check_category(category)
+        movers = await coalesced_read(ranking_service.get_movers, category=category, limit=limit)
+        if movers is None:
+            raise HTTPException(status_code=404, detail="No ranking snapshot found")
+        return EncodedJSONResponse(movers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/groups/rankings", response_model=List[GroupRankingResponse])
+async def get_group_rankings(
+    category: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    as_of: Optional[datetime] = None
 ):
-    """Get current rankings with optional filtering"""
+    """Get group leaderboards aggregated from member scores"""
     try:
-        rankings = ranking_service.get_current_rankings(db, category=category, limit=limit)
-        return rankings
+        check_category(category)
+        rankings = await coalesced_read(
+            ranking_service.get_group_rankings, category=category, limit=limit, offset=offset, as_of=as_of
+        )
+        return EncodedJSONResponse(rankings)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/idols", response_model=List[IdolResponse])
 async def get_idols(
     group: Optional[str] = None,
-    gender: Optional[str] = None,
-    db: Session = Depends(get_db)
+    gender: Optional[str] = None
 ):
     """Get all idols with optional filtering"""
     try:
-        idols = ranking_service.get_idols(db, group=group, gender=gender)
-        return idols
+        idols = await coalesced_read(ranking_service.get_idols, group=group, gender=gender)
+        return EncodedJSONResponse(idols)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/idols/{idol_id}", response_model=IdolResponse)
-async def get_idol(idol_id: int, db: Session = Depends(get_db)):
-    """Get specific idol details"""
+@app.get("/api/search", response_model=List[SearchResult])
+async def search_idols(q: str, limit: int = 20, db: Session = Depends(get_read_db)):
+    """Fuzzy search over idol names, real names, groups and companies"""
     try:
-        idol = ranking_service.get_idol_by_id(db, idol_id)
-        if not idol:
+        # Incremental: only idols changed since the last sync are re-indexed
+        search_index.sync(db)
+        return FastJSONResponse(search_index.search(q, limit=min(limit, 100)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/idols/{idol_id}", response_model=IdolDetailResponse)
+async def get_idol(idol_id: int, db: Session = Depends(get_read_db)):
+    """Get specific idol details with current rankings and a trend summary"""
+    try:
+        document = ranking_service.get_idol_document(db, DETAIL, idol_id)
+        if not document:
             raise HTTPException(status_code=404, detail="Idol not found")
-        return idol
+        return EncodedJSONResponse(document)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/compare/{idol1_id}/{idol2_id}", response_model=ComparisonResponse)
-async def compare_idols(idol1_id: int, idol2_id: int, db: Session = Depends(get_db)):
+async def compare_idols(idol1_id: int, idol2_id: int, db: Session = Depends(get_read_db)):
     """Compare two idols side by side"""
     try:
         comparison = ranking_service.compare_idols(db, idol1_id, idol2_id)
         if not comparison:
             raise HTTPException(status_code=404, detail="One or both idols not found")
-        return comparison
+        return FastJSONResponse(comparison)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/trends")
+async def get_trend_series(
+    ids: str,
+    days: int = 30,
+    interval: str = "day",
+    category: Optional[str] = None
+):
+    """Trend series for several idols (``ids=1,2,3``) resampled onto one shared time axis"""
+    try:
+        try:
+            idol_ids = tuple(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be a comma-separated list of idol ids")
+        if not idol_ids or len(idol_ids) > MAX_TREND_SERIES_IDOLS:
+            raise HTTPException(status_code=400, detail=f"Pass between 1 and {MAX_TREND_SERIES_IDOLS} idol ids")
+        if interval not in TREND_INTERVALS:
+            raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(TREND_INTERVALS)}")
+        if days < 1 or timedelta(days=days) // TREND_INTERVALS[interval] > MAX_TREND_POINTS:
+            raise HTTPException(status_code=400, detail=f"Requested range exceeds {MAX_TREND_POINTS} points")
+        check_category(category)
+
+        series = await coalesced_read(
+            ranking_service.get_trend_series, idol_ids=idol_ids, days=days, interval=interval, category=category
+        )
+        if series is None:
+            raise HTTPException(status_code=404, detail="Idols not found")
+        return EncodedJSONResponse(series)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/trends/{idol_id}")
-async def get_idol_trends(idol_id: int, days: int = 30, db: Session = Depends(get_db)):
+async def get_idol_trends(idol_id: int, days: int = 30, db: Session = Depends(get_read_db)):
     """Get trend data for a specific idol"""
     try:
+        if days == TREND_WINDOW_DAYS:
+            document = ranking_service.get_idol_document(db, TRENDS, idol_id)
+            if not document:
+                raise HTTPException(status_code=404, detail="Trend data not found")
+            return EncodedJSONResponse(document)
+        
         trends = ranking_service.get_idol_trends(db, idol_id, days)
         if not trends:
             raise HTTPException(status_code=404, detail="Trend data not found")
         return trends
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/changes", response_model=ChangesResponse)
+async def get_change_feed(since: Optional[int] = None, limit: int = 1000, db: Session = Depends(get_read_db)):
+    """Idols, groups and ranking snapshots added, updated or deleted after change version ``since``"""
+    try:
+        return FastJSONResponse(get_changes(db, since, limit=max(1, min(limit, 5000))))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -100,13 +274,44 @@ async def get_idol_trends(idol_id: int, days: int = 30, db: Session = Depends(ge
 async def refresh_data(db: Session = Depends(get_db)):
     """Manually trigger data refresh from all sources"""
     try:
-        result = await data_collector.refresh_all_data(db)
-        return {"message": "Data refresh completed", "updated_count": result}
+        run = await data_collector.refresh_all_data(db)
+        # Push the new snapshot to stream subscribers without waiting for the next poll
+        ranking_broadcaster.notify()
+        return {
+            "message": "Data refresh completed",
+            "updated_count": run["updated_count"],
+            "run": run
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/refresh-runs", response_model=List[RefreshRunResponse])
+async def get_refresh_runs(
+    limit: int = 20,
+    source: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get recent refresh runs with per-source telemetry"""
+    try:
+        return data_collector.get_refresh_runs(db, limit=limit, source=source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/refresh-runs/{run_id}", response_model=RefreshRunResponse)
+async def get_refresh_run(run_id: int, db: Session = Depends(get_read_db)):
+    """Get a single refresh run with per-source telemetry"""
+    try:
+        run = data_collector.get_refresh_run(db, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail="Refresh run not found")
+        return run
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/stats")
-async def get_platform_stats(db: Session = Depends(get_db)):
+async def get_platform_stats(db: Session = Depends(get_read_db)):
     """Get platform statistics"""
     try:
         stats = ranking_service.get_platform_stats(db)
@@ -115,4 +320,5 @@ async def get_platform_stats(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
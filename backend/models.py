@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -18,6 +18,7 @@ class Group(Base):
     
     # Relationships
     idols = relationship("Idol", back_populates="group")
+    rankings = relationship("GroupRanking", back_populates="group")
 
 class Idol(Base):
     __tablename__ = "idols"
@@ -59,11 +60,52 @@ class Ranking(Base):
     brand_score = Column(Float)
     search_score = Column(Float)
     award_score = Column(Float)
+    version = Column(Integer, index=True)  # recalculation that produced this row, shared by all categories
     date = Column(DateTime, default=func.now(), nullable=False)
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
     idol = relationship("Idol", back_populates="rankings")
+    
+    __table_args__ = (
+        Index("ix_rankings_category_version_rank", "category", "version", "rank"),
+        Index("ix_rankings_version_idol", "version", "idol_id"),
+    )
+
+class GroupRanking(Base):
+    __tablename__ = "group_rankings"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    category = Column(String(50), nullable=False)  # same categories as idol rankings
+    rank = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    member_count = Column(Integer, nullable=False)
+    aggregation = Column(String(20), nullable=False)  # mean, max, weighted
+    version = Column(Integer, index=True)  # matches the idol ranking snapshot version
+    date = Column(DateTime, default=func.now(), nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    
+    # Relationships
+    group = relationship("Group", back_populates="rankings")
+    
+    __table_args__ = (
+        Index("ix_group_rankings_category_version_rank", "category", "version", "rank"),
+    )
+
+class RankingSnapshot(Base):
+    __tablename__ = "ranking_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, nullable=False, index=True)
+    category = Column(String(50), nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+    row_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index("ix_ranking_snapshots_category_computed_at", "category", "computed_at"),
+    )
 
 class TrendData(Base):
     __tablename__ = "trend_data"
@@ -73,11 +115,56 @@ class TrendData(Base):
     category = Column(String(50), nullable=False)  # music, social, streaming, etc.
     score = Column(Float, nullable=False)
     rank = Column(Integer)
+    source = Column(String(100))  # melon, instagram, spotify, etc.
     date = Column(DateTime, default=func.now(), nullable=False)
+    bucket = Column(DateTime)  # start of the ingestion bucket ``date`` falls in
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
     idol = relationship("Idol", back_populates="trend_data")
+    
+    __table_args__ = (
+        UniqueConstraint("idol_id", "category", "source", "bucket", name="uq_trend_data_observation"),
+        Index("ix_trend_data_idol_date", "idol_id", "date"),
+    )
+
+class TrendDailyStat(Base):
+    __tablename__ = "trend_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idol_id = Column(Integer, ForeignKey("idols.id"), nullable=False)
+    category = Column(String(50), nullable=False)
+    day = Column(DateTime, nullable=False)  # midnight of the day the observations fall in
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_count = Column(Integer, nullable=False, default=0)
+    score_sq_sum = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("idol_id", "category", "day", name="uq_trend_daily_stats"),
+        Index("ix_trend_daily_stats_day", "day"),
+    )
+
+class TrendWindowStat(Base):
+    __tablename__ = "trend_window_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idol_id = Column(Integer, ForeignKey("idols.id"), nullable=False)
+    category = Column(String(50), nullable=False)
+    window_days = Column(Integer, nullable=False)  # 7, 30 or 90
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_count = Column(Integer, nullable=False, default=0)
+    score_sq_sum = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("window_days", "idol_id", "category", name="uq_trend_window_stats"),
+    )
+
+class TrendWindow(Base):
+    __tablename__ = "trend_windows"
+
+    window_days = Column(Integer, primary_key=True)
+    start = Column(DateTime, nullable=False)  # first day currently counted in the window
+    rebuilt_at = Column(DateTime)
 
 class Metric(Base):
     __tablename__ = "metrics"
@@ -88,10 +175,15 @@ class Metric(Base):
     value = Column(Float, nullable=False)
     date = Column(DateTime, default=func.now(), nullable=False)
     source = Column(String(100))  # api, scraping, manual
+    bucket = Column(DateTime)  # start of the ingestion bucket ``date`` falls in
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
     idol = relationship("Idol", back_populates="metrics")
+    
+    __table_args__ = (
+        UniqueConstraint("idol_id", "metric_type", "source", "bucket", name="uq_metrics_observation"),
+    )
 
 class Trend(Base):
     __tablename__ = "trends"
@@ -101,11 +193,46 @@ class Trend(Base):
     trend_type = Column(String(50), nullable=False)  # ranking, followers, streams, etc.
     value = Column(Float, nullable=False)
     change = Column(Float)  # change from previous period
+    version = Column(Integer)  # ranking snapshot version for ranking-derived trends
     date = Column(DateTime, default=func.now(), nullable=False)
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
     idol = relationship("Idol", back_populates="trends")
+    
+    __table_args__ = (
+        Index("ix_trends_type_version", "trend_type", "version"),
+        Index("ix_trends_version_idol", "version", "idol_id"),
+    )
+
+class IdolDocument(Base):
+    __tablename__ = "idol_documents"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    idol_id = Column(Integer, ForeignKey("idols.id"), nullable=False)
+    kind = Column(String(20), nullable=False)  # detail, trends
+    version = Column(Integer)  # ranking snapshot version the document was built from
+    payload = Column(Text, nullable=False)  # encoded JSON response body
+    computed_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("kind", "idol_id", name="uq_idol_documents_kind_idol"),
+    )
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(30), nullable=False)  # idol, group, ranking_snapshot
+    entity_id = Column(Integer, nullable=False)  # snapshot version for ranking_snapshot
+    op = Column(String(10), nullable=False)  # insert, update, delete
+    changed_at = Column(DateTime, nullable=False, index=True)
+    version = Column(Integer)  # the sync cursor; assigned at commit, so it grows in commit order
+
+    __table_args__ = (
+        Index("ix_change_log_entity", "entity", "entity_id"),
+        Index("ix_change_log_version", "version", unique=True),
+    )
 
 class DataSource(Base):
     __tablename__ = "data_sources"
@@ -128,4 +255,37 @@ class PlatformConfig(Base):
     value = Column(Text)
     description = Column(Text)
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class RefreshRun(Base):
+    __tablename__ = "refresh_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False)  # success, partial, failed
+    started_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    updated_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now())
+    
+    # Relationships
+    sources = relationship("RefreshSourceStat", back_populates="run", order_by="RefreshSourceStat.id")
+
+class RefreshSourceStat(Base):
+    __tablename__ = "refresh_source_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("refresh_runs.id"), nullable=False, index=True)
+    source_name = Column(String(100), nullable=False, index=True)
+    source_type = Column(String(50))
+    duration_seconds = Column(Float)
+    requests_made = Column(Integer, default=0)
+    rows_written = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    errors_by_type = Column(Text)  # JSON object: exception type -> count
+    last_error = Column(Text)
+    rate_limit_wait_seconds = Column(Float, default=0.0)
+    created_at = Column(DateTime, default=func.now())
+    
+    # Relationships
+    run = relationship("RefreshRun", back_populates="sources")
@@ -79,6 +79,23 @@ class IdolResponse(IdolBase):
     class Config:
         from_attributes = True
 
+class IdolCategoryRanking(BaseModel):
+    rank: int
+    score: float
+    rank_change: Optional[int] = None
+
+class TrendCategorySummary(BaseModel):
+    points: int
+    latest_score: float
+    average_score: float
+    latest_date: datetime
+
+class IdolDetailResponse(IdolResponse):
+    rankings: Dict[str, IdolCategoryRanking] = {}
+    trend_summary: Dict[str, TrendCategorySummary] = {}
+    version: Optional[int] = None
+    computed_at: Optional[datetime] = None
+
 
 # Ranking schemas
 class RankingBase(BaseModel):
@@ -105,11 +122,73 @@ class RankingResponse(RankingBase):
     class Config:
         from_attributes = True
 
+class RankingMover(BaseModel):
+    idol: Optional[IdolResponse] = None
+    rank: int
+    previous_rank: int
+    rank_change: int
+    score: Optional[float] = None
+    score_change: Optional[float] = None
+
+class MoversResponse(BaseModel):
+    category: str
+    version: int
+    risers: List[RankingMover]
+    fallers: List[RankingMover]
+
+class GroupRankingResponse(BaseModel):
+    id: int
+    group_id: int
+    category: str
+    rank: int = Field(..., ge=1)
+    score: float = Field(..., ge=0, le=100)
+    member_count: int
+    aggregation: str
+    version: Optional[int] = None
+    date: datetime
+    created_at: datetime
+    group: GroupNested
+
+    class Config:
+        from_attributes = True
+
+# Search schemas
+class SearchGroup(BaseModel):
+    id: int
+    name: str
+
+class SearchResult(BaseModel):
+    id: int
+    name: str
+    stage_name: Optional[str] = None
+    real_name: Optional[str] = None
+    company: Optional[str] = None
+    group: Optional[SearchGroup] = None
+    score: float
+    matched_field: str
+
+# Change feed schemas
+class ChangeEntry(BaseModel):
+    version: int
+    entity: str  # idol, group, ranking_snapshot
+    id: int
+    op: str  # insert, update, delete
+    changed_at: datetime
+    data: Optional[Dict[str, Any]] = None
+
+class ChangesResponse(BaseModel):
+    since: Optional[int] = None
+    version: int
+    reset: bool
+    has_more: bool
+    changes: List[ChangeEntry]
+
 # TrendData schemas
 class TrendDataBase(BaseModel):
     category: str = Field(..., max_length=50)
     score: float = Field(..., ge=0, le=100)
     rank: Optional[int] = Field(None, ge=1)
+    source: Optional[str] = Field(None, max_length=100)
 
 class TrendDataCreate(TrendDataBase):
     idol_id: int
@@ -211,4 +290,25 @@ class ConfigResponse(ConfigBase):
     updated_at: datetime
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+# Refresh telemetry schemas
+class RefreshSourceStatResponse(BaseModel):
+    source_name: str
+    source_type: Optional[str] = None
+    duration_seconds: Optional[float] = None
+    requests_made: int = 0
+    rows_written: int = 0
+    error_count: int = 0
+    errors_by_type: Dict[str, int] = {}
+    last_error: Optional[str] = None
+    rate_limit_wait_seconds: float = 0.0
+
+class RefreshRunResponse(BaseModel):
+    id: int
+    status: str
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    updated_count: int = 0
+    sources: List[RefreshSourceStatResponse] = []
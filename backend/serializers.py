@@ -0,0 +1,116 @@
+"""
+Fast serialization layer for API responses.
+
+Builds response dicts straight from column tuples returned by
+``db.query(*columns)`` and encodes them with orjson, so hot endpoints can
+skip FastAPI's per-request ``response_model`` validation. The shapes
+produced here mirror the schemas in ``schemas.py``.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi.responses import JSONResponse, Response
+
+from models import Idol, Group, Ranking, GroupRanking
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+
+# Field order matters: rows are sliced positionally, never looked up by name
+GROUP_FIELDS = ("id", "name", "company", "debut_date", "is_active", "image_url")
+
+IDOL_FIELDS = (
+    "id", "name", "stage_name", "real_name", "group_id", "company", "gender",
+    "position", "birth_date", "nationality", "is_soloist", "is_active",
+    "image_url", "created_at", "updated_at",
+)
+
+RANKING_FIELDS = (
+    "id", "idol_id", "category", "rank", "score", "total_score", "music_score",
+    "social_score", "brand_score", "search_score", "award_score", "date",
+    "created_at",
+)
+
+GROUP_RANKING_FIELDS = (
+    "id", "group_id", "category", "rank", "score", "member_count", "aggregation",
+    "version", "date", "created_at",
+)
+
+GROUP_COLUMNS = tuple(getattr(Group, field).label(f"group_{field}") for field in GROUP_FIELDS)
+IDOL_COLUMNS = tuple(getattr(Idol, field).label(f"idol_{field}") for field in IDOL_FIELDS)
+RANKING_COLUMNS = tuple(getattr(Ranking, field).label(f"ranking_{field}") for field in RANKING_FIELDS)
+GROUP_RANKING_COLUMNS = tuple(
+    getattr(GroupRanking, field).label(f"group_ranking_{field}") for field in GROUP_RANKING_FIELDS
+)
+
+_GROUP_WIDTH = len(GROUP_FIELDS)
+_IDOL_WIDTH = len(IDOL_FIELDS)
+_RANKING_WIDTH = len(RANKING_FIELDS)
+_GROUP_RANKING_WIDTH = len(GROUP_RANKING_FIELDS)
+
+
+def group_from_row(values: Sequence[Any]) -> Optional[Dict[str, Any]]:
+    """Build a GroupNested dict; an outer join with no match yields None"""
+    if values[0] is None:
+        return None
+    return dict(zip(GROUP_FIELDS, values))
+
+
+def idol_from_row(row: Sequence[Any], offset: int = 0) -> Dict[str, Any]:
+    """Build an IdolResponse dict from a row laid out as IDOL_COLUMNS + GROUP_COLUMNS"""
+    idol_end = offset + _IDOL_WIDTH
+    idol = dict(zip(IDOL_FIELDS, row[offset:idol_end]))
+    idol["group"] = group_from_row(row[idol_end:idol_end + _GROUP_WIDTH])
+    return idol
+
+
+def ranking_from_row(row: Sequence[Any]) -> Dict[str, Any]:
+    """Build a RankingResponse dict from a row laid out as
+    RANKING_COLUMNS + IDOL_COLUMNS + GROUP_COLUMNS"""
+    ranking = dict(zip(RANKING_FIELDS, row[:_RANKING_WIDTH]))
+    ranking["idol"] = idol_from_row(row, _RANKING_WIDTH)
+    return ranking
+
+
+def group_ranking_from_row(row: Sequence[Any]) -> Dict[str, Any]:
+    """Build a GroupRankingResponse dict from a row laid out as
+    GROUP_RANKING_COLUMNS + GROUP_COLUMNS"""
+    ranking = dict(zip(GROUP_RANKING_FIELDS, row[:_GROUP_RANKING_WIDTH]))
+    ranking["group"] = group_from_row(row[_GROUP_RANKING_WIDTH:_GROUP_RANKING_WIDTH + _GROUP_WIDTH])
+    return ranking
+
+
+def _default(value: Any) -> Any:
+    """Fallback encoder hook for the stdlib json module"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class EncodedJSONResponse(Response):
+    """Response for a body that is already JSON-encoded, e.g. a precomputed document"""
+
+    media_type = "application/json"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Returning this from a route bypasses ``response_model`` validation; the
+    route's ``response_model`` is then only used for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,200 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, event, func, insert, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models import ChangeLog, Group, Idol, RankingSnapshot
+from serializers import IDOL_COLUMNS, GROUP_COLUMNS, GROUP_FIELDS, idol_from_row
+from services.platform_config import get_config_value
+
+
+IDOL = 'idol'
+GROUP = 'group'
+RANKING_SNAPSHOT = 'ranking_snapshot'
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+# ORM classes whose unit-of-work changes are logged automatically
+TRACKED = {Idol: IDOL, Group: GROUP}
+
+RETENTION_CONFIG_KEY = 'change_log_retention_days'
+DEFAULT_RETENTION_DAYS = 30
+
+# Session.info flag: this transaction logged entries that still need a version
+_PENDING = 'change_log_pending'
+# Postgres advisory lock serializing version assignment between committing transactions
+VERSION_LOCK_KEY = 0x6b706f70
+
+
+def record_changes(db: Session, entity: str, entity_ids: Iterable[int], op: str):
+    """Log changes made outside the ORM unit of work, e.g. bulk ``insert()`` statements.
+
+    Runs in the caller's transaction, so the entries commit or roll back
+    with the change itself.
+    """
+    now = datetime.now()
+    rows = [{'entity': entity, 'entity_id': entity_id, 'op': op, 'changed_at': now} for entity_id in entity_ids]
+    if rows:
+        db.connection().execute(insert(ChangeLog.__table__), rows)
+        db.info[_PENDING] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _log_flushed_changes(session: Session, flush_context):
+    """Record inserts, updates and deletes of tracked objects in the same flush"""
+    rows = []
+    now = datetime.now()
+    for objects, op in ((session.new, INSERT), (session.dirty, UPDATE), (session.deleted, DELETE)):
+        for obj in objects:
+            entity = TRACKED.get(type(obj))
+            if entity is None:
+                continue
+            if op == UPDATE and not session.is_modified(obj, include_collections=False):
+                continue
+            rows.append({'entity': entity, 'entity_id': obj.id, 'op': op, 'changed_at': now})
+
+    if rows:
+        session.connection().execute(insert(ChangeLog.__table__), rows)
+        session.info[_PENDING] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _version_pending_changes(session: Session):
+    """Give this transaction's entries their versions as the last step before it commits"""
+    # Commit flushes after this hook; flush now so entries logged by that flush are versioned too
+    session.flush()
+    if session.info.pop(_PENDING, False):
+        assign_versions(session.connection())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_pending_changes(session: Session):
+    session.info.pop(_PENDING, None)
+
+
+def assign_versions(conn: Connection) -> int:
+    """Number this transaction's unversioned entries after the highest committed version.
+
+    Versions are the sync cursor, so they must grow in commit order: ids
+    come from a sequence at insert time and a transaction that inserted
+    earlier can commit later, letting a client page past an entry that
+    was not yet visible. Here the number is taken under a lock held until
+    commit, so the next transaction can only number its entries once this
+    one is visible. SQLite allows one writer at a time, so a writing
+    transaction already holds that lock.
+    """
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': VERSION_LOCK_KEY})
+    table = ChangeLog.__table__
+    # Other transactions' uncommitted entries are invisible here
+    pending = conn.execute(select(table.c.id).where(table.c.version.is_(None)).order_by(table.c.id)).scalars().all()
+    if not pending:
+        return 0
+    latest = conn.execute(select(func.max(table.c.version))).scalar() or 0
+    conn.execute(
+        update(table).where(table.c.id == bindparam('entry_id')).values(version=bindparam('entry_version')),
+        [{'entry_id': entry_id, 'entry_version': latest + offset} for offset, entry_id in enumerate(pending, 1)]
+    )
+    return len(pending)
+
+
+def prune(db: Session, retention_days: Optional[int] = None) -> int:
+    """Drop entries older than the retention window; returns the number removed.
+
+    Clients whose cursor falls before the oldest remaining entry are told
+    to resync (see ``get_changes``). The newest entry is always kept, so
+    versions never restart from an empty log.
+    """
+    if retention_days is None:
+        retention_days = int(get_config_value(db, RETENTION_CONFIG_KEY, DEFAULT_RETENTION_DAYS))
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    newest = db.query(func.max(ChangeLog.version)).scalar()
+    if newest is None:
+        return 0
+    return db.query(ChangeLog).filter(
+        ChangeLog.changed_at < cutoff, ChangeLog.version < newest
+    ).delete(synchronize_session=False)
+
+
+def get_changes(db: Session, since: Optional[int], limit: int = 1000) -> Dict[str, Any]:
+    """Changes with a version above ``since``, oldest first, at most ``limit`` log entries.
+
+    Each entity appears once per page with its latest operation and its
+    current row (None once deleted). Page on with ``since=<version>`` while
+    ``has_more`` is true. ``reset`` means there is nothing to sync from
+    (``since`` is None) or the log no longer reaches back to ``since``:
+    fetch the full lists instead and resume from the returned ``version``.
+    """
+    oldest = db.query(func.min(ChangeLog.version)).scalar()
+    latest = db.query(func.max(ChangeLog.version)).scalar() or 0
+    if since is None or (oldest is not None and since < oldest - 1) or since > latest:
+        return {'since': since, 'version': latest, 'reset': True, 'has_more': False, 'changes': []}
+
+    entries = db.query(
+        ChangeLog.version, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op, ChangeLog.changed_at
+    ).filter(ChangeLog.version > since).order_by(ChangeLog.version).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Keep only the latest entry per entity, in the order it was last changed
+    latest_entries: Dict[tuple, Any] = OrderedDict()
+    for entry in entries:
+        key = (entry.entity, entry.entity_id)
+        latest_entries.pop(key, None)
+        latest_entries[key] = entry
+
+    data = _load(db, latest_entries.keys())
+    changes = [
+        {
+            'version': entry.version,
+            'entity': entry.entity,
+            'id': entry.entity_id,
+            'op': entry.op,
+            'changed_at': entry.changed_at,
+            'data': None if entry.op == DELETE else data.get(key)
+        }
+        for key, entry in latest_entries.items()
+    ]
+
+    return {
+        'since': since,
+        'version': entries[-1].version if entries else since,
+        'reset': False,
+        'has_more': has_more,
+        'changes': changes
+    }
+
+
+def _load(db: Session, keys: Iterable[tuple]) -> Dict[tuple, Any]:
+    """Current rows for the changed entities, one query per entity type"""
+    ids: Dict[str, List[int]] = {IDOL: [], GROUP: [], RANKING_SNAPSHOT: []}
+    for entity, entity_id in keys:
+        ids.setdefault(entity, []).append(entity_id)
+
+    data: Dict[tuple, Any] = {}
+    if ids[IDOL]:
+        rows = db.query(*IDOL_COLUMNS, *GROUP_COLUMNS).select_from(Idol).outerjoin(
+            Group, Group.id == Idol.group_id
+        ).filter(Idol.id.in_(ids[IDOL])).all()
+        for row in rows:
+            data[(IDOL, row[0])] = idol_from_row(row)
+
+    if ids[GROUP]:
+        rows = db.query(*GROUP_COLUMNS).filter(Group.id.in_(ids[GROUP])).all()
+        for row in rows:
+            data[(GROUP, row[0])] = dict(zip(GROUP_FIELDS, row))
+
+    if ids[RANKING_SNAPSHOT]:
+        rows = db.query(
+            RankingSnapshot.version, RankingSnapshot.category, RankingSnapshot.computed_at, RankingSnapshot.row_count
+        ).filter(RankingSnapshot.version.in_(ids[RANKING_SNAPSHOT])).order_by(RankingSnapshot.category)
+        for version, category, computed_at, row_count in rows:
+            snapshot = data.setdefault((RANKING_SNAPSHOT, version), {'version': version, 'categories': {}})
+            snapshot['categories'][category] = {'computed_at': computed_at, 'row_count': row_count}
+
+    return data
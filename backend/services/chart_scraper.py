@@ -0,0 +1,171 @@
+import asyncio
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# Markup of each chart page: rows are ``row`` elements carrying the given
+# attribute; each field is the first element in the row with that class.
+# Text under ``skip`` classes (hidden duplicates, rank-change badges) is ignored.
+CHART_LAYOUTS = {
+    'melon': {'row': ('tr', 'data-song-no'), 'rank': 'rank', 'song': 'rank01', 'artist': 'rank02',
+              'skip': ('checkEllipsis',)},
+    'genie': {'row': ('tr', 'songid'), 'rank': 'number', 'song': 'title', 'artist': 'artist',
+              'skip': ('rank', 'hide')},
+    'bugs': {'row': ('tr', 'trackid'), 'rank': 'ranking', 'song': 'title', 'artist': 'artist',
+             'skip': ('change',)},
+}
+FIELDS = ('rank', 'song', 'artist')
+
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+_NUMBER = re.compile(r'\d+')
+
+# Chart sites serve a reduced page (or none) to clients without a browser user agent
+HEADERS = {'User-Agent': 'Mozilla/5.0 (compatible; KPopRankingBot/1.0)'}
+
+
+class _ChartParser(HTMLParser):
+    """Collects the raw text of each field for every chart row"""
+
+    def __init__(self, layout: Dict[str, Any]):
+        super().__init__(convert_charrefs=True)
+        self.layout = layout
+        self.rows: List[Dict[str, str]] = []
+        self._stack: List[Tuple[str, Optional[str]]] = []
+        self._row: Optional[Dict[str, List[str]]] = None
+        self._field: Optional[str] = None
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            return
+        role = None
+        if self._row is None:
+            row_tag, row_attribute = self.layout['row']
+            if tag == row_tag and any(name == row_attribute for name, _ in attrs):
+                self._row = {}
+                role = 'row'
+        else:
+            classes = (dict(attrs).get('class') or '').split()
+            if self._field is None:
+                for field in FIELDS:
+                    if field not in self._row and self.layout[field] in classes:
+                        self._row[field] = []
+                        self._field = field
+                        role = 'field'
+                        break
+            elif any(name in classes for name in self.layout['skip']):
+                self._skip += 1
+                role = 'skip'
+        self._stack.append((tag, role))
+
+    def handle_endtag(self, tag):
+        # Chart pages are not always well formed; close back to the matching tag
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > index:
+            _, role = self._stack.pop()
+            if role == 'skip':
+                self._skip -= 1
+            elif role == 'field':
+                self._field = None
+            elif role == 'row':
+                self.rows.append({field: ' '.join(''.join(parts).split()) for field, parts in self._row.items()})
+                self._row = None
+                self._field = None
+                self._skip = 0
+
+    def handle_data(self, data):
+        if self._field is not None and not self._skip:
+            self._row[self._field].append(data)
+
+
+def parse_chart(chart: str, body: bytes, encoding: str = 'utf-8') -> List[Dict[str, Any]]:
+    """Normalized entries of one chart page: chart, rank, song, artist and a 0-100 score.
+
+    CPU-bound; runs in a worker process, so it only takes and returns plain data.
+    """
+    parser = _ChartParser(CHART_LAYOUTS[chart])
+    parser.feed(body.decode(encoding, errors='replace'))
+    parser.close()
+
+    entries = []
+    for row in parser.rows:
+        match = _NUMBER.search(row.get('rank', ''))
+        if match and row.get('song') and row.get('artist'):
+            entries.append({'chart': chart, 'rank': int(match.group()), 'song': row['song'], 'artist': row['artist']})
+
+    # Rank 1 scores 100, falling linearly to the bottom of the chart
+    size = max((entry['rank'] for entry in entries), default=0)
+    for entry in entries:
+        entry['score'] = round(100.0 * (size - entry['rank'] + 1) / size, 2)
+    return entries
+
+
+def split_artists(artist: str) -> List[str]:
+    """Individual names from a chart's artist credit, e.g. 'IU, SUGA' or 'A & B'"""
+    return [name.strip() for name in re.split(r',|&|\bfeat\.|\bwith\b', artist) if name.strip()]
+
+
+class ChartScraper:
+    """Fetches chart pages on the event loop and parses them in worker processes.
+
+    Parsing a 200-row chart page takes tens of milliseconds of pure Python;
+    done inline it would stall every other request served by the loop. The
+    pool is created on first use and reused across refreshes.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers import only this module, not the forked state of the API process
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    async def parse(self, chart: str, body: bytes, encoding: str = 'utf-8') -> List[Dict[str, Any]]:
+        return await asyncio.get_running_loop().run_in_executor(self.pool, parse_chart, chart, body, encoding)
+
+    async def parse_many(self, pages: Sequence[Tuple[str, bytes, str]]) -> List[List[Dict[str, Any]]]:
+        """Parse (chart, body, encoding) pages across the pool; results in input order"""
+        return await asyncio.gather(*(self.parse(*page) for page in pages))
+
+    async def scrape(self, session, urls: Dict[str, str], guard: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+        """Entries per chart, or the exception that chart failed with.
+
+        Each page is handed to the pool as soon as it arrives, so fetching
+        later pages overlaps with parsing earlier ones. With ``guard``, each
+        fetch goes through the UpstreamGuard it returns for the chart name.
+        """
+        async def fetch(url: str, call=None):
+            async with session.get(url, headers=HEADERS) as response:
+                if call is not None:
+                    call.record(response.status, response.headers.get('Retry-After'))
+                return response, await response.read()
+
+        async def scrape_one(chart: str, url: str) -> List[Dict[str, Any]]:
+            if guard is None:
+                response, body = await fetch(url)
+            else:
+                # Parsing happens outside the guard; it is not the upstream's latency
+                async with guard(chart).call() as call:
+                    response, body = await fetch(url, call)
+            response.raise_for_status()
+            return await self.parse(chart, body, response.charset or 'utf-8')
+
+        results = await asyncio.gather(*(scrape_one(chart, url) for chart, url in urls.items()), return_exceptions=True)
+        return dict(zip(urls, results))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
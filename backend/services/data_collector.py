@@ -1,434 +1,656 @@
 import asyncio
-import aiohttp
-import requests
+import logging
+from sqlalchemy import false, func, insert, text, update
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-import pandas as pd
-import numpy as np
 
-from models import Idol, Metric, Trend, DataSource, Group, Ranking, TrendData
+from models import Idol, Trend, DataSource, Group, GroupRanking, Ranking, RankingSnapshot
 from services.ranking_service import RankingService
+from services.platform_config import get_config_value
+from services.ingestion import get_bucket_minutes, upsert_metrics, upsert_trend_data
+from services.partitions import drop_expired
+from services import rolling_windows
+from services.change_log import INSERT, RANKING_SNAPSHOT, prune as prune_change_log, record_changes
+from services.refresh_telemetry import RefreshTelemetry, SourceTelemetry, get_refresh_runs, get_refresh_run
+from services.chart_scraper import CHART_LAYOUTS, ChartScraper, split_artists
+from services.upstream_guard import CircuitOpenError, GuardedCall, UpstreamGuard
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from services.scoring_engine import ScoringEngine
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Postgres advisory lock held by a ranking run from picking its version until commit
+RANKING_VERSION_LOCK_KEY = 0x6b706f71
+
 class DataCollectorService:
     """Service class for collecting and updating K-Pop data from various sources"""
     
-    def __init__(self):
-        self.ranking_service = RankingService()
+    def __init__(self, ranking_service: Optional[RankingService] = None):
+        self.ranking_service = ranking_service or RankingService()
+        self._scoring_engine = None
         self.session = None
+        self.rate_limit_interval = float(os.getenv('UPSTREAM_RATE_LIMIT_SECONDS', '0.1'))
+        self.idol_batch_size = int(os.getenv('COLLECTOR_BATCH_SIZE', '1000'))
+        # Per-source circuit breakers; concurrency adapts between 1 and the maximum
+        self.upstream_max_concurrency = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', '8'))
+        self.upstream_cooldown = float(os.getenv('UPSTREAM_CIRCUIT_COOLDOWN_SECONDS', '30'))
+        self.upstream_timeout = float(os.getenv('UPSTREAM_TIMEOUT_SECONDS', '10'))
+        self.upstream_guards: Dict[str, UpstreamGuard] = {}
+        # Chart pages are only fetched when enabled; otherwise chart data is simulated
+        self.chart_scraping = os.getenv('CHART_SCRAPING', 'False').lower() == 'true'
+        self.chart_parse_workers = int(os.getenv('CHART_PARSE_WORKERS', '0')) or None
+        self._chart_scraper = None
+        # Base URLs can be overridden, e.g. to point at a local stub upstream
         self.data_sources = {
-            'melon': 'https://www.melon.com/chart/index.htm',
-            'genie': 'https://www.genie.co.kr/chart/top200',
-            'bugs': 'https://music.bugs.co.kr/chart',
-            'spotify': 'https://api.spotify.com/v1',
-            'youtube': 'https://www.googleapis.com/youtube/v3',
-            'instagram': 'https://graph.instagram.com',
-            'twitter': 'https://api.twitter.com/2'
+            'melon': os.getenv('MELON_CHART_URL', 'https://www.melon.com/chart/index.htm'),
+            'genie': os.getenv('GENIE_CHART_URL', 'https://www.genie.co.kr/chart/top200'),
+            'bugs': os.getenv('BUGS_CHART_URL', 'https://music.bugs.co.kr/chart'),
+            'spotify': os.getenv('SPOTIFY_API_URL', 'https://api.spotify.com/v1'),
+            'youtube': os.getenv('YOUTUBE_API_URL', 'https://www.googleapis.com/youtube/v3'),
+            'instagram': os.getenv('INSTAGRAM_API_URL', 'https://graph.instagram.com'),
+            'twitter': os.getenv('TWITTER_API_URL', 'https://api.twitter.com/2')
         }
         
+    @property
+    def scoring_engine(self) -> "ScoringEngine":
+        """Created on first use; NumPy and pandas are only imported when scoring"""
+        if self._scoring_engine is None:
+            from services.scoring_engine import ScoringEngine
+            self._scoring_engine = ScoringEngine()
+        return self._scoring_engine
+        
+    @property
+    def chart_scraper(self) -> ChartScraper:
+        """Created on first use; the parser process pool starts with the first scrape"""
+        if self._chart_scraper is None:
+            self._chart_scraper = ChartScraper(self.chart_parse_workers)
+        return self._chart_scraper
+    
+    def close(self):
+        """Stop chart parser worker processes, if any were started"""
+        if self._chart_scraper is not None:
+            self._chart_scraper.shutdown()
+        
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        import aiohttp
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.upstream_timeout))
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
     
-    async def refresh_all_data(self, db: Session) -> int:
-        """Refresh data from all active sources"""
-        updated_count = 0
+    async def refresh_all_data(self, db: Session) -> Dict[str, Any]:
+        """Refresh data from all active sources and persist a run record"""
+        telemetry = RefreshTelemetry()
         
-        # Get active data sources
-        data_sources = db.query(DataSource).filter(DataSource.is_active == True).all()
+        # Outside of ``async with`` there is no HTTP session yet; own one for this run
+        owns_session = self.session is None
+        if owns_session:
+            import aiohttp
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.upstream_timeout))
         
-        for source in data_sources:
-            try:
-                if source.type == "api":
-                    count = await self._collect_from_api(db, source)
-                elif source.type == "scraping":
-                    count = await self._collect_from_scraping(db, source)
-                else:
+        try:
+            # Get active data sources
+            data_sources = db.query(DataSource).filter(DataSource.is_active == True).all()
+            
+            for source in data_sources:
+                if source.type not in ("api", "scraping"):
                     continue
-                    
-                updated_count += count
                 
-                # Update last_updated timestamp
-                source.last_updated = datetime.now()
-                db.commit()
+                with telemetry.source(source) as stats:
+                    if source.type == "api":
+                        count = await self._collect_from_api(db, source, stats)
+                    else:
+                        count = await self._collect_from_scraping(db, source, stats)
+                    
+                    stats.record_rows(count)
+                    
+                    # Update last_updated timestamp
+                    source.last_updated = datetime.now()
+                    db.commit()
                 
-            except Exception as e:
-                print(f"Error collecting data from {source.name}: {str(e)}")
-                continue
+                if stats.failed:
+                    db.rollback()
+        finally:
+            if owns_session:
+                await self.session.close()
+                self.session = None
         
         # Recalculate rankings after data refresh
         await self._recalculate_rankings(db)
         
-        return updated_count
+        # Retention drops whole monthly partitions instead of deleting rows
+        try:
+            dropped = drop_expired(db)
+            if dropped:
+                # Dropped months may still have fallen inside a rolling window
+                rolling_windows.rebuild(db)
+            db.commit()
+            if dropped:
+                logger.info("Dropped expired partitions: %s", ", ".join(dropped))
+        except Exception as e:
+            db.rollback()
+            logger.warning("Partition retention failed: %s", e)
+        
+        run = telemetry.persist(db)
+        return telemetry.to_dict(run)
+    
+    def get_refresh_runs(self, db: Session, limit: int = 20, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get recent refresh runs with per-source telemetry"""
+        return get_refresh_runs(db, limit=limit, source=source)
+    
+    def get_refresh_run(self, db: Session, run_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single refresh run with per-source telemetry"""
+        return get_refresh_run(db, run_id)
+    
+    def _iter_idol_batches(self, db: Session, batch_size: Optional[int] = None) -> Iterator[List[Tuple[int, str, Optional[str]]]]:
+        """Active idols as (id, name, group name) tuples, in keyset-paginated batches.
+        
+        Plain tuples keep ORM objects out of the identity map, and each batch
+        is a fresh query, so callers can commit between batches.
+        """
+        batch_size = batch_size or self.idol_batch_size
+        last_id = 0
+        
+        while True:
+            batch = (
+                db.query(Idol.id, Idol.name, Group.name)
+                .outerjoin(Group, Group.id == Idol.group_id)
+                .filter(Idol.is_active == True, Idol.id > last_id)
+                .order_by(Idol.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
     
-    async def _collect_from_api(self, db: Session, source: DataSource) -> int:
+    async def _collect_from_api(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect data from API sources"""
         updated_count = 0
         
         if "youtube" in source.name.lower():
-            updated_count = await self._collect_youtube_data(db, source)
+            updated_count = await self._collect_youtube_data(db, source, stats)
         elif "spotify" in source.name.lower():
-            updated_count = await self._collect_spotify_data(db, source)
+            updated_count = await self._collect_spotify_data(db, source, stats)
         elif "instagram" in source.name.lower():
-            updated_count = await self._collect_instagram_data(db, source)
+            updated_count = await self._collect_instagram_data(db, source, stats)
         elif "twitter" in source.name.lower():
-            updated_count = await self._collect_twitter_data(db, source)
+            updated_count = await self._collect_twitter_data(db, source, stats)
         elif "tiktok" in source.name.lower():
-            updated_count = await self._collect_tiktok_data(db, source)
+            updated_count = await self._collect_tiktok_data(db, source, stats)
         
         return updated_count
     
-    async def _collect_from_scraping(self, db: Session, source: DataSource) -> int:
+    async def _collect_from_scraping(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect data from web scraping"""
         updated_count = 0
         
         if "chart" in source.name.lower():
-            updated_count = await self._collect_chart_data(db, source)
+            updated_count = await self._collect_chart_data(db, source, stats)
         elif "brand" in source.name.lower():
-            updated_count = await self._collect_brand_data(db, source)
+            updated_count = await self._collect_brand_data(db, source, stats)
         elif "trend" in source.name.lower():
-            updated_count = await self._collect_trend_data(db, source)
+            updated_count = await self._collect_trend_data(db, source, stats)
         
         return updated_count
     
-    async def _collect_youtube_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_youtube_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect YouTube data using YouTube Data API"""
         if not source.api_key:
             return 0
         
-        updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
+        source_name = source.name
         
-        for idol in idols:
-            try:
-                # Search for idol's YouTube channel
-                search_url = f"https://www.googleapis.com/youtube/v3/search"
-                params = {
-                    'part': 'snippet',
-                    'q': f"{idol.name} {idol.group or ''}",
-                    'type': 'channel',
-                    'key': source.api_key,
-                    'maxResults': 1
-                }
-                
-                async with self.session.get(search_url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('items'):
-                            channel_id = data['items'][0]['id']['channelId']
-                            
-                            # Get channel statistics
-                            stats_url = f"https://www.googleapis.com/youtube/v3/channels"
-                            stats_params = {
-                                'part': 'statistics',
-                                'id': channel_id,
-                                'key': source.api_key
-                            }
-                            
-                            async with self.session.get(stats_url, params=stats_params) as stats_response:
-                                if stats_response.status == 200:
-                                    stats_data = await stats_response.json()
-                                    if stats_data.get('items'):
-                                        stats = stats_data['items'][0]['statistics']
-                                        
-                                        # Save subscriber count
-                                        if 'subscriberCount' in stats:
-                                            metric = Metric(
-                                                idol_id=idol.id,
-                                                metric_type='youtube_subscribers',
-                                                value=float(stats['subscriberCount']),
-                                                source=source.name,
-                                                date=datetime.now()
-                                            )
-                                            db.add(metric)
-                                            updated_count += 1
-                                        
-                                        # Save view count
-                                        if 'viewCount' in stats:
-                                            metric = Metric(
-                                                idol_id=idol.id,
-                                                metric_type='youtube_views',
-                                                value=float(stats['viewCount']),
-                                                source=source.name,
-                                                date=datetime.now()
-                                            )
-                                            db.add(metric)
-                                            updated_count += 1
+        async def fetch(call: GuardedCall, idol_id: int, idol_name: str, group_name: Optional[str]) -> List[Dict[str, Any]]:
+            rows = []
+            # Search for idol's YouTube channel
+            search_url = f"{self.data_sources['youtube']}/search"
+            params = {
+                'part': 'snippet',
+                'q': f"{idol_name} {group_name or ''}",
+                'type': 'channel',
+                'key': source.api_key,
+                'maxResults': 1
+            }
+            
+            stats.record_request()
+            async with self.session.get(search_url, params=params) as response:
+                call.record(response.status, response.headers.get('Retry-After'))
+                if response.status != 200:
+                    stats.record_http_error(response.status, idol_name)
+                    return rows
+                data = await response.json()
+            if not data.get('items'):
+                return rows
+            channel_id = data['items'][0]['id']['channelId']
+            
+            # Get channel statistics
+            stats_url = f"{self.data_sources['youtube']}/channels"
+            stats_params = {
+                'part': 'statistics',
+                'id': channel_id,
+                'key': source.api_key
+            }
+            
+            stats.record_request()
+            async with self.session.get(stats_url, params=stats_params) as stats_response:
+                call.record(stats_response.status, stats_response.headers.get('Retry-After'))
+                if stats_response.status != 200:
+                    stats.record_http_error(stats_response.status, idol_name)
+                    return rows
+                stats_data = await stats_response.json()
+            if stats_data.get('items'):
+                channel_stats = stats_data['items'][0]['statistics']
                 
-                await asyncio.sleep(0.1)  # Rate limiting
+                # Save subscriber count
+                if 'subscriberCount' in channel_stats:
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'youtube_subscribers',
+                        'value': float(channel_stats['subscriberCount']),
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
                 
-            except Exception as e:
-                print(f"Error collecting YouTube data for {idol.name}: {str(e)}")
-                continue
+                # Save view count
+                if 'viewCount' in channel_stats:
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'youtube_views',
+                        'value': float(channel_stats['viewCount']),
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+            return rows
         
-        db.commit()
-        return updated_count
+        return await self._collect_guarded(db, source, stats, fetch)
     
-    async def _collect_spotify_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_spotify_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect Spotify data using Spotify Web API"""
         if not source.api_key:
             return 0
         
+        source_name = source.name
+        headers = {
+            'Authorization': f'Bearer {source.api_key}'
+        }
+        
+        async def fetch(call: GuardedCall, idol_id: int, idol_name: str, group_name: Optional[str]) -> List[Dict[str, Any]]:
+            # Search for idol's Spotify artist profile
+            search_url = f"{self.data_sources['spotify']}/search"
+            params = {
+                'q': f"{idol_name} {group_name or ''}",
+                'type': 'artist',
+                'limit': 1
+            }
+            
+            stats.record_request()
+            async with self.session.get(search_url, headers=headers, params=params) as response:
+                call.record(response.status, response.headers.get('Retry-After'))
+                if response.status != 200:
+                    stats.record_http_error(response.status, idol_name)
+                    return []
+                data = await response.json()
+            if not data.get('artists', {}).get('items'):
+                return []
+            artist = data['artists']['items'][0]
+            
+            # Get artist statistics
+            artist_url = f"{self.data_sources['spotify']}/artists/{artist['id']}"
+            stats.record_request()
+            async with self.session.get(artist_url, headers=headers) as artist_response:
+                call.record(artist_response.status, artist_response.headers.get('Retry-After'))
+                if artist_response.status != 200:
+                    stats.record_http_error(artist_response.status, idol_name)
+                    return []
+                artist_data = await artist_response.json()
+            
+            # Save follower count
+            if 'followers' not in artist_data:
+                return []
+            return [{
+                'idol_id': idol_id,
+                'metric_type': 'spotify_followers',
+                'value': float(artist_data['followers']['total']),
+                'source': source_name,
+                'date': datetime.now()
+            }]
+        
+        return await self._collect_guarded(db, source, stats, fetch)
+    
+    def upstream_guard(self, source_name: str) -> UpstreamGuard:
+        """Circuit breaker and concurrency limit for a source; kept across refresh runs"""
+        guard = self.upstream_guards.get(source_name)
+        if guard is None:
+            guard = UpstreamGuard(source_name, max_concurrency=self.upstream_max_concurrency,
+                                  cooldown=self.upstream_cooldown)
+            self.upstream_guards[source_name] = guard
+        return guard
+    
+    async def _collect_guarded(self, db: Session, source: DataSource, stats: SourceTelemetry, fetch) -> int:
+        """Run ``fetch(call, idol_id, idol_name, group_name)`` for every active idol and upsert the rows.
+        
+        Idols in a batch are fetched concurrently, up to the source's adaptive
+        limit. Once its circuit opens the remaining idols are skipped, so a
+        failing upstream costs a few requests instead of the whole run.
+        """
+        guard = self.upstream_guard(source.name)
+        bucket_minutes = get_bucket_minutes(db)
         updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
         
-        for idol in idols:
-            try:
-                # Search for idol's Spotify artist profile
-                search_url = "https://api.spotify.com/v1/search"
-                headers = {
-                    'Authorization': f'Bearer {source.api_key}'
-                }
-                params = {
-                    'q': f"{idol.name} {idol.group or ''}",
-                    'type': 'artist',
-                    'limit': 1
-                }
-                
-                async with self.session.get(search_url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('artists', {}).get('items'):
-                            artist = data['artists']['items'][0]
-                            
-                            # Get artist statistics
-                            artist_url = f"https://api.spotify.com/v1/artists/{artist['id']}"
-                            async with self.session.get(artist_url, headers=headers) as artist_response:
-                                if artist_response.status == 200:
-                                    artist_data = await artist_response.json()
-                                    
-                                    # Save follower count
-                                    if 'followers' in artist_data:
-                                        metric = Metric(
-                                            idol_id=idol.id,
-                                            metric_type='spotify_followers',
-                                            value=float(artist_data['followers']['total']),
-                                            source=source.name,
-                                            date=datetime.now()
-                                        )
-                                        db.add(metric)
-                                        updated_count += 1
-                
-                await asyncio.sleep(0.1)  # Rate limiting
-                
-            except Exception as e:
-                print(f"Error collecting Spotify data for {idol.name}: {str(e)}")
+        async def fetch_idol(idol: Tuple[int, str, Optional[str]]) -> List[Dict[str, Any]]:
+            async with guard.call() as call:
+                try:
+                    return await fetch(call, *idol)
+                finally:
+                    await stats.rate_limit(self.rate_limit_interval)
+        
+        skipped = 0
+        circuit_error = None
+        for batch in self._iter_idol_batches(db):
+            if circuit_error is not None:
+                skipped += len(batch)
                 continue
+            
+            rows = []
+            results = await asyncio.gather(*(fetch_idol(idol) for idol in batch), return_exceptions=True)
+            for (idol_id, idol_name, group_name), result in zip(batch, results):
+                if isinstance(result, CircuitOpenError):
+                    circuit_error = result
+                    skipped += 1
+                elif isinstance(result, Exception):
+                    stats.record_error(result, idol_name)
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    rows.extend(result)
+            
+            upsert_metrics(db, rows, bucket_minutes)
+            db.commit()
+            updated_count += len(rows)
         
-        db.commit()
+        if circuit_error is not None:
+            stats.record_error(circuit_error, f"{skipped} idols skipped")
         return updated_count
     
-    async def _collect_instagram_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_instagram_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect Instagram data (simulated - would need Instagram Graph API)"""
         # This is a simplified version - in production you'd use Instagram Graph API
         updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
+        bucket_minutes = get_bucket_minutes(db)
+        source_name = source.name
         
-        for idol in idols:
-            try:
-                # Simulate Instagram follower data
-                # In production, you'd make actual API calls
-                import random
-                followers = random.randint(100000, 5000000)
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='instagram_followers',
-                    value=float(followers),
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
+        for batch in self._iter_idol_batches(db):
+            rows = []
+            for idol_id, idol_name, group_name in batch:
+                try:
+                    # Simulate Instagram follower data
+                    # In production, you'd make actual API calls
+                    import random
+                    followers = random.randint(100000, 5000000)
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'instagram_followers',
+                        'value': float(followers),
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
                 
-            except Exception as e:
-                print(f"Error collecting Instagram data for {idol.name}: {str(e)}")
-                continue
+                except Exception as e:
+                    stats.record_error(e, idol_name)
+                    continue
+            
+            upsert_metrics(db, rows, bucket_minutes)
+            db.commit()
         
-        db.commit()
         return updated_count
     
-    async def _collect_twitter_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_twitter_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect Twitter data (simulated - would need Twitter API v2)"""
         # This is a simplified version - in production you'd use Twitter API v2
         updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
+        bucket_minutes = get_bucket_minutes(db)
+        source_name = source.name
         
-        for idol in idols:
-            try:
-                # Simulate Twitter follower data
-                import random
-                followers = random.randint(50000, 2000000)
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='twitter_followers',
-                    value=float(followers),
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
+        for batch in self._iter_idol_batches(db):
+            rows = []
+            for idol_id, idol_name, group_name in batch:
+                try:
+                    # Simulate Twitter follower data
+                    import random
+                    followers = random.randint(50000, 2000000)
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'twitter_followers',
+                        'value': float(followers),
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
                 
-            except Exception as e:
-                print(f"Error collecting Twitter data for {idol.name}: {str(e)}")
-                continue
+                except Exception as e:
+                    stats.record_error(e, idol_name)
+                    continue
+            
+            upsert_metrics(db, rows, bucket_minutes)
+            db.commit()
         
-        db.commit()
         return updated_count
     
-    async def _collect_tiktok_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_tiktok_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect TikTok data (simulated - would need TikTok API)"""
         # This is a simplified version - in production you'd use TikTok API
         updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
+        bucket_minutes = get_bucket_minutes(db)
+        source_name = source.name
         
-        for idol in idols:
-            try:
-                # Simulate TikTok follower data
-                import random
-                followers = random.randint(200000, 8000000)
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='tiktok_followers',
-                    value=float(followers),
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
+        for batch in self._iter_idol_batches(db):
+            rows = []
+            for idol_id, idol_name, group_name in batch:
+                try:
+                    # Simulate TikTok follower data
+                    import random
+                    followers = random.randint(200000, 8000000)
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'tiktok_followers',
+                        'value': float(followers),
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
                 
-            except Exception as e:
-                print(f"Error collecting TikTok data for {idol.name}: {str(e)}")
-                continue
+                except Exception as e:
+                    stats.record_error(e, idol_name)
+                    continue
+            
+            upsert_metrics(db, rows, bucket_minutes)
+            db.commit()
         
-        db.commit()
         return updated_count
     
-    async def _collect_chart_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_chart_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect chart data from various sources"""
+        if self.chart_scraping:
+            return await self._collect_scraped_charts(db, source, stats)
+        
         updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
+        bucket_minutes = get_bucket_minutes(db)
+        source_name = source.name
         
-        for idol in idols:
-            try:
-                # Simulate chart data
-                import random
-                
-                # Melon chart ranking (lower is better)
-                melon_rank = random.randint(1, 100)
-                melon_score = max(0, 100 - melon_rank)  # Convert rank to score
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='melon_chart',
-                    value=melon_score,
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
-                
-                # Gaon chart ranking
-                gaon_rank = random.randint(1, 50)
-                gaon_score = max(0, 100 - gaon_rank)
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='gaon_chart',
-                    value=gaon_score,
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
+        for batch in self._iter_idol_batches(db):
+            rows = []
+            for idol_id, idol_name, group_name in batch:
+                try:
+                    # Simulate chart data
+                    import random
+                    
+                    # Melon chart ranking (lower is better)
+                    melon_rank = random.randint(1, 100)
+                    melon_score = max(0, 100 - melon_rank)  # Convert rank to score
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'melon_chart',
+                        'value': melon_score,
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
+                    
+                    # Gaon chart ranking
+                    gaon_rank = random.randint(1, 50)
+                    gaon_score = max(0, 100 - gaon_rank)
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'gaon_chart',
+                        'value': gaon_score,
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
                 
-            except Exception as e:
-                print(f"Error collecting chart data for {idol.name}: {str(e)}")
-                continue
+                except Exception as e:
+                    stats.record_error(e, idol_name)
+                    continue
+            
+            upsert_metrics(db, rows, bucket_minutes)
+            db.commit()
         
-        db.commit()
         return updated_count
     
-    async def _collect_brand_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_scraped_charts(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
+        """Scrape the Melon, Genie and Bugs charts and store a chart score per listed idol"""
+        urls = {chart: self.data_sources[chart] for chart in CHART_LAYOUTS}
+        stats.record_request(len(urls))
+        # Each chart site has its own circuit breaker and concurrency limit
+        results = await self.chart_scraper.scrape(self.session, urls, self.upstream_guard)
+        
+        entries = []
+        for chart, result in results.items():
+            if isinstance(result, Exception):
+                stats.record_error(result, chart)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                entries.extend(result)
+        
+        # Resolve every credited artist in one query
+        names = {name for entry in entries for name in split_artists(entry['artist'])}
+        idol_ids = dict(
+            db.query(Idol.name, Idol.id).filter(Idol.name.in_(names), Idol.is_active == True).all()
+        ) if names else {}
+        
+        # An idol charting with several songs keeps its best placement
+        scores: Dict[Tuple[int, str], float] = {}
+        for entry in entries:
+            for name in split_artists(entry['artist']):
+                idol_id = idol_ids.get(name)
+                if idol_id is not None:
+                    key = (idol_id, f"{entry['chart']}_chart")
+                    scores[key] = max(scores.get(key, 0.0), entry['score'])
+        
+        now = datetime.now()
+        rows = [
+            {'idol_id': idol_id, 'metric_type': metric_type, 'value': score, 'source': source.name, 'date': now}
+            for (idol_id, metric_type), score in scores.items()
+        ]
+        upsert_metrics(db, rows, get_bucket_minutes(db))
+        db.commit()
+        return len(rows)
+    
+    async def _collect_brand_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect brand reputation data"""
         updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
+        bucket_minutes = get_bucket_minutes(db)
+        source_name = source.name
         
-        for idol in idols:
-            try:
-                # Simulate brand reputation ranking
-                import random
-                brand_rank = random.randint(1, 100)
-                brand_score = max(0, 100 - brand_rank)
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='brand_reputation_ranking',
-                    value=brand_score,
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
+        for batch in self._iter_idol_batches(db):
+            rows = []
+            for idol_id, idol_name, group_name in batch:
+                try:
+                    # Simulate brand reputation ranking
+                    import random
+                    brand_rank = random.randint(1, 100)
+                    brand_score = max(0, 100 - brand_rank)
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'brand_reputation_ranking',
+                        'value': brand_score,
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
                 
-            except Exception as e:
-                print(f"Error collecting brand data for {idol.name}: {str(e)}")
-                continue
+                except Exception as e:
+                    stats.record_error(e, idol_name)
+                    continue
+            
+            upsert_metrics(db, rows, bucket_minutes)
+            db.commit()
         
-        db.commit()
         return updated_count
     
-    async def _collect_trend_data(self, db: Session, source: DataSource) -> int:
+    async def _collect_trend_data(self, db: Session, source: DataSource, stats: SourceTelemetry) -> int:
         """Collect trend data from various sources"""
         updated_count = 0
-        idols = db.query(Idol).filter(Idol.is_active == True).all()
+        bucket_minutes = get_bucket_minutes(db)
+        source_name = source.name
         
-        for idol in idols:
-            try:
-                # Simulate trend data
-                import random
-                
-                # Google Trends score
-                trends_score = random.randint(0, 100)
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='google_trends',
-                    value=trends_score,
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
-                
-                # Twitter mentions
-                mentions = random.randint(1000, 50000)
-                
-                metric = Metric(
-                    idol_id=idol.id,
-                    metric_type='twitter_mentions',
-                    value=float(mentions),
-                    source=source.name,
-                    date=datetime.now()
-                )
-                db.add(metric)
-                updated_count += 1
+        for batch in self._iter_idol_batches(db):
+            rows = []
+            for idol_id, idol_name, group_name in batch:
+                try:
+                    # Simulate trend data
+                    import random
+                    
+                    # Google Trends score
+                    trends_score = random.randint(0, 100)
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'google_trends',
+                        'value': trends_score,
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
+                    
+                    # Twitter mentions
+                    mentions = random.randint(1000, 50000)
+                    
+                    rows.append({
+                        'idol_id': idol_id,
+                        'metric_type': 'twitter_mentions',
+                        'value': float(mentions),
+                        'source': source_name,
+                        'date': datetime.now()
+                    })
+                    updated_count += 1
                 
-            except Exception as e:
-                print(f"Error collecting trend data for {idol.name}: {str(e)}")
-                continue
+                except Exception as e:
+                    stats.record_error(e, idol_name)
+                    continue
+            
+            upsert_metrics(db, rows, bucket_minutes)
+            db.commit()
         
-        db.commit()
         return updated_count
     
     async def _recalculate_rankings(self, db: Session):
@@ -436,9 +658,10 @@ class DataCollectorService:
         try:
             # Trigger ranking recalculation using the update_rankings method
             result = self.update_rankings(db)
-            print("Rankings recalculated successfully")
+            if result['status'] != 'success':
+                logger.error("Error recalculating rankings: %s", result.get('message'))
         except Exception as e:
-            print(f"Error recalculating rankings: {str(e)}")
+            logger.exception("Error recalculating rankings: %s", e)
             # Continue without failing the entire process
     
     def create_sample_data(self, db: Session):
@@ -616,73 +839,185 @@ class DataCollectorService:
                 'timestamp': datetime.now().isoformat()
             }
     
+    def _reserve_version(self, db: Session) -> int:
+        """Next ranking version, held by this transaction until it commits or rolls back.
+        
+        Overlapping runs (the scheduler and a manual refresh) would otherwise
+        read the same maximum and write two snapshots under one version. The
+        lock is taken before reading it: an advisory lock on Postgres, and on
+        SQLite the database write lock, which an empty UPDATE acquires.
+        """
+        conn = db.connection()
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': RANKING_VERSION_LOCK_KEY})
+        elif conn.dialect.name == 'sqlite':
+            conn.execute(update(RankingSnapshot).where(false()).values(version=RankingSnapshot.version))
+        return (db.query(func.max(Ranking.version)).scalar() or 0) + 1
+    
     def update_rankings(self, db: Session) -> Dict[str, Any]:
-        """Update all rankings based on collected data"""
+        """Update every category's rankings from one shared score matrix"""
+        import numpy as np
+        import pandas as pd
+        from services.scoring_engine import (
+            SUB_SCORES, CATEGORY_COLUMNS, GROUP_AGGREGATION_CONFIG_KEY, aggregate_groups
+        )
+        
         try:
-            # Get all active idols
-            idols = db.query(Idol).all()
+            # Score every active idol in one vectorized pass
+            matrix = self.scoring_engine.compute(db)
+            version = self._reserve_version(db)
+            
+            idol_ids = matrix.idol_ids.tolist()
+            columns = {name: matrix[name].tolist() for name in SUB_SCORES + ('total',)}
             
+            # One sort per category column, all rows written in one bulk insert
             updated_rankings = []
-            for idol in idols:
-                # Calculate new ranking score
-                score = self._calculate_ranking_score(db, idol.id)
-                
-                # Create new ranking entry
-                ranking = Ranking(
-                    idol_id=idol.id,
-                    rank=0,  # Will be calculated after all scores are determined
-                    score=score,
-                    category='overall',
-                    date=datetime.now()
-                )
-                updated_rankings.append(ranking)
-            
-            # Sort by score and assign ranks
-            updated_rankings.sort(key=lambda x: x.score, reverse=True)
-            for i, ranking in enumerate(updated_rankings):
-                ranking.rank = i + 1
+            leaderboards = []
+            for category, column in CATEGORY_COLUMNS.items():
+                scores = columns[column]
+                order = matrix.order(column)
+                leaderboards.append(pd.DataFrame({
+                    'idol_id': matrix.idol_ids[order],
+                    'category': category,
+                    'rank': np.arange(1, len(order) + 1),
+                    'score': matrix[column][order]
+                }))
+                for position, index in enumerate(order.tolist()):
+                    updated_rankings.append({
+                        'idol_id': idol_ids[index],
+                        'rank': position + 1,
+                        'score': scores[index],
+                        'total_score': columns['total'][index],
+                        'music_score': columns['music'][index],
+                        'social_score': columns['social'][index],
+                        'brand_score': columns['brand'][index],
+                        'search_score': columns['search'][index],
+                        'award_score': columns['award'][index],
+                        'category': category,
+                        'version': version,
+                        'date': matrix.computed_at
+                    })
+            
+            # Group leaderboards from a grouped reduction over member scores
+            aggregation = get_config_value(db, GROUP_AGGREGATION_CONFIG_KEY, 'mean')
+            group_scores = aggregate_groups(matrix, aggregation)
+            group_ids = group_scores.group_ids.tolist()
+            member_counts = group_scores.member_counts.tolist()
+            group_rankings = []
+            for category, column in CATEGORY_COLUMNS.items():
+                scores = group_scores[column].tolist()
+                for position, index in enumerate(group_scores.order(column).tolist()):
+                    group_rankings.append({
+                        'group_id': group_ids[index],
+                        'category': category,
+                        'rank': position + 1,
+                        'score': scores[index],
+                        'member_count': member_counts[index],
+                        'aggregation': aggregation,
+                        'version': version,
+                        'date': matrix.computed_at
+                    })
+            
+            # Rank and score movement against the previous snapshot
+            trends = self._rank_trends(db, pd.concat(leaderboards, ignore_index=True), version, matrix.computed_at)
             
             # Save to database
-            db.add_all(updated_rankings)
+            if updated_rankings:
+                db.execute(insert(Ranking), updated_rankings)
+            if group_rankings:
+                db.execute(insert(GroupRanking), group_rankings)
+            db.execute(insert(RankingSnapshot), [
+                {
+                    'version': version,
+                    'category': category,
+                    'computed_at': matrix.computed_at,
+                    'row_count': len(matrix)
+                }
+                for category in CATEGORY_COLUMNS
+            ])
+            if trends:
+                db.execute(insert(Trend), trends)
+            record_changes(db, RANKING_SNAPSHOT, [version], INSERT)
+            prune_change_log(db)
             db.commit()
             
+            # Warm the precomputed idol pages for the new snapshot; rankings are already published
+            try:
+                documents_updated = self.ranking_service.documents.warm(db, version)
+            except Exception as e:
+                db.rollback()
+                logger.warning("Idol document warm-up failed for version %s: %s", version, e)
+                documents_updated = 0
+            
+            # Swap the in-memory leaderboards over to the new snapshot in one step
+            try:
+                self.ranking_service.leaderboards.publish(db, version, CATEGORY_COLUMNS)
+            except Exception as e:
+                db.rollback()
+                logger.warning("Leaderboard publish failed for version %s: %s", version, e)
+            
             return {
                 'status': 'success',
+                'version': version,
+                'categories': list(CATEGORY_COLUMNS),
                 'rankings_updated': len(updated_rankings),
+                'group_rankings_updated': len(group_rankings),
+                'trends_updated': len(trends),
+                'documents_updated': documents_updated,
                 'timestamp': datetime.now().isoformat()
             }
             
         except Exception as e:
+            db.rollback()
             return {
                 'status': 'error',
                 'message': str(e),
                 'timestamp': datetime.now().isoformat()
             }
     
-    def _calculate_ranking_score(self, db: Session, idol_id: int) -> float:
-        """Calculate ranking score for an idol based on various metrics"""
-        # This is a simplified scoring algorithm
-        # In a real implementation, you would use more sophisticated algorithms
-        
-        # Get recent trend data
-        recent_trends = db.query(TrendData).filter(
-            TrendData.idol_id == idol_id,
-            TrendData.date >= datetime.now() - timedelta(days=30)
-        ).all()
+    def _rank_trends(self, db: Session, current: "pd.DataFrame", version: int, computed_at: datetime) -> List[Dict[str, Any]]:
+        """Rank and score deltas per idol and category against the previous snapshot"""
+        import numpy as np
+        import pandas as pd
         
-        if not recent_trends:
-            return 0.0
+        previous = pd.DataFrame(
+            db.query(Ranking.idol_id, Ranking.category, Ranking.rank, Ranking.score)
+            .filter(Ranking.version == version - 1)
+            .all(),
+            columns=['idol_id', 'category', 'previous_rank', 'previous_score']
+        )
         
-        # Calculate average score from recent trends
-        scores = [trend.score for trend in recent_trends]
-        avg_score = sum(scores) / len(scores)
+        merged = current.merge(previous, on=['idol_id', 'category'], how='left')
+        # Positive rank change means the idol moved up the leaderboard
+        rank_change = (merged['previous_rank'] - merged['rank']).to_numpy(dtype=np.float64, na_value=np.nan)
+        score_change = (merged['score'] - merged['previous_score']).to_numpy(dtype=np.float64, na_value=np.nan)
         
-        # Add some randomization for demo purposes
-        # In production, this would be based on actual metrics
-        random_factor = np.random.normal(0, 5)  # Small random variation
-        final_score = max(0, min(100, avg_score + random_factor))
+        idol_ids = merged['idol_id'].tolist()
+        categories = merged['category'].tolist()
+        ranks = merged['rank'].tolist()
+        scores = merged['score'].tolist()
+        rank_changes = [None if np.isnan(value) else value for value in rank_change.tolist()]
+        score_changes = [None if np.isnan(value) else value for value in score_change.tolist()]
         
-        return final_score
+        trends = []
+        for i, idol_id in enumerate(idol_ids):
+            trends.append({
+                'idol_id': idol_id,
+                'trend_type': f"{categories[i]}_rank",
+                'value': ranks[i],
+                'change': rank_changes[i],
+                'version': version,
+                'date': computed_at
+            })
+            trends.append({
+                'idol_id': idol_id,
+                'trend_type': f"{categories[i]}_score",
+                'value': scores[i],
+                'change': score_changes[i],
+                'version': version,
+                'date': computed_at
+            })
+        return trends
     
     def _simulate_melon_data(self) -> List[Dict[str, Any]]:
         """Simulate Melon chart data"""
@@ -778,56 +1113,62 @@ class DataCollectorService:
         """Process and store chart data"""
         # This would process the chart data and store it in the database
         # For now, we'll just create some trend data entries
+        rows = []
         for source, data in chart_data.items():
             for entry in data:
                 # Find idol by name (simplified)
                 idol = db.query(Idol).filter(Idol.name == entry['artist']).first()
                 if idol:
-                    trend = TrendData(
-                        idol_id=idol.id,
-                        score=entry['score'],
-                        rank=entry['rank'],
-                        category='music',
-                        date=datetime.now()
-                    )
-                    db.add(trend)
+                    rows.append({
+                        'idol_id': idol.id,
+                        'score': entry['score'],
+                        'rank': entry['rank'],
+                        'category': 'music',
+                        'source': source,
+                        'date': datetime.now()
+                    })
         
+        upsert_trend_data(db, rows)
         db.commit()
     
     def _process_social_data(self, db: Session, social_data: Dict[str, List[Dict[str, Any]]]):
         """Process and store social media data"""
         # Similar to chart data processing
+        rows = []
         for source, data in social_data.items():
             for entry in data:
                 idol = db.query(Idol).filter(Idol.name == entry['artist']).first()
                 if idol:
-                    trend = TrendData(
-                        idol_id=idol.id,
-                        score=entry['engagement_rate'] * 10,  # Convert to 0-100 scale
-                        rank=0,
-                        category='social',
-                        date=datetime.now()
-                    )
-                    db.add(trend)
+                    rows.append({
+                        'idol_id': idol.id,
+                        'score': entry['engagement_rate'] * 10,  # Convert to 0-100 scale
+                        'rank': 0,
+                        'category': 'social',
+                        'source': source,
+                        'date': datetime.now()
+                    })
         
+        upsert_trend_data(db, rows)
         db.commit()
     
     def _process_streaming_data(self, db: Session, streaming_data: Dict[str, List[Dict[str, Any]]]):
         """Process and store streaming data"""
         # Similar to other data processing
+        rows = []
         for source, data in streaming_data.items():
             for entry in data:
                 idol = db.query(Idol).filter(Idol.name == entry['artist']).first()
                 if idol:
                     # Convert monthly listeners to a score (simplified)
                     score = min(100, entry['monthly_listeners'] / 1000000)
-                    trend = TrendData(
-                        idol_id=idol.id,
-                        score=score,
-                        rank=0,
-                        category='streaming',
-                        date=datetime.now()
-                    )
-                    db.add(trend)
+                    rows.append({
+                        'idol_id': idol.id,
+                        'score': score,
+                        'rank': 0,
+                        'category': 'streaming',
+                        'source': source,
+                        'date': datetime.now()
+                    })
         
+        upsert_trend_data(db, rows)
         db.commit() 
\ No newline at end of file
@@ -0,0 +1,193 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from models import Idol, Group, IdolDocument, Ranking, Trend, TrendData
+from serializers import IDOL_COLUMNS, GROUP_COLUMNS, idol_from_row, dumps
+from services.partitions import scan
+
+
+DETAIL = 'detail'
+TRENDS = 'trends'
+KINDS = (DETAIL, TRENDS)
+
+# Window of the precomputed trends document; matches the /api/trends default
+TREND_WINDOW_DAYS = 30
+
+
+class IdolDocumentStore:
+    """Precomputed idol detail and trend documents, stored JSON-encoded in idol_documents.
+
+    ``warm`` rebuilds every document right after a ranking snapshot is
+    published, so serving a detail page is a single unique-key lookup
+    instead of several queries. Ingesting trend data rebuilds the documents
+    of the idols it touched with ``refresh``. Idols without a stored
+    document yet (added since the last warm-up) are built on demand by the
+    same code.
+    """
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+
+    def get(self, db: Session, kind: str, idol_id: int) -> Optional[str]:
+        """Encoded document of ``kind`` for an idol; None if the idol or its data doesn't exist"""
+        payload = db.query(IdolDocument.payload).filter(
+            IdolDocument.kind == kind,
+            IdolDocument.idol_id == idol_id
+        ).scalar()
+
+        if payload is None:
+            rows = self._idol_query(db).filter(Idol.id == idol_id).all()
+            version = db.query(func.max(Ranking.version)).scalar()
+            document = self.build(db, rows, version, datetime.now())[kind].get(idol_id)
+            payload = self._encode(document)
+
+        # A stored null records an idol with nothing to show, e.g. no recent trend data
+        return None if payload == 'null' else payload
+
+    def warm(self, db: Session, version: Optional[int]) -> int:
+        """Replace every stored document with one built from snapshot ``version``.
+
+        Runs in a single transaction, so readers keep seeing the previous
+        documents until the new set is committed. Returns the number of
+        idols covered.
+        """
+        now = datetime.now()
+        db.query(IdolDocument).delete(synchronize_session=False)
+
+        count = 0
+        last_id = 0
+        while True:
+            rows = self._idol_query(db).filter(Idol.id > last_id).order_by(Idol.id).limit(self.batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            self._store(db, self.build(db, rows, version, now), version, now)
+            count += len(rows)
+
+        db.commit()
+        return count
+
+    def refresh(self, db: Session, idol_ids: Iterable[int]) -> int:
+        """Rebuild the stored documents of idols whose trend data changed; the caller commits"""
+        idol_ids = sorted(set(idol_ids))
+        if not idol_ids:
+            return 0
+        version = db.query(func.max(Ranking.version)).scalar()
+        now = datetime.now()
+
+        for start in range(0, len(idol_ids), self.batch_size):
+            batch = idol_ids[start:start + self.batch_size]
+            rows = self._idol_query(db).filter(Idol.id.in_(batch)).order_by(Idol.id).all()
+            db.query(IdolDocument).filter(IdolDocument.idol_id.in_(batch)).delete(synchronize_session=False)
+            self._store(db, self.build(db, rows, version, now), version, now)
+        return len(idol_ids)
+
+    def build(self, db: Session, rows: Sequence[Sequence[Any]], version: Optional[int],
+              now: datetime) -> Dict[str, Dict[int, Optional[Dict[str, Any]]]]:
+        """Detail and trends documents for idol rows laid out as IDOL_COLUMNS + GROUP_COLUMNS.
+
+        Rows should cover a contiguous id range; rankings and trend data are
+        fetched for that range with one query each.
+        """
+        idols = {row[0]: idol_from_row(row) for row in rows}
+        if not idols:
+            return {kind: {} for kind in KINDS}
+        low, high = min(idols), max(idols)
+
+        rankings: Dict[int, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        if version is not None:
+            ranking_rows = db.query(Ranking.idol_id, Ranking.category, Ranking.rank, Ranking.score).filter(
+                Ranking.version == version,
+                Ranking.idol_id.between(low, high)
+            )
+            for idol_id, category, rank, score in ranking_rows:
+                rankings[idol_id][category] = {'rank': rank, 'score': score, 'rank_change': None}
+
+            # Rank movement against the previous snapshot, recorded as <category>_rank trends
+            change_rows = db.query(Trend.idol_id, Trend.trend_type, Trend.change).filter(
+                Trend.version == version,
+                Trend.idol_id.between(low, high),
+                Trend.trend_type.like('%\\_rank', escape='\\')
+            )
+            for idol_id, trend_type, change in change_rows:
+                ranking = rankings.get(idol_id, {}).get(trend_type[:-len('_rank')])
+                if ranking is not None and change is not None:
+                    ranking['rank_change'] = int(change)
+
+        points: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        trend_table = scan(db, TrendData, now - timedelta(days=TREND_WINDOW_DAYS), now,
+                           where=lambda table: table.c.idol_id.between(low, high),
+                           columns=('idol_id', 'date', 'score', 'rank', 'category'))
+        trend_rows = db.query(trend_table).order_by(trend_table.c.idol_id, trend_table.c.date)
+        for idol_id, date, score, rank, category in trend_rows:
+            points[idol_id].append({
+                'date': date.isoformat(),
+                'score': score,
+                'rank': rank,
+                'category': category
+            })
+
+        details = {}
+        trends = {}
+        for idol_id, idol in idols.items():
+            details[idol_id] = dict(
+                idol,
+                rankings=rankings.get(idol_id, {}),
+                trend_summary=self._summarize(points.get(idol_id, [])),
+                version=version,
+                computed_at=now
+            )
+            # Same shape as RankingService.get_idol_trends
+            trends[idol_id] = {
+                'idol_id': idol_id,
+                'idol_name': idol['name'],
+                'period_days': TREND_WINDOW_DAYS,
+                'trends': points[idol_id]
+            } if idol_id in points else None
+
+        return {DETAIL: details, TRENDS: trends}
+
+    def _store(self, db: Session, documents: Dict[str, Dict[int, Optional[Dict[str, Any]]]],
+               version: Optional[int], now: datetime):
+        rows = [
+            {
+                'idol_id': idol_id,
+                'kind': kind,
+                'version': version,
+                'payload': self._encode(document),
+                'computed_at': now
+            }
+            for kind in KINDS
+            for idol_id, document in documents[kind].items()
+        ]
+        if rows:
+            db.execute(insert(IdolDocument), rows)
+
+    def _summarize(self, points: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Per-category latest and average score over the trend window; points are date-ordered"""
+        summary: Dict[str, Dict[str, Any]] = {}
+        for point in points:
+            entry = summary.setdefault(point['category'], {'points': 0, 'total': 0.0})
+            entry['points'] += 1
+            entry['total'] += point['score']
+            entry['latest_score'] = point['score']
+            entry['latest_date'] = point['date']
+
+        for entry in summary.values():
+            entry['average_score'] = entry.pop('total') / entry['points']
+        return summary
+
+    def _idol_query(self, db: Session):
+        return (
+            db.query(*IDOL_COLUMNS, *GROUP_COLUMNS)
+            .select_from(Idol)
+            .outerjoin(Group, Group.id == Idol.group_id)
+        )
+
+    def _encode(self, document: Optional[Dict[str, Any]]) -> str:
+        return dumps(document).decode('utf-8')
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Metric, TrendData
+from services.platform_config import get_config_value
+from services.idol_documents import IdolDocumentStore
+from services.partitions import route_rows
+from services.rolling_windows import record_observations
+
+
+BUCKET_CONFIG_KEY = 'ingestion_bucket_minutes'
+DEFAULT_BUCKET_MINUTES = 60
+
+# Natural key of each observation table, matching its unique constraint,
+# and the columns a repeated observation overwrites
+METRIC_KEY = ('idol_id', 'metric_type', 'source', 'bucket')
+METRIC_UPDATES = ('value', 'date')
+TREND_DATA_KEY = ('idol_id', 'category', 'source', 'bucket')
+TREND_DATA_UPDATES = ('score', 'rank', 'date')
+
+_UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert
+}
+
+
+def bucket_start(timestamp: datetime, minutes: int) -> datetime:
+    """Start of the ``minutes``-wide bucket containing ``timestamp``; buckets restart at midnight"""
+    if minutes <= 0:
+        return timestamp
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = (timestamp - midnight) // timedelta(minutes=1)
+    return midnight + timedelta(minutes=elapsed - elapsed % minutes)
+
+
+def get_bucket_minutes(db: Session) -> int:
+    """Bucket width from PlatformConfig; observations inside one bucket collapse into one row"""
+    return int(get_config_value(db, BUCKET_CONFIG_KEY, DEFAULT_BUCKET_MINUTES))
+
+
+def upsert_metrics(db: Session, rows: Iterable[Dict[str, Any]], bucket_minutes: Optional[int] = None) -> int:
+    """Write Metric rows keyed on (idol_id, metric_type, source, bucket); returns rows written"""
+    return _upsert(db, Metric, METRIC_KEY, METRIC_UPDATES, _batch(db, METRIC_KEY, rows, bucket_minutes))
+
+
+def upsert_trend_data(db: Session, rows: Iterable[Dict[str, Any]], bucket_minutes: Optional[int] = None) -> int:
+    """Write TrendData rows keyed on (idol_id, category, source, bucket); returns rows written"""
+    batch = _batch(db, TREND_DATA_KEY, rows, bucket_minutes)
+    # Rolling window aggregates need the scores being replaced, so they go first
+    record_observations(db, batch.values())
+    written = _upsert(db, TrendData, TREND_DATA_KEY, TREND_DATA_UPDATES, batch)
+    # Precomputed idol pages show the trend window, so they must not wait for the next snapshot
+    IdolDocumentStore().refresh(db, (row['idol_id'] for row in batch.values()))
+    return written
+
+
+def _batch(db: Session, key: Tuple[str, ...], rows: Iterable[Dict[str, Any]],
+           bucket_minutes: Optional[int]) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+    """Rows keyed on ``key`` with defaults and their bucket filled in"""
+    minutes = bucket_minutes if bucket_minutes is not None else get_bucket_minutes(db)
+    now = datetime.now()
+
+    # Later rows win within a batch too; Postgres rejects a statement that
+    # touches the same conflicting row twice
+    batch: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for row in rows:
+        row = dict(row)
+        row['date'] = row.get('date') or now
+        # NULLs never conflict in a unique index, so a missing source would defeat dedup
+        row['source'] = row.get('source') or ''
+        row['bucket'] = bucket_start(row['date'], minutes)
+        batch[tuple(row[column] for column in key)] = row
+    return batch
+
+
+def _upsert(db: Session, model, key: Tuple[str, ...], updates: Tuple[str, ...],
+            batch: Dict[Tuple[Any, ...], Dict[str, Any]]) -> int:
+    """Bulk ``INSERT ... ON CONFLICT DO UPDATE``; the caller commits"""
+    if not batch:
+        return 0
+
+    insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        _merge_rows(db, model, key, updates, batch)
+        return len(batch)
+
+    # One statement per monthly partition; the key includes the bucket, so a
+    # repeated observation always lands in the partition holding the original
+    for table, table_rows in route_rows(db.connection(), model, batch.values()):
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: statement.excluded[column] for column in updates}
+        )
+        db.execute(statement, table_rows)
+    return len(batch)
+
+
+def _merge_rows(db: Session, model, key: Tuple[str, ...], updates: Tuple[str, ...],
+                batch: Dict[Tuple[Any, ...], Dict[str, Any]]):
+    """Portable fallback for dialects without ON CONFLICT: update existing keys, insert the rest"""
+    for values, row in batch.items():
+        existing = db.query(model).filter(and_(*[
+            getattr(model, column) == value for column, value in zip(key, values)
+        ])).first()
+        if existing is None:
+            db.add(model(**row))
+        else:
+            for column in updates:
+                if column in row:
+                    setattr(existing, column, row[column])
+    db.flush()
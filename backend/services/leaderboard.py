@@ -0,0 +1,518 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, publishers are not serialized
+    fcntl = None
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import Idol, Group, Ranking
+from serializers import IDOL_COLUMNS, GROUP_COLUMNS, GROUP_FIELDS, IDOL_FIELDS
+
+
+# How long a process trusts its leaderboard before checking for a newer
+# snapshot published by another process (in-process publishes are immediate)
+VERSION_TTL_SECONDS = 1.0
+# How often a process looks for a new snapshot file; a stat call, no database
+FILE_CHECK_SECONDS = 0.05
+
+SCORE_FIELDS = ('score', 'total_score', 'music_score', 'social_score', 'brand_score', 'search_score', 'award_score')
+
+# One row per ranked idol, in rank order; ``idol`` indexes the IdolTable
+RANKING_DTYPE = np.dtype(
+    [('id', 'i8'), ('idol_id', 'i8'), ('rank', 'i4')]
+    + [(field, 'f8') for field in SCORE_FIELDS]
+    + [('date', 'M8[us]'), ('created_at', 'M8[us]'), ('idol', 'i4')]
+)
+
+# Few distinct values each: stored as codes into a per-snapshot value list
+CODED_FIELDS = ('company', 'gender', 'position', 'nationality')
+# Free text: UTF-8 bytes of every row back to back, addressed by offsets
+PACKED_FIELDS = ('name', 'stage_name', 'real_name', 'image_url')
+
+# Fixed-width idol fields; missing values are -1 (ints, flags, codes) or NaT (dates)
+IDOL_DTYPE = np.dtype(
+    [('id', 'i8'), ('group_id', 'i8'), ('birth_date', 'M8[us]'), ('created_at', 'M8[us]'),
+     ('updated_at', 'M8[us]'), ('group', 'i4')]
+    + [(field, 'i4') for field in CODED_FIELDS]
+    + [('is_soloist', 'i1'), ('is_active', 'i1')]
+)
+
+# Snapshot file: header, then 64-byte aligned arrays, then a JSON manifest
+# giving each array's offset and length plus the small tables (groups, codes)
+SNAPSHOT_MAGIC = b'KPLB'
+SNAPSHOT_FORMAT = 1
+_HEADER = struct.Struct('<4sIqqq')  # magic, format, snapshot version, manifest offset, manifest length
+_ALIGN = 64
+
+_IDOL_INDEX = {field: index for index, field in enumerate(IDOL_FIELDS)}
+_GROUP_WIDTH = len(GROUP_FIELDS)
+
+
+def _flag(value: Optional[bool]) -> int:
+    return -1 if value is None else int(value)
+
+
+def _unflag(value: int) -> Optional[bool]:
+    return None if value < 0 else bool(value)
+
+
+def _score(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class PackedText:
+    """A column of optional strings stored as one UTF-8 buffer plus offsets.
+
+    ``data`` is bytes, or a whole mapped snapshot file with the column's
+    bytes starting at ``base``; slicing either yields bytes to decode.
+    """
+
+    __slots__ = ('offsets', 'nulls', 'data', 'base')
+
+    def __init__(self, offsets: np.ndarray, nulls: np.ndarray, data: Any, base: int = 0):
+        self.offsets = offsets
+        self.nulls = nulls
+        self.data = data
+        self.base = base
+
+    @classmethod
+    def pack(cls, values: Sequence[Optional[str]]) -> "PackedText":
+        encoded = [b'' if value is None else value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        nulls = np.array([value is None for value in values], dtype=np.bool_)
+        return cls(offsets, nulls, b''.join(encoded))
+
+    def take(self, positions: np.ndarray) -> List[Optional[str]]:
+        starts = (self.offsets[positions] + self.base).tolist()
+        ends = (self.offsets[positions + 1] + self.base).tolist()
+        data = self.data
+        return [None if null else data[start:end].decode('utf-8')
+                for start, end, null in zip(starts, ends, self.nulls[positions].tolist())]
+
+    def tobytes(self) -> bytes:
+        return bytes(self.data[self.base:self.base + int(self.offsets[-1])])
+
+
+class IdolTable:
+    """Idols and groups of one snapshot in columnar form.
+
+    Fixed-width fields and codes of low-cardinality text live in a
+    structured array, free text in packed UTF-8 columns, and each group is a
+    single shared dict. Rows are sorted by idol id.
+    """
+
+    __slots__ = ('version', 'rows', 'values', 'text', 'groups', 'group_names')
+
+    def __init__(self, version: int, rows: np.ndarray, values: Dict[str, List[str]],
+                 text: Dict[str, PackedText], groups: List[Dict[str, Any]]):
+        self.version = version
+        self.rows = rows
+        self.values = values
+        self.text = text
+        self.groups = groups
+        self.group_names: Dict[str, List[int]] = {}
+        for index, group in enumerate(groups):
+            self.group_names.setdefault(group['name'], []).append(index)
+
+    @classmethod
+    def load(cls, db: Session, version: int) -> "IdolTable":
+        """Every idol ranked in ``version``, with its group"""
+        ranked = db.query(Ranking.idol_id).filter(Ranking.version == version).distinct().subquery()
+        query = (
+            db.query(*IDOL_COLUMNS, *GROUP_COLUMNS)
+            .select_from(Idol)
+            .join(ranked, ranked.c.idol_id == Idol.id)
+            .outerjoin(Group, Group.id == Idol.group_id)
+            .order_by(Idol.id)
+        )
+        return cls.from_rows(version, query.all())
+
+    @classmethod
+    def from_rows(cls, version: int, rows: Sequence[Sequence[Any]]) -> "IdolTable":
+        """Build from rows laid out as IDOL_COLUMNS + GROUP_COLUMNS, sorted by idol id"""
+        values: Dict[str, List[str]] = {field: [] for field in CODED_FIELDS}
+        codes: Dict[str, Dict[str, int]] = {field: {} for field in CODED_FIELDS}
+        text: Dict[str, List[Optional[str]]] = {field: [] for field in PACKED_FIELDS}
+        groups: List[Dict[str, Any]] = []
+        group_index: Dict[Any, int] = {}
+        fixed = []
+
+        width = len(IDOL_FIELDS)
+        for row in rows:
+            for field in PACKED_FIELDS:
+                text[field].append(row[_IDOL_INDEX[field]])
+
+            coded = []
+            for field in CODED_FIELDS:
+                value = row[_IDOL_INDEX[field]]
+                if value is None:
+                    coded.append(-1)
+                    continue
+                code = codes[field].get(value)
+                if code is None:
+                    code = codes[field][value] = len(values[field])
+                    values[field].append(value)
+                coded.append(code)
+
+            group = row[width:width + _GROUP_WIDTH]
+            if group[0] is None:
+                group_code = -1
+            else:
+                group_code = group_index.get(group[0])
+                if group_code is None:
+                    group_code = group_index[group[0]] = len(groups)
+                    groups.append(dict(zip(GROUP_FIELDS, group)))
+
+            group_id = row[_IDOL_INDEX['group_id']]
+            fixed.append((
+                row[_IDOL_INDEX['id']], -1 if group_id is None else group_id,
+                row[_IDOL_INDEX['birth_date']], row[_IDOL_INDEX['created_at']], row[_IDOL_INDEX['updated_at']],
+                group_code, *coded,
+                _flag(row[_IDOL_INDEX['is_soloist']]), _flag(row[_IDOL_INDEX['is_active']])
+            ))
+
+        packed = {field: PackedText.pack(column) for field, column in text.items()}
+        return cls(version, np.array(fixed, dtype=IDOL_DTYPE), values, packed, groups)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def positions(self, idol_ids: np.ndarray) -> np.ndarray:
+        """Row of each idol id, or -1 where the idol is missing"""
+        ids = self.rows['id']
+        positions = np.searchsorted(ids, idol_ids).astype(np.int32)
+        found = positions < len(ids)
+        found[found] = ids[positions[found]] == idol_ids[found]
+        positions[~found] = -1
+        return positions
+
+    def mask(self, positions: np.ndarray, group: Optional[str] = None, gender: Optional[str] = None) -> np.ndarray:
+        """Which of the idols at ``positions`` are in ``group`` and have ``gender``"""
+        keep = np.ones(len(positions), dtype=bool)
+        if group is not None:
+            keep &= np.isin(self.rows['group'][positions], self.group_names.get(group, []))
+        if gender is not None:
+            genders = self.values['gender']
+            code = genders.index(gender) if gender in genders else -2
+            keep &= self.rows['gender'][positions] == code
+        return keep
+
+    def records(self, positions: Sequence[int]) -> List[Dict[str, Any]]:
+        """IdolResponse dicts for the given rows"""
+        positions = np.asarray(positions, dtype=np.intp)
+        text = {field: column.take(positions) for field, column in self.text.items()}
+        values = self.values
+        companies, genders, roles, nationalities = (values[field] for field in CODED_FIELDS)
+        groups = self.groups
+        records = []
+        for index, (idol_id, group_id, birth_date, created_at, updated_at, group, company, gender, role,
+                    nationality, is_soloist, is_active) in enumerate(self.rows[positions].tolist()):
+            records.append({
+                'id': idol_id,
+                'name': text['name'][index],
+                'stage_name': text['stage_name'][index],
+                'real_name': text['real_name'][index],
+                'group_id': None if group_id < 0 else group_id,
+                'company': None if company < 0 else companies[company],
+                'gender': None if gender < 0 else genders[gender],
+                'position': None if role < 0 else roles[role],
+                'birth_date': birth_date,
+                'nationality': None if nationality < 0 else nationalities[nationality],
+                'is_soloist': _unflag(is_soloist),
+                'is_active': _unflag(is_active),
+                'image_url': text['image_url'][index],
+                'created_at': created_at,
+                'updated_at': updated_at,
+                'group': None if group < 0 else groups[group]
+            })
+        return records
+
+
+class Leaderboard:
+    """One category of a ranking snapshot as a rank-ordered structured array"""
+
+    __slots__ = ('version', 'category', 'rows', 'idols')
+
+    def __init__(self, version: int, category: str, rows: np.ndarray, idols: IdolTable):
+        self.version = version
+        self.category = category
+        self.rows = rows
+        self.idols = idols
+
+    @classmethod
+    def load(cls, db: Session, category: str, version: int, idols: IdolTable) -> "Leaderboard":
+        columns = [Ranking.id, Ranking.idol_id, Ranking.rank, *[getattr(Ranking, field) for field in SCORE_FIELDS],
+                   Ranking.date, Ranking.created_at]
+        rows = (
+            db.query(*columns)
+            .filter(Ranking.category == category, Ranking.version == version)
+            .order_by(Ranking.rank)
+            .all()
+        )
+        # Missing sub-scores become NaN, missing dates NaT; the idol position is filled in below
+        array = np.array(
+            [tuple(row[:3]) + tuple(math.nan if value is None else value for value in row[3:10]) + tuple(row[10:]) + (0,)
+             for row in rows],
+            dtype=RANKING_DTYPE
+        )
+        array['idol'] = idols.positions(array['idol_id'])
+        # Rankings of since-deleted idols are dropped, as the join on the database path does
+        return cls(version, category, array[array['idol'] >= 0], idols)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def page(self, limit: int = 100, offset: int = 0, group: Optional[str] = None,
+             gender: Optional[str] = None) -> List[Dict[str, Any]]:
+        """RankingResponse dicts in rank order; filters keep the overall rank"""
+        rows = self.rows
+        if group is not None or gender is not None:
+            rows = rows[self.idols.mask(rows['idol'], group, gender)]
+        rows = rows[offset:offset + limit] if limit else rows[offset:]
+
+        category = self.category
+        values = rows.tolist()
+        idols = self.idols.records([value[-1] for value in values])
+        page = []
+        for (ranking_id, idol_id, rank, score, total_score, music_score, social_score, brand_score,
+             search_score, award_score, date, created_at, _), idol in zip(values, idols):
+            page.append({
+                'id': ranking_id,
+                'idol_id': idol_id,
+                'category': category,
+                'rank': rank,
+                'score': score,
+                'total_score': _score(total_score),
+                'music_score': _score(music_score),
+                'social_score': _score(social_score),
+                'brand_score': _score(brand_score),
+                'search_score': _score(search_score),
+                'award_score': _score(award_score),
+                'date': date,
+                'created_at': created_at,
+                'idol': idol
+            })
+        return page
+
+
+def read_snapshot_version(path: str) -> Optional[int]:
+    """Snapshot version from a file's header, or None if it is missing or not a snapshot"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, file_format, version, _, _ = _HEADER.unpack(header)
+    return version if magic == SNAPSHOT_MAGIC and file_format == SNAPSHOT_FORMAT else None
+
+
+def write_snapshot(path: str, boards: Dict[str, Leaderboard]) -> int:
+    """Write one snapshot's leaderboards to ``path``, replacing it atomically; returns bytes written.
+
+    Readers that already mapped the previous file keep it until they let go.
+    """
+    idols = next(iter(boards.values())).idols
+    version = idols.version
+    arrays: List[Tuple[str, Any]] = [('idols', idols.rows)]
+    for field, column in idols.text.items():
+        arrays += [(f'text.{field}.offsets', column.offsets), (f'text.{field}.nulls', column.nulls),
+                   (f'text.{field}.data', np.frombuffer(column.tobytes(), dtype=np.uint8))]
+    arrays += [(f'rankings.{category}', board.rows) for category, board in boards.items()]
+
+    manifest: Dict[str, Any] = {
+        'version': version,
+        'categories': list(boards),
+        'arrays': {},
+        'values': idols.values,
+        'groups': [[value.isoformat() if isinstance(value, datetime) else value for value in group.values()]
+                   for group in idols.groups]
+    }
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(b'\0' * _HEADER.size)
+        for name, array in arrays:
+            offset = f.tell() + -f.tell() % _ALIGN
+            f.seek(offset)
+            f.write(np.ascontiguousarray(array).tobytes())
+            manifest['arrays'][name] = [offset, len(array)]
+        encoded = json.dumps(manifest).encode('utf-8')
+        manifest_offset = f.tell()
+        f.write(encoded)
+        f.seek(0)
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, version, manifest_offset, len(encoded)))
+        size = manifest_offset + len(encoded)
+        f.flush()
+        os.fsync(f.fileno())
+
+    # Never replace a newer snapshot written meanwhile by another process; the
+    # lock keeps one from landing between this check and the replace
+    with open(f'{path}.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        current = read_snapshot_version(path)
+        if current is not None and current > version:
+            os.unlink(temporary)
+            return 0
+        os.replace(temporary, path)
+    return size
+
+
+def map_snapshot(path: str) -> Dict[str, Leaderboard]:
+    """Leaderboards of a snapshot file, backed by a read-only shared mapping of it.
+
+    Nothing is copied: arrays view the mapped pages, so every process
+    mapping the same file shares one copy in the page cache.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, file_format, version, manifest_offset, manifest_length = _HEADER.unpack_from(mapped)
+    if magic != SNAPSHOT_MAGIC or file_format != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a leaderboard snapshot (format {SNAPSHOT_FORMAT})")
+    manifest = json.loads(mapped[manifest_offset:manifest_offset + manifest_length])
+
+    def array(name: str, dtype) -> np.ndarray:
+        offset, count = manifest['arrays'][name]
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+
+    text = {
+        field: PackedText(array(f'text.{field}.offsets', np.int64), array(f'text.{field}.nulls', np.bool_),
+                          mapped, manifest['arrays'][f'text.{field}.data'][0])
+        for field in PACKED_FIELDS
+    }
+    groups = []
+    for values in manifest['groups']:
+        group = dict(zip(GROUP_FIELDS, values))
+        if group['debut_date'] is not None:
+            group['debut_date'] = datetime.fromisoformat(group['debut_date'])
+        groups.append(group)
+    idols = IdolTable(version, array('idols', IDOL_DTYPE), manifest['values'], text, groups)
+    return {
+        category: Leaderboard(version, category, array(f'rankings.{category}', RANKING_DTYPE), idols)
+        for category in manifest['categories']
+    }
+
+
+class LeaderboardStore:
+    """Latest snapshot of each category, held in memory and swapped as a whole.
+
+    Readers take a reference to the current boards without locking; a new
+    snapshot is loaded off to the side and replaces them in one assignment,
+    so a reader never sees categories from two different snapshots.
+
+    With a ``path``, the snapshot is shared between processes through a
+    memory-mapped file: publishing writes it once, and every process maps
+    it and follows new versions by watching the file, so all workers serve
+    the same snapshot from a single copy in RAM.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = VERSION_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._boards: Dict[str, Leaderboard] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._file_checked = 0.0
+        self._file_stat: Optional[Tuple[int, int]] = None
+
+    @property
+    def version(self) -> Optional[int]:
+        boards = self._boards
+        return max((board.version for board in boards.values()), default=None)
+
+    def get(self, db: Session, category: str, latest_version: Callable[[], Optional[int]]) -> Optional[Leaderboard]:
+        """The category's latest board, reloading when ``latest_version`` reports a newer snapshot"""
+        if self.path is not None and time.monotonic() - self._file_checked >= FILE_CHECK_SECONDS:
+            self._follow_file()
+
+        board = self._boards.get(category)
+        if board is not None and time.monotonic() - self._checked.get(category, 0.0) < self.ttl:
+            return board
+
+        version = latest_version()
+        if version is None:
+            return None
+        if board is not None and board.version >= version:
+            # A lagging read replica may still report the previous snapshot
+            self._checked[category] = time.monotonic()
+            return board
+
+        if self.path is not None:
+            # The snapshot was published without writing the file; the first worker to notice writes it
+            with self._publish_lock:
+                self._follow_file()
+                if (self.version or 0) < version:
+                    categories = [row[0] for row in
+                                  db.query(Ranking.category).filter(Ranking.version == version).distinct()]
+                    self.publish(db, version, categories)
+            return self._boards.get(category)
+
+        with self._lock:
+            boards = self._boards
+            board = boards.get(category)
+            if board is None or board.version < version:
+                # Categories already loaded for this version share its idol table
+                idols = next((other.idols for other in boards.values() if other.version == version), None)
+                board = Leaderboard.load(db, category, version, idols or IdolTable.load(db, version))
+                if not len(board):
+                    # Not a category of this snapshot; caching it would let any string grow the store
+                    return None
+                current = {name: other for name, other in boards.items() if other.version == version}
+                current[category] = board
+                self._boards = current
+            self._checked[category] = time.monotonic()
+        return board
+
+    def publish(self, db: Session, version: int, categories: Iterable[str]) -> int:
+        """Load every category of a freshly committed snapshot and swap them in together; returns rows"""
+        idols = IdolTable.load(db, version)
+        boards = {category: Leaderboard.load(db, category, version, idols) for category in categories}
+        if self.path is not None and boards:
+            # Serve the mapped file rather than this copy, like every other process
+            write_snapshot(self.path, boards)
+            self._follow_file()
+        else:
+            with self._lock:
+                self._swap(boards)
+        return sum(len(board) for board in boards.values())
+
+    def _follow_file(self):
+        """Map the snapshot file if it was replaced since last looked at"""
+        self._file_checked = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_ino, stat.st_mtime_ns)
+        if key == self._file_stat:
+            return
+        with self._lock:
+            if key == self._file_stat:
+                return
+            version = read_snapshot_version(self.path)
+            current = self.version
+            if version is not None and (current is None or version > current):
+                self._swap(map_snapshot(self.path))
+            self._file_stat = key
+
+    def _swap(self, boards: Dict[str, Leaderboard]):
+        """Replace the served boards unless they are older; the caller holds the lock"""
+        version = next(iter(boards.values())).version if boards else None
+        if version is not None and self.version is not None and self.version > version:
+            return
+        self._boards = boards
+        self._checked = dict.fromkeys(boards, time.monotonic())
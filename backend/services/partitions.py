@@ -0,0 +1,340 @@
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, MetaData, PrimaryKeyConstraint, Table, false, func, inspect, select, text, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import FromClause
+
+from models import Idol, Metric, TrendData
+from services.platform_config import get_config_value
+
+
+# Observation tables stored as one partition per calendar month.
+# Rows are routed on ``bucket``: it always falls on the same day as ``date``
+# (buckets restart at midnight), so a date range maps to the same months.
+# On SQLite every partition numbers its own ``id``s, so ids repeat across
+# months; an observation is identified by its natural key, and ``scan``
+# leaves ``id`` out unless asked for it.
+PARTITIONED = (Metric, TrendData)
+PARTITION_KEY = 'bucket'
+
+RETENTION_CONFIG_KEY = 'partition_retention_months'
+
+# How long a partition listing is trusted before asking the database again
+LISTING_TTL_SECONDS = 60.0
+
+# SQLite partitions are plain tables defined here, never in models.Base;
+# the idols definition is only there to resolve their foreign key
+_metadata = MetaData()
+Idol.__table__.to_metadata(_metadata)
+_listings: Dict[Tuple[str, str], Tuple[float, Dict[datetime, str]]] = {}
+
+
+def month_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(base: Table, month: datetime) -> str:
+    return f"{base.name}_{month:%Y_%m}"
+
+
+def is_native(conn) -> bool:
+    """Postgres partitions natively; SQLite is routed to per-month tables here"""
+    return conn.dialect.name == 'postgresql'
+
+
+def is_routed(conn) -> bool:
+    return conn.dialect.name == 'sqlite'
+
+
+def partition_table(base: Table, month: datetime) -> Table:
+    """SQLite table holding ``base`` rows for one month; same columns, renamed indexes"""
+    name = partition_name(base, month)
+    table = _metadata.tables.get(name)
+    if table is None:
+        table = base.to_metadata(_metadata, name=name)
+        # Index and constraint names are global in SQLite
+        for item in list(table.indexes) + list(table.constraints):
+            if isinstance(item.name, str) and base.name in item.name and name not in item.name:
+                item.name = item.name.replace(base.name, name, 1)
+    return table
+
+
+def list_partitions(conn, base: Table, refresh: bool = False) -> Dict[datetime, str]:
+    """Existing partitions of ``base`` by month; cached for LISTING_TTL_SECONDS"""
+    key = (str(conn.engine.url), base.name)
+    cached = _listings.get(key)
+    if cached is not None and not refresh and time.monotonic() - cached[0] < LISTING_TTL_SECONDS:
+        return cached[1]
+
+    if is_native(conn):
+        names = conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :name"
+        ), {'name': base.name}).scalars().all()
+    else:
+        names = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :pattern ESCAPE '\\'"
+        ), {'pattern': f"{base.name}\\_%"}).scalars().all() if is_routed(conn) else []
+
+    pattern = re.compile(rf"^{re.escape(base.name)}_(\d{{4}})_(\d{{2}})$")
+    partitions = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+
+    _listings[key] = (time.monotonic(), partitions)
+    return partitions
+
+
+def ensure_partitions(conn, base: Table, months: Iterable[datetime]):
+    """Create any missing partitions of ``base`` for ``months``"""
+    months = set(months)
+    known = list_partitions(conn, base)
+    missing = [month for month in sorted(months) if month not in known]
+    if missing:
+        known = list_partitions(conn, base, refresh=True)
+        missing = [month for month in missing if month not in known]
+
+    for month in missing:
+        name = partition_name(base, month)
+        if is_native(conn):
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {base.name} "
+                f"FOR VALUES FROM ('{month.isoformat(' ')}') TO ('{next_month(month).isoformat(' ')}')"
+            ))
+        else:
+            partition_table(base, month).create(conn, checkfirst=True)
+        known[month] = name
+
+
+def route_rows(conn, model, rows: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Table, List[Dict[str, Any]]]]:
+    """Group rows by target table, creating partitions as needed.
+
+    Postgres routes rows itself, so every group targets the parent table;
+    other dialects without partition support write to the unpartitioned table.
+    """
+    base = model.__table__
+    if not (is_native(conn) or is_routed(conn)):
+        rows = list(rows)
+        if rows:
+            yield base, rows
+        return
+
+    by_month: Dict[datetime, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        by_month[month_start(row.get(PARTITION_KEY) or row['date'])].append(row)
+    if not by_month:
+        return
+
+    ensure_partitions(conn, base, by_month)
+    if is_native(conn):
+        yield base, [row for month_rows in by_month.values() for row in month_rows]
+        return
+    for month, month_rows in sorted(by_month.items()):
+        yield partition_table(base, month), month_rows
+
+
+def scan(db: Session, model, start: Optional[datetime] = None, end: Optional[datetime] = None,
+         where: Optional[Callable[[FromClause], Any]] = None,
+         columns: Optional[Sequence[str]] = None) -> FromClause:
+    """Rows of ``model`` with ``start <= date <= end`` as a subquery named like the table.
+
+    Only partitions overlapping the range are read. ``where`` builds extra
+    criteria from a table's columns (``lambda t: t.c.idol_id == 5``) and is
+    applied inside each partition so indexes stay usable. ``columns``
+    defaults to every column but ``id``, which is only unique per partition.
+    """
+    base = model.__table__
+    conn = db.connection()
+    names = list(columns) if columns else [column.name for column in base.columns if column.name != 'id']
+
+    def select_from(table: Table):
+        criteria = []
+        if start is not None:
+            criteria.append(table.c.date >= start)
+        if end is not None:
+            criteria.append(table.c.date <= end)
+        if where is not None:
+            criteria.append(where(table))
+        return select(*[table.c[name] for name in names]).where(*criteria)
+
+    if not is_routed(conn):
+        statement = select_from(base)
+        if is_native(conn):
+            # Bounds on the partition key let the planner skip other months
+            if start is not None:
+                statement = statement.where(base.c[PARTITION_KEY] >= start.replace(hour=0, minute=0, second=0, microsecond=0))
+            if end is not None:
+                statement = statement.where(base.c[PARTITION_KEY] <= end)
+        return statement.subquery(base.name)
+
+    partitions = list_partitions(conn, base)
+    newest = month_start(end or datetime.now())
+    if newest not in partitions and (not partitions or newest > max(partitions)):
+        # Another process may have started a new month since the last listing
+        partitions = list_partitions(conn, base, refresh=True)
+
+    selected = [
+        partition_table(base, month) for month in sorted(partitions)
+        if (start is None or month >= month_start(start)) and (end is None or month <= end)
+    ]
+    if not selected:
+        return select(*[base.c[name] for name in names]).where(false()).subquery(base.name)
+    if len(selected) == 1:
+        return select_from(selected[0]).subquery(base.name)
+    return union_all(*[select_from(table) for table in selected]).subquery(base.name)
+
+
+def drop_partitions_before(db: Session, model, cutoff: datetime) -> List[str]:
+    """Drop whole months that end on or before ``cutoff``; returns the dropped table names"""
+    base = model.__table__
+    conn = db.connection()
+    if not (is_native(conn) or is_routed(conn)):
+        return []
+
+    dropped = []
+    for month, name in sorted(list_partitions(conn, base, refresh=True).items()):
+        if next_month(month) <= cutoff:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            if name in _metadata.tables:
+                _metadata.remove(_metadata.tables[name])
+            dropped.append(name)
+    list_partitions(conn, base, refresh=True)
+    return dropped
+
+
+def drop_expired(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """Apply ``partition_retention_months`` (unset keeps everything) to every partitioned table"""
+    months = get_config_value(db, RETENTION_CONFIG_KEY)
+    if not months:
+        return []
+    cutoff = month_start(now or datetime.now())
+    for _ in range(int(months)):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    dropped = []
+    for model in PARTITIONED:
+        dropped.extend(drop_partitions_before(db, model, cutoff))
+    return dropped
+
+
+def migrate_partitions(conn: Connection) -> List[str]:
+    """Move rows from the unpartitioned tables into monthly partitions; returns changes.
+
+    SQLite: existing partitions get any columns and indexes added to the
+    model since they were created, then rows left in the base table (data
+    written before partitioning) are moved into their months. Postgres: a
+    plain table is converted into a partitioned parent with its rows
+    re-inserted. Other dialects keep plain tables.
+    """
+    changes = []
+    for model in PARTITIONED:
+        base = model.__table__
+        if is_native(conn):
+            changes.extend(_convert_to_native(conn, base))
+        elif is_routed(conn):
+            changes.extend(_sync_partitions(conn, base))
+            changes.extend(_move_base_rows(conn, base))
+    return changes
+
+
+def _sync_partitions(conn, base: Table) -> List[str]:
+    changes = []
+    inspector = inspect(conn)
+    for month, name in sorted(list_partitions(conn, base, refresh=True).items()):
+        table = partition_table(base, month)
+        existing = {column['name'] for column in inspector.get_columns(name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {name} ADD COLUMN {column.name} {column_type}'))
+                changes.append(f"{name}.{column.name}")
+        existing = {index['name'] for index in inspector.get_indexes(name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                changes.append(index.name)
+    return changes
+
+
+def _move_base_rows(conn, base: Table) -> List[str]:
+    month_column = func.strftime('%Y-%m-01 00:00:00', func.coalesce(base.c[PARTITION_KEY], base.c.date))
+    months = [
+        datetime.fromisoformat(str(value)) for value in
+        conn.execute(select(month_column).select_from(base).distinct()).scalars() if value is not None
+    ]
+    if not months:
+        return []
+
+    ensure_partitions(conn, base, months)
+    names = [column.name for column in base.columns]
+    for month in months:
+        table = partition_table(base, month)
+        conn.execute(table.insert().from_select(names, select(*[base.c[name] for name in names]).where(
+            func.coalesce(base.c[PARTITION_KEY], base.c.date) >= month,
+            func.coalesce(base.c[PARTITION_KEY], base.c.date) < next_month(month)
+        )))
+    conn.execute(base.delete())
+    return [f"{base.name} -> {partition_name(base, month)}" for month in sorted(months)]
+
+
+def _convert_to_native(conn, base: Table) -> List[str]:
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :name"), {'name': base.name}).scalar()
+    if kind == 'p':
+        return []
+
+    legacy = f"{base.name}_unpartitioned"
+    if kind is not None:
+        conn.execute(text(f"ALTER TABLE {base.name} RENAME TO {legacy}"))
+        for (index,) in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :name"), {'name': legacy}):
+            conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index}_unpartitioned"'))
+
+    _native_parent(base).create(conn)
+    changes = [f"{base.name} partitioned by range ({PARTITION_KEY})"]
+    if kind is None:
+        return changes
+
+    # Routing key must be non-null on a partitioned table; legacy rows fall back to their date
+    names = [column.name for column in base.columns]
+    legacy_table = Table(legacy, MetaData(), *[Column(name) for name in names])
+    months = [
+        value for value in conn.execute(
+            select(func.date_trunc('month', func.coalesce(legacy_table.c[PARTITION_KEY], legacy_table.c.date))).distinct()
+        ).scalars() if value is not None
+    ]
+    ensure_partitions(conn, base, months)
+    conn.execute(text(
+        f"INSERT INTO {base.name} ({', '.join(names)}) "
+        f"SELECT {', '.join(f'COALESCE({PARTITION_KEY}, date)' if name == PARTITION_KEY else name for name in names)} "
+        f"FROM {legacy}"
+    ))
+    conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{base.name}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {base.name}), false)"
+    ))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    return changes + [f"{legacy} -> {partition_name(base, month)}" for month in sorted(months)]
+
+
+def _native_parent(base: Table) -> Table:
+    """Postgres parent for ``base``: a partitioned table's primary key must include the partition key"""
+    metadata = MetaData()
+    Idol.__table__.to_metadata(metadata)
+    table = base.to_metadata(metadata)
+    table.c.id.autoincrement = True
+    table.c[PARTITION_KEY].nullable = False
+    table.c[PARTITION_KEY].primary_key = True
+    table.append_constraint(PrimaryKeyConstraint(table.c.id, table.c[PARTITION_KEY]))
+    table.dialect_kwargs['postgresql_partition_by'] = f'RANGE ({PARTITION_KEY})'
+    return table
@@ -0,0 +1,33 @@
+import json
+from typing import Any, Optional
+
+from sqlalchemy.orm import Session
+
+from models import PlatformConfig
+
+
+def get_config_value(db: Session, key: str, default: Any = None) -> Any:
+    """Read a PlatformConfig value, decoding JSON when possible"""
+    value = db.query(PlatformConfig.value).filter(PlatformConfig.key == key).scalar()
+
+    if value is None:
+        return default
+
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def set_config_value(db: Session, key: str, value: Any, description: Optional[str] = None):
+    """Create or update a PlatformConfig entry; values are stored as JSON"""
+    config = db.query(PlatformConfig).filter(PlatformConfig.key == key).first()
+
+    if config is None:
+        config = PlatformConfig(key=key, description=description)
+        db.add(config)
+    elif description is not None:
+        config.description = description
+
+    config.value = json.dumps(value)
+    db.commit()
@@ -1,171 +1,322 @@
+import os
+
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, List, Optional, Dict, Any
 from datetime import datetime, timedelta
-import pandas as pd
 
-from models import Idol, Group, Ranking, TrendData
+from models import Idol, Group, GroupRanking, Ranking, RankingSnapshot, Trend, TrendData
+from serializers import (
+    RANKING_COLUMNS, IDOL_COLUMNS, GROUP_COLUMNS, GROUP_RANKING_COLUMNS,
+    idol_from_row, ranking_from_row, group_ranking_from_row
+)
+from services.cache import SnapshotCache
+from services.idol_documents import IdolDocumentStore
+from services.partitions import scan
+
+if TYPE_CHECKING:
+    import numpy as np
+    from services.leaderboard import LeaderboardStore
+
+
+# Leaderboard category -> score column it is sorted by; lives here so the API can check categories without NumPy
+CATEGORY_COLUMNS = {
+    'overall': 'total',
+    'music': 'music',
+    'social': 'social',
+    'brand': 'brand',
+    'search': 'search',
+    'award': 'award'
+}
+
+# Resampling intervals for aligned trend series; bins start at midnight (Monday for weeks)
+TREND_INTERVALS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1)
+}
+MAX_TREND_SERIES_IDOLS = 50
+MAX_TREND_POINTS = 5000
 
 
 class RankingService:
     """Service class for handling ranking-related operations"""
     
-    def get_current_rankings(self, db: Session, category: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get current rankings with optional filtering"""
-        query = db.query(Ranking).order_by(Ranking.rank)
+    def __init__(self):
+        # Leaderboard pages keyed by snapshot version; a new snapshot never hits stale entries
+        self.cache = SnapshotCache(maxsize=512)
+        # Precomputed idol detail and trend documents, rebuilt after each snapshot
+        self.documents = IdolDocumentStore()
+        self._leaderboards = None
+    
+    @property
+    def leaderboards(self) -> "LeaderboardStore":
+        """Created on first use so NumPy is only imported once rankings are read"""
+        if self._leaderboards is None:
+            from services.leaderboard import LeaderboardStore
+            # Set to share one memory-mapped snapshot between all worker processes
+            self._leaderboards = LeaderboardStore(os.getenv('LEADERBOARD_SNAPSHOT_FILE') or None)
+        return self._leaderboards
+    
+    def get_current_rankings(self, db: Session, category: Optional[str] = None, limit: int = 100,
+                             offset: int = 0, as_of: Optional[datetime] = None, group: Optional[str] = None,
+                             gender: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get current rankings, or the rankings as they stood at ``as_of``"""
+        category = category or 'overall'
+        
+        if as_of is None:
+            # The latest snapshot is served from memory without touching the database
+            board = self.leaderboards.get(db, category, lambda: self._resolve_version(db, category, None))
+            if board is None:
+                return []
+            cache_key = ('rankings', category, board.version, limit, offset, group, gender)
+            cached = self.cache.get(cache_key)
+            if cached is None:
+                cached = board.page(limit, offset, group, gender)
+                self.cache.set(cache_key, cached)
+            return cached
+        
+        version = self._resolve_version(db, category, as_of)
         
-        if category:
-            query = query.filter(Ranking.category == category)
+        if version is None:
+            return []
+        
+        cache_key = ('rankings', category, version, limit, offset, group, gender)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        query = (
+            db.query(*RANKING_COLUMNS, *IDOL_COLUMNS, *GROUP_COLUMNS)
+            .select_from(Ranking)
+            .join(Idol, Idol.id == Ranking.idol_id)
+            .outerjoin(Group, Group.id == Idol.group_id)
+            .filter(Ranking.category == category, Ranking.version == version)
+            .order_by(Ranking.rank)
+        )
+        
+        if group:
+            query = query.filter(Group.name == group)
+        
+        if gender:
+            query = query.filter(Idol.gender == gender)
+        
+        if offset:
+            query = query.offset(offset)
         
         if limit:
             query = query.limit(limit)
         
-        rankings = query.all()
+        rankings = [ranking_from_row(row) for row in query]
+        self.cache.set(cache_key, rankings)
+        return rankings
+    
+    def get_group_rankings(self, db: Session, category: Optional[str] = None, limit: int = 100,
+                           offset: int = 0, as_of: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get group rankings, paginated and cached like idol rankings"""
+        category = category or 'overall'
+        version = self._resolve_version(db, category, as_of)
         
-        result = []
-        for ranking in rankings:
-            idol = db.query(Idol).filter(Idol.id == ranking.idol_id).first()
-            group = db.query(Group).filter(Group.id == idol.group_id).first() if idol else None
-            
-            result.append({
-                "id": ranking.id,
-                "rank": ranking.rank,
-                "category": ranking.category,
-                "score": ranking.score,
-                "date": ranking.date.isoformat() if ranking.date else None,
-                "idol": {
-                    "id": idol.id,
-                    "name": idol.name,
-                    "stage_name": idol.stage_name,
-                    "birth_date": idol.birth_date.isoformat() if idol.birth_date else None,
-                    "gender": idol.gender,
-                    "nationality": idol.nationality,
-                    "group": {
-                        "id": group.id,
-                        "name": group.name,
-                        "company": group.company,
-                        "debut_date": group.debut_date.isoformat() if group.debut_date else None
-                    } if group else None
-                } if idol else None
-            })
+        if version is None:
+            return []
+        
+        cache_key = ('group_rankings', category, version, limit, offset)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        query = (
+            db.query(*GROUP_RANKING_COLUMNS, *GROUP_COLUMNS)
+            .select_from(GroupRanking)
+            .join(Group, Group.id == GroupRanking.group_id)
+            .filter(GroupRanking.category == category, GroupRanking.version == version)
+            .order_by(GroupRanking.rank)
+        )
+        
+        if offset:
+            query = query.offset(offset)
         
-        return result
+        if limit:
+            query = query.limit(limit)
+        
+        rankings = [group_ranking_from_row(row) for row in query]
+        self.cache.set(cache_key, rankings)
+        return rankings
+    
+    def _resolve_version(self, db: Session, category: str, as_of: Optional[datetime]) -> Optional[int]:
+        """Snapshot version to serve for a category, current or as of a past date"""
+        snapshot = self.resolve_snapshot(db, category, as_of)
+        
+        if snapshot:
+            return snapshot.version
+        
+        if as_of is None:
+            # Rankings written before snapshots were recorded
+            return self.get_latest_version(db)
+        
+        return None
+    
+    def resolve_snapshot(self, db: Session, category: str = 'overall',
+                         as_of: Optional[datetime] = None) -> Optional[RankingSnapshot]:
+        """Latest snapshot of a category computed at or before ``as_of``"""
+        query = db.query(RankingSnapshot).filter(RankingSnapshot.category == category)
+        
+        if as_of is not None:
+            query = query.filter(RankingSnapshot.computed_at <= as_of)
+        
+        # Served by the (category, computed_at) index: a single seek regardless of history size
+        return query.order_by(RankingSnapshot.computed_at.desc()).first()
+    
+    def get_latest_version(self, db: Session) -> Optional[int]:
+        """Version of the most recently published ranking snapshot"""
+        return db.query(func.max(Ranking.version)).scalar()
     
     def get_idols(self, db: Session, group: Optional[str] = None, gender: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get all idols with optional filtering"""
-        query = db.query(Idol)
+        query = self._idol_query(db)
         
         if group:
-            query = query.join(Group).filter(Group.name == group)
+            query = query.filter(Group.name == group)
         
         if gender:
             query = query.filter(Idol.gender == gender)
         
-        idols = query.all()
-        
-        result = []
-        for idol in idols:
-            group = db.query(Group).filter(Group.id == idol.group_id).first()
-            
-            result.append({
-                "id": idol.id,
-                "name": idol.name,
-                "stage_name": idol.stage_name,
-                "birth_date": idol.birth_date.isoformat() if idol.birth_date else None,
-                "gender": idol.gender,
-                "nationality": idol.nationality,
-                "group": {
-                    "id": group.id,
-                    "name": group.name,
-                    "company": group.company,
-                    "debut_date": group.debut_date.isoformat() if group.debut_date else None
-                } if group else None
-            })
-        
-        return result
+        return [idol_from_row(row) for row in query]
     
     def get_idol_by_id(self, db: Session, idol_id: int) -> Optional[Dict[str, Any]]:
         """Get specific idol details"""
-        idol = db.query(Idol).filter(Idol.id == idol_id).first()
+        row = self._idol_query(db).filter(Idol.id == idol_id).first()
         
-        if not idol:
+        if not row:
             return None
         
-        group = db.query(Group).filter(Group.id == idol.group_id).first()
-        
-        return {
-            "id": idol.id,
-            "name": idol.name,
-            "stage_name": idol.stage_name,
-            "birth_date": idol.birth_date.isoformat() if idol.birth_date else None,
-            "gender": idol.gender,
-            "nationality": idol.nationality,
-            "group": {
-                "id": group.id,
-                "name": group.name,
-                "company": group.company,
-                "debut_date": group.debut_date.isoformat() if group.debut_date else None
-            } if group else None
-        }
+        return idol_from_row(row)
+    
+    def get_idol_document(self, db: Session, kind: str, idol_id: int) -> Optional[str]:
+        """Encoded detail or trends document for an idol, precomputed when available"""
+        return self.documents.get(db, kind, idol_id)
     
     def compare_idols(self, db: Session, idol1_id: int, idol2_id: int) -> Optional[Dict[str, Any]]:
         """Compare two idols side by side"""
-        idol1 = db.query(Idol).filter(Idol.id == idol1_id).first()
-        idol2 = db.query(Idol).filter(Idol.id == idol2_id).first()
+        rows = self._idol_query(db).filter(Idol.id.in_([idol1_id, idol2_id])).all()
+        idols = {row[0]: idol_from_row(row) for row in rows}
         
-        if not idol1 or not idol2:
+        if idol1_id not in idols or idol2_id not in idols:
             return None
         
-        group1 = db.query(Group).filter(Group.id == idol1.group_id).first()
-        group2 = db.query(Group).filter(Group.id == idol2.group_id).first()
+        idol1 = idols[idol1_id]
+        idol2 = idols[idol2_id]
         
         # Get current rankings for both idols
-        ranking1 = db.query(Ranking).filter(Ranking.idol_id == idol1_id).order_by(desc(Ranking.date)).first()
-        ranking2 = db.query(Ranking).filter(Ranking.idol_id == idol2_id).order_by(desc(Ranking.date)).first()
+        overall = db.query(Ranking).filter(Ranking.category == 'overall')
+        ranking1 = overall.filter(Ranking.idol_id == idol1_id).order_by(desc(Ranking.date)).first()
+        ranking2 = overall.filter(Ranking.idol_id == idol2_id).order_by(desc(Ranking.date)).first()
+        
+        idol1["current_ranking"] = self._ranking_summary(ranking1)
+        idol2["current_ranking"] = self._ranking_summary(ranking2)
         
         return {
-            "idol1": {
-                "id": idol1.id,
-                "name": idol1.name,
-                "stage_name": idol1.stage_name,
-                "birth_date": idol1.birth_date.isoformat() if idol1.birth_date else None,
-                "gender": idol1.gender,
-                "nationality": idol1.nationality,
-                "group": {
-                    "id": group1.id,
-                    "name": group1.name,
-                    "company": group1.company,
-                    "debut_date": group1.debut_date.isoformat() if group1.debut_date else None
-                } if group1 else None,
-                "current_ranking": {
-                    "rank": ranking1.rank,
-                    "score": ranking1.score,
-                    "category": ranking1.category,
-                    "date": ranking1.date.isoformat() if ranking1.date else None
-                } if ranking1 else None
-            },
-            "idol2": {
-                "id": idol2.id,
-                "name": idol2.name,
-                "stage_name": idol2.stage_name,
-                "birth_date": idol2.birth_date.isoformat() if idol2.birth_date else None,
-                "gender": idol2.gender,
-                "nationality": idol2.nationality,
-                "group": {
-                    "id": group2.id,
-                    "name": group2.name,
-                    "company": group2.company,
-                    "debut_date": group2.debut_date.isoformat() if group2.debut_date else None
-                } if group2 else None,
-                "current_ranking": {
-                    "rank": ranking2.rank,
-                    "score": ranking2.score,
-                    "category": ranking2.category,
-                    "date": ranking2.date.isoformat() if ranking2.date else None
-                } if ranking2 else None
+            "idol1": idol1,
+            "idol2": idol2,
+            "comparison_data": {
+                "idol1_ranking": idol1["current_ranking"],
+                "idol2_ranking": idol2["current_ranking"],
+                "score_difference": (
+                    ranking1.score - ranking2.score if ranking1 and ranking2 else None
+                )
             }
         }
     
+    def get_movers(self, db: Session, category: str = 'overall', limit: int = 10) -> Optional[Dict[str, Any]]:
+        """Biggest rank risers and fallers in the latest snapshot"""
+        version = self.get_latest_version(db)
+        
+        if version is None:
+            return None
+        
+        rank_type = f"{category}_rank"
+        score_type = f"{category}_score"
+        rows = db.query(Trend.idol_id, Trend.trend_type, Trend.value, Trend.change).filter(
+            Trend.trend_type.in_([rank_type, score_type]),
+            Trend.version == version
+        ).all()
+        
+        ranks = {}
+        score_changes = {}
+        for idol_id, trend_type, value, change in rows:
+            if trend_type == rank_type:
+                ranks[idol_id] = (value, change)
+            else:
+                score_changes[idol_id] = (value, change)
+        
+        import numpy as np
+        
+        moved = [(idol_id, change) for idol_id, (_, change) in ranks.items() if change]
+        idol_ids = np.array([idol_id for idol_id, _ in moved], dtype=np.int64)
+        changes = np.array([change for _, change in moved], dtype=np.float64)
+        
+        risers = self._top_k(idol_ids, changes, limit, changes > 0)
+        fallers = self._top_k(idol_ids, -changes, limit, changes < 0)
+        
+        idol_rows = self._idol_query(db).filter(Idol.id.in_(risers + fallers)).all() if risers or fallers else []
+        idols = {row[0]: idol_from_row(row) for row in idol_rows}
+        
+        def mover(idol_id: int) -> Dict[str, Any]:
+            rank, rank_change = ranks[idol_id]
+            score, score_change = score_changes.get(idol_id, (None, None))
+            return {
+                "idol": idols.get(idol_id),
+                "rank": int(rank),
+                "previous_rank": int(rank + rank_change),
+                "rank_change": int(rank_change),
+                "score": score,
+                "score_change": score_change
+            }
+        
+        return {
+            "category": category,
+            "version": version,
+            "risers": [mover(idol_id) for idol_id in risers],
+            "fallers": [mover(idol_id) for idol_id in fallers]
+        }
+    
+    def _top_k(self, idol_ids: "np.ndarray", values: "np.ndarray", k: int, mask: "np.ndarray") -> List[int]:
+        """Idol ids with the k largest values among ``mask``, via a partial sort"""
+        import numpy as np
+        
+        idol_ids = idol_ids[mask]
+        values = values[mask]
+        k = min(k, len(values))
+        
+        if k <= 0:
+            return []
+        
+        kth = -np.partition(-values, k - 1)[k - 1]
+        # Only values tied with or above the k-th are fully sorted; ties go to the lower idol id
+        candidates = np.flatnonzero(values >= kth)
+        ordered = candidates[np.lexsort((idol_ids[candidates], -values[candidates]))]
+        return idol_ids[ordered[:k]].tolist()
+    
+    def _idol_query(self, db: Session):
+        """Idol rows joined with their group, laid out as IDOL_COLUMNS + GROUP_COLUMNS"""
+        return (
+            db.query(*IDOL_COLUMNS, *GROUP_COLUMNS)
+            .select_from(Idol)
+            .outerjoin(Group, Group.id == Idol.group_id)
+        )
+    
+    def _ranking_summary(self, ranking: Optional[Ranking]) -> Optional[Dict[str, Any]]:
+        """Compact ranking dict embedded in comparison responses"""
+        if not ranking:
+            return None
+        
+        return {
+            "rank": ranking.rank,
+            "score": ranking.score,
+            "category": ranking.category,
+            "date": ranking.date
+        }
+    
     def get_idol_trends(self, db: Session, idol_id: int, days: int = 30) -> Optional[Dict[str, Any]]:
         """Get trend data for a specific idol"""
         idol = db.query(Idol).filter(Idol.id == idol_id).first()
@@ -177,22 +328,21 @@ class RankingService:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        trends = db.query(TrendData).filter(
-            TrendData.idol_id == idol_id,
-            TrendData.date >= start_date,
-            TrendData.date <= end_date
-        ).order_by(TrendData.date).all()
+        # Only the monthly partitions overlapping the window are read
+        trend_table = scan(db, TrendData, start_date, end_date, where=lambda table: table.c.idol_id == idol_id,
+                           columns=('date', 'score', 'rank', 'category'))
+        trends = db.query(trend_table).order_by(trend_table.c.date).all()
         
         if not trends:
             return None
         
         trend_data = []
-        for trend in trends:
+        for date, score, rank, category in trends:
             trend_data.append({
-                "date": trend.date.isoformat(),
-                "score": trend.score,
-                "rank": trend.rank,
-                "category": trend.category
+                "date": date.isoformat(),
+                "score": score,
+                "rank": rank,
+                "category": category
             })
         
         return {
@@ -200,4 +350,93 @@ class RankingService:
             "idol_name": idol.name,
             "period_days": days,
             "trends": trend_data
-        } 
\ No newline at end of file
+        } 
+    
+    def get_trend_series(self, db: Session, idol_ids: List[int], days: int = 30, interval: str = 'day',
+                         category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Trend scores of several idols resampled onto one shared time axis.
+        
+        Every series holds one value per entry of ``timestamps``: the mean
+        score and the last rank observed in that interval, or None where an
+        idol had no observation. Series are ordered by ``idol_ids`` and then
+        category. Returns None when none of the idols exist.
+        """
+        import numpy as np
+        
+        names = dict(db.query(Idol.id, Idol.name).filter(Idol.id.in_(idol_ids)).all())
+        idol_ids = [idol_id for idol_id in dict.fromkeys(idol_ids) if idol_id in names]
+        if not idol_ids:
+            return None
+        
+        step = TREND_INTERVALS[interval]
+        now = datetime.now()
+        start = _interval_start(now - timedelta(days=days), interval)
+        points = (_interval_start(now, interval) - start) // step + 1
+        timestamps = [start + step * index for index in range(points)]
+        
+        # One query for every idol; only the monthly partitions overlapping the window are read
+        def criteria(table):
+            condition = table.c.idol_id.in_(idol_ids)
+            return condition if category is None else condition & (table.c.category == category)
+        
+        trend_table = scan(db, TrendData, start, now, where=criteria,
+                           columns=('idol_id', 'category', 'date', 'score', 'rank'))
+        rows = db.query(trend_table).order_by(trend_table.c.date).all()
+        
+        series = []
+        if rows:
+            idol_column, category_column, date_column, score_column, rank_column = zip(*rows)
+            order = {idol_id: index for index, idol_id in enumerate(idol_ids)}
+            idols = np.array([order[idol_id] for idol_id in idol_column], dtype=np.intp)
+            categories, category_codes = np.unique(np.array(category_column, dtype=object).astype(str),
+                                                   return_inverse=True)
+            keys, series_codes = np.unique(idols * len(categories) + category_codes, return_inverse=True)
+            
+            dates = np.array(date_column, dtype='datetime64[us]')
+            bins = (dates - np.datetime64(start, 'us')) // np.timedelta64(step)
+            cells = series_codes * points + np.clip(bins, 0, points - 1)
+            size = len(keys) * points
+            
+            counts = np.bincount(cells, minlength=size)
+            sums = np.bincount(cells, weights=np.array(score_column, dtype=np.float64), minlength=size)
+            present = (counts > 0).reshape(len(keys), points)
+            means = np.divide(sums, counts, out=np.zeros(size), where=counts > 0).reshape(len(keys), points)
+            
+            # Rows are in date order, so the first hit scanning backwards is the latest in each cell
+            filled, first = np.unique(cells[::-1], return_index=True)
+            ranks = np.full(size, np.nan)
+            ranks[filled] = np.array(rank_column, dtype=np.float64)[::-1][first]
+            ranks = ranks.reshape(len(keys), points)
+            has_rank = ~np.isnan(ranks)
+            ranks = np.nan_to_num(ranks).astype(np.int64)
+            
+            for row, key in enumerate(keys.tolist()):
+                series.append({
+                    "idol_id": idol_ids[key // len(categories)],
+                    "category": str(categories[key % len(categories)]),
+                    "score": _nullable(means[row], present[row]),
+                    "rank": _nullable(ranks[row], has_rank[row])
+                })
+        
+        return {
+            "interval": interval,
+            "period_days": days,
+            "timestamps": [timestamp.isoformat() for timestamp in timestamps],
+            "idols": [{"id": idol_id, "name": names[idol_id]} for idol_id in idol_ids],
+            "series": series
+        }
+
+
+def _nullable(values: "np.ndarray", present: "np.ndarray") -> List[Any]:
+    """``values`` as a JSON-ready list with None where nothing was observed"""
+    return [value if seen else None for value, seen in zip(values.tolist(), present.tolist())]
+
+
+def _interval_start(timestamp: datetime, interval: str) -> datetime:
+    """Start of the ``interval`` bin containing ``timestamp``"""
+    if interval == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    start = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import RankingSnapshot, Trend
+from serializers import dumps
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+def format_event(event: str, data, event_id: Optional[int] = None) -> bytes:
+    """Encode one Server-Sent Events message"""
+    header = f"event: {event}\n"
+    if event_id is not None:
+        header += f"id: {event_id}\n"
+    return header.encode("utf-8") + b"data: " + dumps(data) + b"\n\n"
+
+
+class RankingBroadcaster:
+    """Pushes ranking snapshot diffs to Server-Sent Events subscribers.
+
+    One poll loop per worker watches for new snapshots, so updates published
+    by any process (another worker, a cron refresh) reach every subscriber.
+    Each diff is built and encoded once per category and the same bytes are
+    queued to every subscriber of that category; a subscriber costs one
+    small queue. A subscriber that falls ``queue_size`` messages behind has
+    its backlog replaced by a single ``resync`` event instead of slowing
+    the others down.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], poll_interval: float = 2.0,
+                 keepalive_interval: float = 15.0, queue_size: int = 16, max_diff_rows: int = 2000):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.keepalive_interval = keepalive_interval
+        self.queue_size = queue_size
+        self.max_diff_rows = max_diff_rows
+        self.version: Optional[int] = None
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def stream(self, category: str, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """SSE body for one subscriber: a hello event, then diffs as snapshots are published"""
+        await self._ensure_started()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[category].add(queue)
+        try:
+            yield format_event("hello", {"category": category, "version": self.version}, self.version)
+            # A reconnecting client that missed a snapshot refetches instead of replaying diffs
+            if last_event_id and self.version is not None and last_event_id.isdigit() \
+                    and int(last_event_id) < self.version:
+                yield format_event("resync", {"category": category, "version": self.version}, self.version)
+            while True:
+                yield await queue.get()
+        finally:
+            self._unsubscribe(category, queue)
+
+    def publish(self, category: str, message: bytes):
+        """Queue an encoded message to every subscriber of ``category``"""
+        for queue in list(self._subscribers.get(category, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._resync(queue, category)
+
+    def notify(self):
+        """Check for a new snapshot now rather than at the next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _unsubscribe(self, category: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(category)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[category]
+
+    def _resync(self, queue: asyncio.Queue, category: str):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(format_event("resync", {"category": category, "version": self.version}, self.version))
+
+    async def _ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        # Subscribers connecting together must not each start a poll loop while the first awaits the version
+        async with self._start_lock:
+            if self._task is not None and not self._task.done():
+                return
+            self._wakeup = asyncio.Event()
+            if self.version is None:
+                self.version = await run_in_threadpool(self._latest_version)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        last_keepalive = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self._publish_new_snapshots()
+            except Exception as e:
+                logger.warning("Ranking stream poll failed: %s", e)
+
+            now = time.monotonic()
+            if now - last_keepalive >= self.keepalive_interval:
+                last_keepalive = now
+                for category in list(self._subscribers):
+                    self.publish(category, KEEPALIVE)
+
+    async def _publish_new_snapshots(self):
+        latest = await run_in_threadpool(self._latest_version)
+        if latest is None or (self.version is not None and latest <= self.version):
+            return
+
+        # Diffs are consecutive, so a client applying them in order stays exact.
+        # With no subscribers the loop is empty and only the version advances.
+        first = latest if self.version is None else self.version + 1
+        for version in range(first, latest + 1):
+            for category in list(self._subscribers):
+                message = await run_in_threadpool(self._build_diff, category, version)
+                self.publish(category, message)
+            self.version = version
+
+    def _latest_version(self) -> Optional[int]:
+        db = self.session_factory()
+        try:
+            return db.query(func.max(RankingSnapshot.version)).scalar()
+        finally:
+            db.close()
+
+    def _build_diff(self, category: str, version: int) -> bytes:
+        """Encoded ``rankings`` event with the idols whose rank changed in ``version``"""
+        db = self.session_factory()
+        try:
+            computed_at = db.query(RankingSnapshot.computed_at).filter(
+                RankingSnapshot.category == category,
+                RankingSnapshot.version == version
+            ).scalar()
+            # Rank movement is recorded per snapshot as <category>_rank trends; None means newly ranked
+            rows = db.query(Trend.idol_id, Trend.value, Trend.change).filter(
+                Trend.trend_type == f"{category}_rank",
+                Trend.version == version,
+                or_(Trend.change != 0, Trend.change.is_(None))
+            ).order_by(Trend.value).limit(self.max_diff_rows + 1).all()
+        finally:
+            db.close()
+
+        if len(rows) > self.max_diff_rows:
+            return format_event("resync", {"category": category, "version": version}, version)
+
+        return format_event("rankings", {
+            "category": category,
+            "version": version,
+            "computed_at": computed_at,
+            # [idol_id, rank, previous_rank]
+            "changes": [
+                [idol_id, int(rank), None if change is None else int(rank + change)]
+                for idol_id, rank, change in rows
+            ]
+        }, version)
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+
+from sqlalchemy.orm import Session, selectinload
+
+from models import DataSource, RefreshRun, RefreshSourceStat
+
+logger = logging.getLogger(__name__)
+
+
+class SourceTelemetry:
+    """Counters for a single data source within one refresh run"""
+
+    def __init__(self, source_name: str, source_type: Optional[str] = None):
+        self.source_name = source_name
+        self.source_type = source_type
+        self.requests_made = 0
+        self.rows_written = 0
+        self.errors_by_type: Counter = Counter()
+        self.last_error: Optional[str] = None
+        self.rate_limit_wait_seconds = 0.0
+        self.duration_seconds = 0.0
+        self.failed = False
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration_seconds = time.perf_counter() - self._started
+        # Source-level failures are recorded, not propagated to the run; cancellation,
+        # KeyboardInterrupt and SystemExit are not failures and must keep propagating
+        if exc_type is None or not issubclass(exc_type, Exception):
+            return False
+        self.failed = True
+        self.record_error(exc_val)
+        return True
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors_by_type.values())
+
+    def record_request(self, count: int = 1):
+        """Count outbound requests made to the upstream"""
+        self.requests_made += count
+
+    def record_rows(self, count: int):
+        """Count rows written to the database"""
+        self.rows_written += count
+
+    def record_error(self, error: Exception, context: Optional[str] = None):
+        """Count an error by exception type and keep the latest message"""
+        error_type = type(error).__name__
+        self.errors_by_type[error_type] += 1
+        self.last_error = f"{context}: {error}" if context else str(error)
+        logger.warning("%s error in %s: %s", error_type, self.source_name, self.last_error)
+
+    def record_http_error(self, status: int, context: Optional[str] = None):
+        """Count a non-success HTTP status from the upstream"""
+        self.errors_by_type[f"HTTP {status}"] += 1
+        self.last_error = f"{context}: HTTP {status}" if context else f"HTTP {status}"
+
+    async def rate_limit(self, seconds: float):
+        """Sleep for rate limiting, recording the time spent waiting"""
+        self.rate_limit_wait_seconds += seconds
+        await asyncio.sleep(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source_name": self.source_name,
+            "source_type": self.source_type,
+            "duration_seconds": self.duration_seconds,
+            "requests_made": self.requests_made,
+            "rows_written": self.rows_written,
+            "error_count": self.error_count,
+            "errors_by_type": dict(self.errors_by_type),
+            "last_error": self.last_error,
+            "rate_limit_wait_seconds": self.rate_limit_wait_seconds
+        }
+
+
+class RefreshTelemetry:
+    """Structured record of one refresh run across all sources"""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.sources: List[SourceTelemetry] = []
+
+    def source(self, source: DataSource) -> SourceTelemetry:
+        """Start tracking a data source; use as a context manager around its collection"""
+        telemetry = SourceTelemetry(source.name, source.type)
+        self.sources.append(telemetry)
+        return telemetry
+
+    @property
+    def updated_count(self) -> int:
+        return sum(source.rows_written for source in self.sources)
+
+    @property
+    def status(self) -> str:
+        failed = [source for source in self.sources if source.error_count]
+        if not failed:
+            return "success"
+        if len(failed) == len(self.sources) and not self.updated_count:
+            return "failed"
+        return "partial"
+
+    def persist(self, db: Session) -> RefreshRun:
+        """Write the run and its per-source stats to the database"""
+        run = RefreshRun(
+            status=self.status,
+            started_at=self.started_at,
+            finished_at=datetime.now(),
+            duration_seconds=time.perf_counter() - self._started,
+            updated_count=self.updated_count
+        )
+        db.add(run)
+        db.flush()
+
+        db.add_all([
+            RefreshSourceStat(
+                run_id=run.id,
+                source_name=source.source_name,
+                source_type=source.source_type,
+                duration_seconds=source.duration_seconds,
+                requests_made=source.requests_made,
+                rows_written=source.rows_written,
+                error_count=source.error_count,
+                errors_by_type=json.dumps(dict(source.errors_by_type)),
+                last_error=source.last_error,
+                rate_limit_wait_seconds=source.rate_limit_wait_seconds
+            )
+            for source in self.sources
+        ])
+        db.commit()
+        return run
+
+    def to_dict(self, run: Optional[RefreshRun] = None) -> Dict[str, Any]:
+        return {
+            "id": run.id if run else None,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": run.finished_at if run else None,
+            "duration_seconds": run.duration_seconds if run else None,
+            "updated_count": self.updated_count,
+            "sources": [source.to_dict() for source in self.sources]
+        }
+
+
+def serialize_refresh_run(run: RefreshRun) -> Dict[str, Any]:
+    """Convert a persisted run and its source stats to a response dict"""
+    return {
+        "id": run.id,
+        "status": run.status,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "duration_seconds": run.duration_seconds,
+        "updated_count": run.updated_count or 0,
+        "sources": [
+            {
+                "source_name": stat.source_name,
+                "source_type": stat.source_type,
+                "duration_seconds": stat.duration_seconds,
+                "requests_made": stat.requests_made or 0,
+                "rows_written": stat.rows_written or 0,
+                "error_count": stat.error_count or 0,
+                "errors_by_type": json.loads(stat.errors_by_type) if stat.errors_by_type else {},
+                "last_error": stat.last_error,
+                "rate_limit_wait_seconds": stat.rate_limit_wait_seconds or 0.0
+            }
+            for stat in run.sources
+        ]
+    }
+
+
+def get_refresh_runs(db: Session, limit: int = 20, source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Most recent refresh runs, newest first"""
+    query = db.query(RefreshRun).options(selectinload(RefreshRun.sources))
+
+    if source:
+        query = query.join(RefreshSourceStat).filter(RefreshSourceStat.source_name == source).distinct()
+
+    runs = query.order_by(RefreshRun.started_at.desc()).limit(limit).all()
+    return [serialize_refresh_run(run) for run in runs]
+
+
+def get_refresh_run(db: Session, run_id: int) -> Optional[Dict[str, Any]]:
+    """A single refresh run with its per-source stats"""
+    run = db.query(RefreshRun).options(selectinload(RefreshRun.sources)).filter(RefreshRun.id == run_id).first()
+    return serialize_refresh_run(run) if run else None
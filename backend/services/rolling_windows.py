@@ -0,0 +1,278 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import TrendData, TrendDailyStat, TrendWindow, TrendWindowStat
+from services.partitions import scan
+
+
+# Trend windows kept as running aggregates; other window lengths are averaged from trend_data
+WINDOWS = (7, 30, 90)
+STATS = ('score_sum', 'score_count', 'score_sq_sum')
+
+DAILY_KEY = ('idol_id', 'category', 'day')
+WINDOW_KEY = ('window_days', 'idol_id', 'category')
+
+_UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert
+}
+
+
+def day_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def window_start(now: datetime, days: int) -> datetime:
+    """First day counted in a ``days`` window at ``now``: the last ``days`` whole days plus today"""
+    return day_start(now) - timedelta(days=days)
+
+
+def record_observations(db: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """Fold a batch of trend observations into the daily and window aggregates; returns rows folded.
+
+    Rows carry their ingestion ``bucket`` and must be recorded before they
+    are written: one that replaces an earlier observation of its bucket adds
+    only the difference. Until the windows are first built this does
+    nothing, since building reads trend_data itself.
+    """
+    starts = dict(db.query(TrendWindow.window_days, TrendWindow.start).all())
+    if not starts:
+        return 0
+    oldest = min(starts.values())
+    rows = [row for row in rows if row['bucket'] >= oldest]
+    if not rows:
+        return 0
+
+    previous = _previous_scores(db, rows)
+    daily: Dict[Tuple[Any, ...], List[float]] = defaultdict(lambda: [0.0, 0, 0.0])
+    for row in rows:
+        score = float(row['score'])
+        stat = daily[(row['idol_id'], row['category'], day_start(row['bucket']))]
+        old = previous.get((row['idol_id'], row['category'], row['source'], row['bucket']))
+        if old is None:
+            stat[0] += score
+            stat[1] += 1
+            stat[2] += score * score
+        else:
+            stat[0] += score - old
+            stat[2] += score * score - old * old
+
+    _accumulate(db, TrendDailyStat, DAILY_KEY, [
+        {'idol_id': idol_id, 'category': category, 'day': day, **dict(zip(STATS, stat))}
+        for (idol_id, category, day), stat in daily.items()
+    ])
+    for days, start in starts.items():
+        window: Dict[Tuple[Any, ...], List[float]] = defaultdict(lambda: [0.0, 0, 0.0])
+        for (idol_id, category, day), stat in daily.items():
+            if day >= start:
+                totals = window[(idol_id, category)]
+                for index, value in enumerate(stat):
+                    totals[index] += value
+        _accumulate(db, TrendWindowStat, WINDOW_KEY, [
+            {'window_days': days, 'idol_id': idol_id, 'category': category, **dict(zip(STATS, totals))}
+            for (idol_id, category), totals in window.items()
+        ])
+    return len(rows)
+
+
+def advance(db: Session, now: Optional[datetime] = None) -> int:
+    """Move every window forward to ``now``, subtracting the days that left it; returns days retired.
+
+    Touches only the daily aggregates of the days leaving, never trend_data.
+    """
+    now = now or datetime.now()
+    retired = 0
+    for window in db.query(TrendWindow).all():
+        target = window_start(now, window.window_days)
+        if target <= window.start:
+            continue
+        expired = (
+            db.query(TrendDailyStat.idol_id, TrendDailyStat.category,
+                     *[func.sum(getattr(TrendDailyStat, column)) for column in STATS])
+            .filter(TrendDailyStat.day >= window.start, TrendDailyStat.day < target)
+            .group_by(TrendDailyStat.idol_id, TrendDailyStat.category)
+            .all()
+        )
+        _accumulate(db, TrendWindowStat, WINDOW_KEY, [
+            {'window_days': window.window_days, 'idol_id': idol_id, 'category': category,
+             **{column: -value for column, value in zip(STATS, values)}}
+            for idol_id, category, *values in expired
+        ])
+        retired += (target - window.start).days
+        window.start = target
+
+    if retired:
+        db.query(TrendWindowStat).filter(TrendWindowStat.score_count <= 0).delete(synchronize_session=False)
+        oldest = db.query(func.min(TrendWindow.start)).scalar()
+        db.query(TrendDailyStat).filter(TrendDailyStat.day < oldest).delete(synchronize_session=False)
+    db.flush()
+    return retired
+
+
+def rebuild(db: Session, now: Optional[datetime] = None) -> int:
+    """Recompute every aggregate from trend_data; returns observations read"""
+    now = now or datetime.now()
+    oldest = window_start(now, max(WINDOWS))
+    trend = scan(db, TrendData, oldest, columns=('idol_id', 'category', 'score', 'bucket', 'date'))
+    # Rows written outside ingestion may have no bucket; their own date places them
+    bucket = func.coalesce(trend.c.bucket, trend.c.date)
+    rows = (
+        db.query(trend.c.idol_id, trend.c.category, bucket,
+                 func.sum(trend.c.score), func.count(trend.c.score), func.sum(trend.c.score * trend.c.score))
+        .group_by(trend.c.idol_id, trend.c.category, bucket)
+        .all()
+    )
+
+    # Buckets never straddle midnight, so each folds into exactly one day
+    daily: Dict[Tuple[Any, ...], List[float]] = defaultdict(lambda: [0.0, 0, 0.0])
+    observations = 0
+    for idol_id, category, bucket, *values in rows:
+        stat = daily[(idol_id, category, day_start(bucket))]
+        for index, value in enumerate(values):
+            stat[index] += value
+        observations += values[1]
+
+    db.query(TrendDailyStat).delete(synchronize_session=False)
+    db.query(TrendWindowStat).delete(synchronize_session=False)
+    db.query(TrendWindow).delete(synchronize_session=False)
+    if daily:
+        db.bulk_insert_mappings(TrendDailyStat, [
+            {'idol_id': idol_id, 'category': category, 'day': day, **dict(zip(STATS, stat))}
+            for (idol_id, category, day), stat in daily.items()
+        ])
+
+    for days in WINDOWS:
+        start = window_start(now, days)
+        window: Dict[Tuple[Any, ...], List[float]] = defaultdict(lambda: [0.0, 0, 0.0])
+        for (idol_id, category, day), stat in daily.items():
+            if day >= start:
+                totals = window[(idol_id, category)]
+                for index, value in enumerate(stat):
+                    totals[index] += value
+        if window:
+            db.bulk_insert_mappings(TrendWindowStat, [
+                {'window_days': days, 'idol_id': idol_id, 'category': category, **dict(zip(STATS, totals))}
+                for (idol_id, category), totals in window.items()
+            ])
+        db.add(TrendWindow(window_days=days, start=start, rebuilt_at=now))
+    db.flush()
+    return observations
+
+
+def window_stats(db: Session, days: int, now: Optional[datetime] = None) -> Optional[List[Tuple[Any, ...]]]:
+    """(idol_id, category, sum, count, sum of squares) per idol and category over a ``days`` window.
+
+    Reads one row per idol and category whatever the history depth. Returns
+    None when ``days`` is not a maintained window or the windows cannot be
+    placed at ``now`` (they only move forward), so the caller should average
+    trend_data itself.
+    """
+    if days not in WINDOWS:
+        return None
+    now = now or datetime.now()
+    if {row[0] for row in db.query(TrendWindow.window_days)} != set(WINDOWS):
+        rebuild(db, now)
+    else:
+        advance(db, now)
+
+    start = db.query(TrendWindow.start).filter(TrendWindow.window_days == days).scalar()
+    if start != window_start(now, days):
+        return None
+    return (
+        db.query(TrendWindowStat.idol_id, TrendWindowStat.category,
+                 *[getattr(TrendWindowStat, column) for column in STATS])
+        .filter(TrendWindowStat.window_days == days, TrendWindowStat.score_count > 0)
+        .all()
+    )
+
+
+def verify(db: Session, now: Optional[datetime] = None, tolerance: float = 1e-6,
+           limit: int = 20) -> Dict[str, Any]:
+    """Compare every window against a full recomputation from trend_data.
+
+    Returns the groups checked and mismatched per window and the first
+    ``limit`` mismatches. Windows that were never built count as mismatched.
+    """
+    now = now or datetime.now()
+    advance(db, now)
+    starts = dict(db.query(TrendWindow.window_days, TrendWindow.start).all())
+    report: Dict[str, Any] = {'windows': {}, 'mismatches': []}
+
+    for days in WINDOWS:
+        start = starts.get(days)
+        trend = scan(db, TrendData, start or window_start(now, days), columns=('idol_id', 'category', 'score'))
+        expected = {
+            (idol_id, category): values
+            for idol_id, category, *values in db.query(
+                trend.c.idol_id, trend.c.category,
+                func.sum(trend.c.score), func.count(trend.c.score), func.sum(trend.c.score * trend.c.score)
+            ).group_by(trend.c.idol_id, trend.c.category)
+        }
+        actual = {
+            (idol_id, category): values
+            for idol_id, category, *values in db.query(
+                TrendWindowStat.idol_id, TrendWindowStat.category, *[getattr(TrendWindowStat, column) for column in STATS]
+            ).filter(TrendWindowStat.window_days == days, TrendWindowStat.score_count > 0)
+        }
+
+        mismatched = 0
+        for key in expected.keys() | actual.keys():
+            want = expected.get(key, (0.0, 0, 0.0))
+            have = actual.get(key, (0.0, 0, 0.0))
+            if start is not None and want[1] == have[1] and all(
+                    abs(w - h) <= tolerance * max(1.0, abs(w)) for w, h in zip(want, have)):
+                continue
+            mismatched += 1
+            if len(report['mismatches']) < limit:
+                report['mismatches'].append({
+                    'window_days': days, 'idol_id': key[0], 'category': key[1],
+                    'expected': dict(zip(STATS, want)), 'actual': dict(zip(STATS, have))
+                })
+        report['windows'][days] = {'groups': len(expected), 'mismatched': mismatched}
+
+    report['consistent'] = not any(window['mismatched'] for window in report['windows'].values())
+    return report
+
+
+def _previous_scores(db: Session, rows: List[Dict[str, Any]]) -> Dict[Tuple[Any, ...], float]:
+    """Scores already stored for the (idol, category, source, bucket) keys of ``rows``"""
+    idol_ids = {row['idol_id'] for row in rows}
+    buckets = {row['bucket'] for row in rows}
+    trend = scan(db, TrendData, min(buckets), columns=('idol_id', 'category', 'source', 'bucket', 'score'),
+                 where=lambda table: and_(table.c.idol_id.in_(idol_ids), table.c.bucket.in_(buckets)))
+    return {
+        (idol_id, category, source, bucket): score
+        for idol_id, category, source, bucket, score in db.query(
+            trend.c.idol_id, trend.c.category, trend.c.source, trend.c.bucket, trend.c.score
+        )
+    }
+
+
+def _accumulate(db: Session, model, key: Tuple[str, ...], rows: List[Dict[str, Any]]):
+    """Add each row's stats onto the row with the same key, creating it if missing"""
+    if not rows:
+        return
+    insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        for row in rows:
+            existing = db.query(model).filter(and_(*[getattr(model, column) == row[column] for column in key])).first()
+            if existing is None:
+                db.add(model(**row))
+            else:
+                for column in STATS:
+                    setattr(existing, column, getattr(existing, column) + row[column])
+        db.flush()
+        return
+
+    table = model.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={column: table.c[column] + statement.excluded[column] for column in STATS}
+    )
+    db.execute(statement, rows)
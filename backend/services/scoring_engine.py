@@ -0,0 +1,267 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, and_
+from sqlalchemy.orm import Session
+
+from models import Idol, Metric, TrendData
+from services.platform_config import get_config_value
+from services.partitions import scan
+from services.ranking_service import CATEGORY_COLUMNS
+from services.rolling_windows import window_stats
+
+
+SUB_SCORES = ('music', 'social', 'brand', 'search', 'award')
+
+# Default weights, as documented in the README ranking algorithm
+DEFAULT_WEIGHTS = {
+    'music': 0.30,
+    'social': 0.25,
+    'brand': 0.20,
+    'search': 0.15,
+    'award': 0.10
+}
+
+# Raw signal -> sub-score it feeds
+SIGNAL_SUB_SCORES = {
+    'melon_chart': 'music',
+    'gaon_chart': 'music',
+    'genie_chart': 'music',
+    'bugs_chart': 'music',
+    'spotify_followers': 'music',
+    'youtube_subscribers': 'music',
+    'youtube_views': 'music',
+    'trend_music': 'music',
+    'trend_streaming': 'music',
+    'instagram_followers': 'social',
+    'twitter_followers': 'social',
+    'tiktok_followers': 'social',
+    'twitter_mentions': 'social',
+    'trend_social': 'social',
+    'brand_reputation_ranking': 'brand',
+    'google_trends': 'search',
+    'award_wins': 'award',
+    'award_nominations': 'award'
+}
+
+# Count-like signals span orders of magnitude; z-scores are taken on log1p
+LOG_SCALED_SIGNALS = {
+    'spotify_followers', 'youtube_subscribers', 'youtube_views', 'instagram_followers',
+    'twitter_followers', 'tiktok_followers', 'twitter_mentions', 'award_wins', 'award_nominations'
+}
+
+NORMALIZATIONS = ('percentile', 'zscore')
+
+GROUP_AGGREGATIONS = ('mean', 'max', 'weighted')
+
+WEIGHTS_CONFIG_KEY = 'ranking_weights'
+NORMALIZATION_CONFIG_KEY = 'ranking_normalization'
+WINDOW_CONFIG_KEY = 'ranking_window_days'
+GROUP_AGGREGATION_CONFIG_KEY = 'group_ranking_aggregation'
+
+
+class ScoreMatrix:
+    """Sub-scores and total score per idol, one NumPy column each, aligned on idol_ids"""
+
+    def __init__(self, idol_ids: np.ndarray, scores: Dict[str, np.ndarray], computed_at: datetime,
+                 group_ids: Optional[np.ndarray] = None):
+        self.idol_ids = idol_ids
+        self.scores = scores
+        self.computed_at = computed_at
+        # Group of each idol, 0 for soloists
+        self.group_ids = group_ids if group_ids is not None else np.zeros(len(idol_ids), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.idol_ids)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.scores[column]
+
+    def order(self, column: str) -> np.ndarray:
+        """Row indices sorted by score descending, ties broken by idol id"""
+        return np.lexsort((self.idol_ids, -self.scores[column]))
+
+
+class ScoringEngine:
+    """Vectorized composite scoring over the raw metrics of all idols"""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, normalization: Optional[str] = None,
+                 window_days: Optional[int] = None):
+        self.weights = weights
+        self.normalization = normalization
+        self.window_days = window_days
+
+    def compute(self, db: Session, now: Optional[datetime] = None) -> ScoreMatrix:
+        """Load signals for all active idols and compute every sub-score in one pass"""
+        now = now or datetime.now()
+        weights = self.weights or get_config_value(db, WEIGHTS_CONFIG_KEY, DEFAULT_WEIGHTS)
+        normalization = self.normalization or get_config_value(db, NORMALIZATION_CONFIG_KEY, 'percentile')
+        window_days = self.window_days or int(get_config_value(db, WINDOW_CONFIG_KEY, 30))
+
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization '{normalization}', expected one of {NORMALIZATIONS}")
+
+        idols = db.query(Idol.id, Idol.group_id).filter(Idol.is_active == True).order_by(Idol.id).all()
+        idol_ids = np.array([row[0] for row in idols], dtype=np.int64)
+        group_ids = np.array([row[1] or 0 for row in idols], dtype=np.int64)
+        
+        signals = self.load_signals(db, idol_ids, now - timedelta(days=window_days), window_days, now)
+        matrix = self.score(idol_ids, signals, weights, normalization, now)
+        matrix.group_ids = group_ids
+        return matrix
+
+    def load_signals(self, db: Session, idol_ids: np.ndarray, since: datetime, window_days: Optional[int] = None,
+                     now: Optional[datetime] = None) -> pd.DataFrame:
+        """Raw signal matrix: one row per idol, one column per signal, NaN where missing"""
+        # Latest value per (idol, metric type) in the window; only partitions
+        # overlapping the window are read
+        columns = ('idol_id', 'metric_type', 'value', 'date')
+        metrics = scan(db, Metric, since, columns=columns)
+        latest = (
+            db.query(metrics.c.idol_id, metrics.c.metric_type, func.max(metrics.c.date).label('date'))
+            .group_by(metrics.c.idol_id, metrics.c.metric_type)
+            .subquery()
+        )
+        values = scan(db, Metric, since, columns=columns)
+        metric_rows = (
+            db.query(values.c.idol_id, values.c.metric_type, func.max(values.c.value))
+            .join(latest, and_(
+                values.c.idol_id == latest.c.idol_id,
+                values.c.metric_type == latest.c.metric_type,
+                values.c.date == latest.c.date
+            ))
+            .group_by(values.c.idol_id, values.c.metric_type)
+            .all()
+        )
+
+        # Window average per (idol, trend category), read from the running
+        # aggregates for the 7/30/90-day windows instead of re-averaging history
+        stats = window_stats(db, window_days, now) if window_days else None
+        if stats is not None:
+            trend_rows = [(idol_id, f'trend_{category}', total / count) for idol_id, category, total, count, _ in stats]
+        else:
+            trend_data = scan(db, TrendData, since, columns=('idol_id', 'category', 'score', 'date'))
+            trend_rows = (
+                db.query(trend_data.c.idol_id, ('trend_' + trend_data.c.category).label('signal'),
+                         func.avg(trend_data.c.score))
+                .group_by(trend_data.c.idol_id, trend_data.c.category)
+                .all()
+            )
+
+        frame = pd.DataFrame(metric_rows + trend_rows, columns=['idol_id', 'signal', 'value'])
+        frame = frame[frame['signal'].isin(SIGNAL_SUB_SCORES.keys())]
+        if frame.empty:
+            return pd.DataFrame(index=idol_ids, dtype=np.float64)
+        matrix = frame.pivot_table(index='idol_id', columns='signal', values='value', aggfunc='last')
+        return matrix.reindex(index=idol_ids)
+
+    def score(self, idol_ids: np.ndarray, signals: pd.DataFrame, weights: Dict[str, float],
+              normalization: str, computed_at: datetime) -> ScoreMatrix:
+        """Normalize every signal, fold them into sub-scores and combine with weights"""
+        columns: List[str] = list(signals.columns)
+        raw = signals.to_numpy(dtype=np.float64, na_value=np.nan)
+        normalized = self.normalize(raw, columns, normalization)
+
+        scores: Dict[str, np.ndarray] = {}
+        has_data = {}
+        for sub_score in SUB_SCORES:
+            indices = [i for i, column in enumerate(columns) if SIGNAL_SUB_SCORES[column] == sub_score]
+            if indices:
+                block = normalized[:, indices]
+                counts = np.sum(~np.isnan(block), axis=1)
+                sums = np.nansum(block, axis=1)
+                scores[sub_score] = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+                has_data[sub_score] = bool(counts.any())
+            else:
+                scores[sub_score] = np.zeros(len(idol_ids))
+                has_data[sub_score] = False
+
+        # Sub-scores nobody has data for drop out and their weight is redistributed
+        active_weights = np.array([
+            float(weights.get(sub_score, 0.0)) if has_data[sub_score] else 0.0
+            for sub_score in SUB_SCORES
+        ])
+        weight_sum = active_weights.sum()
+        if weight_sum > 0:
+            active_weights /= weight_sum
+
+        stacked = np.column_stack([scores[sub_score] for sub_score in SUB_SCORES])
+        scores['total'] = np.clip(stacked @ active_weights, 0.0, 100.0)
+
+        return ScoreMatrix(idol_ids, scores, computed_at)
+
+    def normalize(self, raw: np.ndarray, columns: List[str], normalization: str) -> np.ndarray:
+        """Map each column of ``raw`` onto 0-100, leaving NaN where a value is missing"""
+        if raw.size == 0:
+            return raw
+
+        if normalization == 'percentile':
+            # Average rank of each value among the non-missing values of its column
+            ranks = pd.DataFrame(raw).rank(method='average', pct=True).to_numpy()
+            return ranks * 100.0
+
+        values = raw.copy()
+        log_columns = [i for i, column in enumerate(columns) if column in LOG_SCALED_SIGNALS]
+        if log_columns:
+            values[:, log_columns] = np.log1p(np.clip(values[:, log_columns], 0, None))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+            z = (values - mean) / np.where(std > 0, std, 1.0)
+
+        # +-3 standard deviations span the 0-100 range
+        return np.clip((z + 3.0) / 6.0 * 100.0, 0.0, 100.0)
+
+
+class GroupScores:
+    """Group-level scores aggregated from member scores, aligned on group_ids"""
+
+    def __init__(self, group_ids: np.ndarray, member_counts: np.ndarray, scores: Dict[str, np.ndarray],
+                 aggregation: str):
+        self.group_ids = group_ids
+        self.member_counts = member_counts
+        self.scores = scores
+        self.aggregation = aggregation
+
+    def __len__(self) -> int:
+        return len(self.group_ids)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.scores[column]
+
+    def order(self, column: str) -> np.ndarray:
+        """Row indices sorted by score descending, ties broken by group id"""
+        return np.lexsort((self.group_ids, -self.scores[column]))
+
+
+def aggregate_groups(matrix: ScoreMatrix, aggregation: str = 'mean') -> GroupScores:
+    """Reduce member scores to one score per group and column.
+
+    ``mean`` averages members, ``max`` takes the best member and ``weighted``
+    weights each member by their own score, so standout members count more.
+    """
+    if aggregation not in GROUP_AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {GROUP_AGGREGATIONS}")
+
+    in_group = matrix.group_ids > 0
+    group_ids, inverse = np.unique(matrix.group_ids[in_group], return_inverse=True)
+    member_counts = np.bincount(inverse, minlength=len(group_ids))
+
+    scores = {}
+    for column, values in matrix.scores.items():
+        values = values[in_group]
+        if aggregation == 'mean':
+            reduced = np.bincount(inverse, weights=values, minlength=len(group_ids)) / np.maximum(member_counts, 1)
+        elif aggregation == 'max':
+            reduced = np.full(len(group_ids), -np.inf)
+            np.maximum.at(reduced, inverse, values)
+        else:
+            weight_sums = np.bincount(inverse, weights=values, minlength=len(group_ids))
+            weighted = np.bincount(inverse, weights=values * values, minlength=len(group_ids))
+            reduced = np.where(weight_sums > 0, weighted / np.where(weight_sums > 0, weight_sums, 1.0), 0.0)
+        scores[column] = reduced
+
+    return GroupScores(group_ids, member_counts, scores, aggregation)
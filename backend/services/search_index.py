@@ -0,0 +1,333 @@
+import heapq
+import math
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import ChangeLog, Idol, Group
+from services.change_log import GROUP, IDOL
+
+
+# Indexed fields and how much a match on each counts towards the result score
+FIELD_WEIGHTS = {
+    'stage_name': 1.0,
+    'name': 1.0,
+    'real_name': 0.9,
+    'group': 0.8,
+    'company': 0.4
+}
+
+_HANGUL_BASE = 0xAC00
+_HANGUL_LAST = 0xD7A3
+_CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+_JUNGSEONG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+_JONGSEONG = ('', 'ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄹ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ', 'ㄿ', 'ㅀ',
+              'ㅁ', 'ㅂ', 'ㅄ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ')
+
+
+def normalize(text: Optional[str]) -> str:
+    """Search key for ``text``: case-folded, punctuation and spaces removed,
+    Hangul syllables decomposed into jamo so partial syllables still match"""
+    if not text:
+        return ''
+
+    out = []
+    for char in unicodedata.normalize('NFKC', text).casefold():
+        code = ord(char)
+        if _HANGUL_BASE <= code <= _HANGUL_LAST:
+            offset = code - _HANGUL_BASE
+            out.append(_CHOSEONG[offset // 588])
+            out.append(_JUNGSEONG[offset % 588 // 28])
+            out.append(_JONGSEONG[offset % 28])
+        elif char.isalnum():
+            out.append(char)
+    return ''.join(out)
+
+
+def trigrams(key: str) -> Set[str]:
+    """Character trigrams of a search key, padded so short keys still produce some"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """In-memory trigram and prefix index over idol names, groups and companies.
+
+    Distinct normalized keys are indexed once and map to the idols (and
+    fields) that carry them, so a company or group shared by thousands of
+    idols costs one posting per trigram. Prefix matches come from a sorted
+    key list searched with bisect; fuzzy matches come from trigram posting
+    lists scored by Jaccard similarity, using the rarest query trigrams to
+    generate candidates.
+    """
+
+    def __init__(self, min_similarity: float = 0.3, sync_interval: float = 5.0):
+        self.min_similarity = min_similarity
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._key_ids: Dict[str, int] = {}
+        self._keys: Dict[int, Tuple[str, int]] = {}  # key id -> (key, trigram count)
+        self._key_idols: Dict[int, Dict[int, str]] = {}  # key id -> {idol id: field}
+        self._key_weights: Dict[int, float] = {}  # key id -> upper bound of its field weights
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted_keys: List[str] = []
+        self._idol_keys: Dict[int, List[int]] = {}
+        self._documents: Dict[int, Dict[str, Any]] = {}
+        self._next_key_id = 0
+        self._synced_version: Optional[int] = None  # change log version the index reflects
+        self._last_sync_check = 0.0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    # Maintenance -------------------------------------------------------------
+
+    def upsert(self, idol_id: int, document: Dict[str, Any], fields: Dict[str, Optional[str]]):
+        """Index or re-index one idol; ``fields`` maps field name to raw text"""
+        with self._lock:
+            self._remove_idol(idol_id)
+            self._add_idol(idol_id, document, fields, keep_sorted=True)
+
+    def remove(self, idol_id: int):
+        with self._lock:
+            self._remove_idol(idol_id)
+
+    def rebuild(self, items: List[Tuple[int, Dict[str, Any], Dict[str, Optional[str]]]]):
+        """Replace the whole index; sorts the key list once instead of per insert"""
+        with self._lock:
+            self.__init__(self.min_similarity, self.sync_interval)
+            for idol_id, document, fields in items:
+                self._add_idol(idol_id, document, fields, keep_sorted=False)
+            self._sorted_keys.sort()
+
+    def _add_idol(self, idol_id: int, document: Dict[str, Any], fields: Dict[str, Optional[str]],
+                  keep_sorted: bool):
+        self._documents[idol_id] = document
+        key_ids = self._idol_keys[idol_id] = []
+        for field, text in fields.items():
+            key = normalize(text)
+            if not key:
+                continue
+            key_id = self._key_ids.get(key)
+            if key_id is None:
+                key_id = self._key_ids[key] = self._next_key_id
+                self._next_key_id += 1
+                grams = trigrams(key)
+                self._keys[key_id] = (key, len(grams))
+                self._key_idols[key_id] = {}
+                for gram in grams:
+                    self._postings[gram].add(key_id)
+                if keep_sorted:
+                    insort(self._sorted_keys, key)
+                else:
+                    self._sorted_keys.append(key)
+            # The same text in two fields keeps the higher-weighted field
+            current = self._key_idols[key_id].get(idol_id)
+            if current is None or FIELD_WEIGHTS[field] > FIELD_WEIGHTS[current]:
+                self._key_idols[key_id][idol_id] = field
+            self._key_weights[key_id] = max(self._key_weights.get(key_id, 0.0), FIELD_WEIGHTS[field])
+            key_ids.append(key_id)
+
+    def _remove_idol(self, idol_id: int):
+        self._documents.pop(idol_id, None)
+        for key_id in self._idol_keys.pop(idol_id, []):
+            idols = self._key_idols.get(key_id)
+            if idols is None:
+                continue
+            idols.pop(idol_id, None)
+            if idols:
+                continue
+            # Last idol carrying this key: drop the key entirely
+            key, _ = self._keys.pop(key_id)
+            del self._key_idols[key_id]
+            del self._key_weights[key_id]
+            del self._key_ids[key]
+            for gram in trigrams(key):
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(key_id)
+                    if not posting:
+                        del self._postings[gram]
+            position = bisect_left(self._sorted_keys, key)
+            if position < len(self._sorted_keys) and self._sorted_keys[position] == key:
+                del self._sorted_keys[position]
+
+    def sync(self, db: Session, force: bool = False) -> int:
+        """Re-index idols changed since the last sync; returns the number re-indexed.
+
+        The first call builds the whole index; later calls replay the change
+        log from the version the index was built at, re-reading idols (or
+        members of groups) that were changed and dropping those deleted or
+        deactivated. Checks run at most once per ``sync_interval`` seconds
+        unless forced.
+        """
+        now = time.monotonic()
+        if not force and self._synced_version is not None and now - self._last_sync_check < self.sync_interval:
+            return 0
+        self._last_sync_check = now
+
+        # Read first: anything committed after this is replayed by the next sync
+        latest = db.query(func.max(ChangeLog.version)).scalar() or 0
+        if self._synced_version is not None:
+            oldest = db.query(func.min(ChangeLog.version)).scalar()
+            # A log pruned past our version can no longer be replayed; rebuild instead
+            if oldest is None or self._synced_version >= oldest - 1:
+                count = self._apply_changes(db, latest)
+                self._synced_version = latest
+                return count
+
+        items = [item for _, item in self._load(db) if item is not None]
+        self.rebuild(items)
+        # rebuild() starts from a fresh state, throttle included
+        self._synced_version = latest
+        self._last_sync_check = now
+        return len(items)
+
+    def _apply_changes(self, db: Session, latest: int) -> int:
+        if latest <= self._synced_version:
+            return 0
+        changed = (
+            db.query(ChangeLog.entity, ChangeLog.entity_id)
+            .filter(ChangeLog.version > self._synced_version, ChangeLog.version <= latest,
+                    ChangeLog.entity.in_((IDOL, GROUP)))
+            .distinct()
+            .all()
+        )
+        idol_ids = {entity_id for entity, entity_id in changed if entity == IDOL}
+        group_ids = [entity_id for entity, entity_id in changed if entity == GROUP]
+        if group_ids:
+            # A renamed group changes the indexed text of all its members
+            idol_ids.update(idol_id for idol_id, in db.query(Idol.id).filter(Idol.group_id.in_(group_ids)))
+
+        found = set()
+        ids = sorted(idol_ids)
+        for start in range(0, len(ids), 500):
+            for idol_id, item in self._load(db, ids[start:start + 500]):
+                found.add(idol_id)
+                if item is None:
+                    self.remove(idol_id)
+                else:
+                    self.upsert(*item)
+        # Hard-deleted idols are only known from the log
+        for idol_id in idol_ids - found:
+            self.remove(idol_id)
+        return len(idol_ids)
+
+    def _load(self, db: Session, idol_ids: Optional[List[int]] = None) -> List[Tuple[int, Optional[Tuple]]]:
+        """(idol id, index item) for ``idol_ids`` that exist (every idol when None); the item is None when inactive"""
+        query = (
+            db.query(Idol.id, Idol.name, Idol.stage_name, Idol.real_name, Idol.company, Idol.is_active,
+                     Group.id, Group.name)
+            .select_from(Idol)
+            .outerjoin(Group, Group.id == Idol.group_id)
+            .order_by(Idol.id)
+        )
+        if idol_ids is not None:
+            query = query.filter(Idol.id.in_(idol_ids))
+
+        items = []
+        for idol_id, name, stage_name, real_name, company, is_active, group_id, group_name in query:
+            if not is_active:
+                items.append((idol_id, None))
+                continue
+            items.append((idol_id, (
+                idol_id,
+                {
+                    'id': idol_id,
+                    'name': name,
+                    'stage_name': stage_name,
+                    'real_name': real_name,
+                    'company': company,
+                    'group': {'id': group_id, 'name': group_name} if group_id else None
+                },
+                {
+                    'name': name,
+                    'stage_name': stage_name,
+                    'real_name': real_name,
+                    'group': group_name,
+                    'company': company
+                }
+            )))
+        return items
+
+    # Queries -----------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Best matching idols for ``query``, by prefix and fuzzy trigram match"""
+        key = normalize(query)
+        if not key or limit <= 0:
+            return []
+
+        with self._lock:
+            best: Dict[int, Tuple[float, str]] = {}
+
+            # Prefix matches score above 1.0 and rank first: a typed prefix is a strong signal
+            prefix_scores: Dict[int, float] = {}
+            position = bisect_left(self._sorted_keys, key)
+            while position < len(self._sorted_keys) and len(prefix_scores) < limit * 4:
+                entry_key = self._sorted_keys[position]
+                if not entry_key.startswith(key):
+                    break
+                prefix_scores[self._key_ids[entry_key]] = 1.0 + len(key) / len(entry_key)
+                position += 1
+            cutoff = self._expand(prefix_scores, best, limit)
+
+            # Fuzzy similarity is at most 1.0, so it cannot displace a full page of prefix hits
+            if len(best) < limit or cutoff < 1.0:
+                self._expand(self._fuzzy_scores(key, prefix_scores), best, limit)
+
+            ranked = heapq.nsmallest(limit, best.items(), key=lambda item: (-item[1][0], item[0]))
+            return [
+                dict(self._documents[idol_id], score=round(score, 4), matched_field=field)
+                for idol_id, (score, field) in ranked
+            ]
+
+    def _fuzzy_scores(self, key: str, exclude: Dict[int, float]) -> Dict[int, float]:
+        """Jaccard similarity of trigram sets for keys above ``min_similarity``"""
+        # Jaccard >= t needs at least ceil(t * |Q|) shared trigrams, so any
+        # match must appear in one of the |Q| - that + 1 rarest postings
+        query_grams = sorted(trigrams(key), key=lambda gram: len(self._postings.get(gram, ())))
+        postings = [self._postings.get(gram, set()) for gram in query_grams]
+        min_shared = max(1, math.ceil(self.min_similarity * len(query_grams)))
+        candidates = set()
+        for posting in postings[:len(postings) - min_shared + 1]:
+            candidates.update(posting)
+
+        scores = {}
+        for key_id in candidates:
+            if key_id in exclude:
+                continue
+            shared = sum(1 for posting in postings if key_id in posting)
+            similarity = shared / (len(query_grams) + self._keys[key_id][1] - shared)
+            if similarity >= self.min_similarity:
+                scores[key_id] = similarity
+        return scores
+
+    def _expand(self, key_scores: Dict[int, float], best: Dict[int, Tuple[float, str]], limit: int) -> float:
+        """Fold key scores into per-idol best scores, best keys first, stopping once
+        no remaining key can beat the current top ``limit``; returns that cutoff"""
+        bounds = sorted(
+            ((key_score * self._key_weights[key_id], key_score, key_id) for key_id, key_score in key_scores.items()),
+            reverse=True
+        )
+        cutoff = self._cutoff(best, limit)
+        for bound, key_score, key_id in bounds:
+            if len(best) >= limit and bound < cutoff:
+                break
+            for idol_id, field in self._key_idols[key_id].items():
+                score = key_score * FIELD_WEIGHTS[field]
+                if idol_id not in best or score > best[idol_id][0]:
+                    best[idol_id] = (score, field)
+            cutoff = self._cutoff(best, limit)
+        return cutoff
+
+    def _cutoff(self, best: Dict[int, Tuple[float, str]], limit: int) -> float:
+        if len(best) < limit:
+            return 0.0
+        return heapq.nlargest(limit, (score for score, _ in best.values()))[-1]
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one execution.
+
+    The first caller for a key starts ``func`` in the threadpool; callers
+    arriving with the same key while it runs await the same result (or
+    exception) instead of repeating the work. Nothing is kept once the call
+    finishes, so this complements caching rather than replacing it: a
+    thundering herd on a cold cache costs one computation, not one per
+    client.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            # Run as its own task, so one caller going away doesn't cancel it for the rest
+            future = asyncio.ensure_future(run_in_threadpool(func, *args, **kwargs))
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, List, Optional
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Statuses that say the upstream itself is struggling, as opposed to a bad
+# request for one idol (a 404 for an unknown artist is a healthy answer)
+THROTTLED = {429}
+FAILED = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while an upstream's circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit open, retrying in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamGuard:
+    """Circuit breaker and adaptive concurrency limit for one upstream source.
+
+    The breaker opens when at least ``error_threshold`` of the last
+    ``window`` outcomes failed, or for as long as a ``Retry-After`` header
+    asks. While open, calls fail with CircuitOpenError without touching the
+    network (callers wait instead if it reopens within ``max_wait``). After
+    the cooldown one probe call is let through; success closes the circuit,
+    failure reopens it with the cooldown doubled.
+
+    Concurrency follows AIMD: each healthy response adds ``1/limit`` to the
+    limit, so it grows by about one per round trip, and throttling, failures
+    or latency above ``latency_tolerance`` times the fastest response seen
+    halve it, at most once per round trip.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 8, min_concurrency: int = 1,
+                 window: int = 20, min_requests: int = 10, error_threshold: float = 0.5,
+                 cooldown: float = 30.0, max_cooldown: float = 600.0, max_wait: float = 5.0,
+                 latency_tolerance: float = 2.0, latency_floor: float = 0.05):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_wait = max_wait
+        self.latency_tolerance = latency_tolerance
+        self.latency_floor = latency_floor
+
+        self.state = CLOSED
+        self.limit = float(min_concurrency)
+        self.in_flight = 0
+        self.trips = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.min_latency: Optional[float] = None
+        self.smoothed_latency: Optional[float] = None
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._probing = False
+        self._last_decrease = 0.0
+        self._waiters: List[asyncio.Future] = []
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def call(self) -> "GuardedCall":
+        """Async context manager holding one concurrency slot; report responses with ``record``"""
+        return GuardedCall(self)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if self.state == OPEN:
+                retry_in = self.open_until - now
+                if retry_in > self.max_wait:
+                    raise CircuitOpenError(self.name, retry_in)
+                if retry_in > 0:
+                    await asyncio.sleep(retry_in)
+                    continue
+                self.state = HALF_OPEN
+
+            if self.state == HALF_OPEN:
+                # A single probe decides whether the upstream is back
+                if not self._probing and self.in_flight == 0:
+                    self._probing = True
+                    self.in_flight += 1
+                    return
+            elif self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self):
+        self.in_flight -= 1
+        self._probing = False
+        self._wake()
+
+    def record(self, status: Optional[int], latency: float, retry_after: Optional[str] = None):
+        """Feed one response (status None for a transport error or timeout) into the breaker and limit"""
+        failed = status is None or status in FAILED or status >= 500
+        self._outcomes.append(failed)
+        now = time.monotonic()
+
+        if not failed:
+            self.smoothed_latency = latency if self.smoothed_latency is None else 0.8 * self.smoothed_latency + 0.2 * latency
+            self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+            if self.state == HALF_OPEN:
+                self._close()
+            if latency > self.latency_tolerance * max(self.min_latency, self.latency_floor):
+                self._decrease(now)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._wake()
+            return
+
+        self._decrease(now)
+        wait = parse_retry_after(retry_after) if status in THROTTLED or status == 503 else None
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open(now, max(wait or 0.0, self.cooldown))
+        elif wait is not None:
+            self._open(now, wait)
+        elif len(self._outcomes) >= self.min_requests and self.error_rate >= self.error_threshold:
+            self._open(now, self.cooldown)
+
+    def _decrease(self, now: float):
+        if now - self._last_decrease >= (self.smoothed_latency or 0.0):
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            self._last_decrease = now
+
+    def _open(self, now: float, seconds: float):
+        if self.state != OPEN:
+            self.trips += 1
+        self.state = OPEN
+        self.open_until = max(self.open_until, now + seconds)
+        self._outcomes.clear()
+        # Waiting callers re-check and fail fast instead of queueing behind a dead upstream
+        self._wake(everyone=True)
+
+    def _close(self):
+        self.state = CLOSED
+        self.cooldown = self.base_cooldown
+        self._outcomes.clear()
+
+    def _wake(self, everyone: bool = False):
+        free = len(self._waiters) if everyone or self.state == OPEN else max(0, int(self.limit) - self.in_flight)
+        for waiter in self._waiters[:free]:
+            if not waiter.done():
+                waiter.set_result(None)
+        del self._waiters[:free]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "error_rate": self.error_rate,
+            "trips": self.trips,
+            "retry_in": max(0.0, self.open_until - time.monotonic()) if self.state == OPEN else 0.0
+        }
+
+
+class GuardedCall:
+    """One unit of work against an upstream; an exception escaping it counts as a failure"""
+
+    def __init__(self, guard: UpstreamGuard):
+        self.guard = guard
+        self._mark = 0.0
+
+    async def __aenter__(self):
+        await self.guard.acquire()
+        self._mark = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None and not isinstance(exc_val, asyncio.CancelledError):
+            self.guard.record(None, time.monotonic() - self._mark)
+        self.guard.release()
+
+    def record(self, status: int, retry_after: Optional[str] = None):
+        """Report an upstream response; latency is measured since the previous response"""
+        now = time.monotonic()
+        self.guard.record(status, now - self._mark, retry_after)
+        self._mark = now
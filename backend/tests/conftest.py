@@ -0,0 +1,121 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# database.py binds its engines on import, so point them at a scratch file before anything imports it
+_SCRATCH = tempfile.mkdtemp(prefix="kpop-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_SCRATCH, 'app.db')}"
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.pop("LEADERBOARD_SNAPSHOT_FILE", None)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture(scope="session")
+def dataset_url(tmp_path_factory) -> str:
+    """A small synthetic dataset with one published ranking snapshot"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from synthetic_data import generate_dataset
+    from services.data_collector import DataCollectorService
+
+    url = f"sqlite:///{tmp_path_factory.mktemp('dataset') / 'dataset.db'}"
+    generate_dataset(url, groups=20, idols=200, metrics=2000, trend_rows=2000, verbose=False)
+    db = sessionmaker(bind=create_engine(url))()
+    try:
+        DataCollectorService().update_rankings(db)
+    finally:
+        db.close()
+    return url
+
+
+@pytest.fixture(scope="session")
+def api():
+    """The ``main`` module, with its own database filled like ``dataset_url``"""
+    from sqlalchemy.orm import sessionmaker
+    from synthetic_data import generate_dataset
+    from database import engine
+    from services.data_collector import DataCollectorService
+
+    generate_dataset(os.environ["DATABASE_URL"], groups=20, idols=200, metrics=2000, trend_rows=2000, verbose=False)
+    import main
+
+    db = sessionmaker(bind=engine)()
+    try:
+        DataCollectorService(main.ranking_service).update_rankings(db)
+    finally:
+        db.close()
+    return main
+
+
+@pytest.fixture
+def db(dataset_url):
+    """Session on the shared dataset; rolled back so tests do not see each other's writes"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    session = sessionmaker(bind=create_engine(dataset_url))()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def empty_db(tmp_path):
+    """Session on a freshly migrated database with no rows"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from init_db import migrate_database
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    migrate_database(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def ranked_db(empty_db):
+    """Two groups of two idols and a soloist, ranked twice from chart and brand signals.
+
+    Overall ranks go from idols 5, 4, 3, 2, 1 in the first snapshot to
+    1, 4, 3, 2, 5 in the second: idol 1 rises four places, idol 5 falls four.
+    """
+    from datetime import datetime, timedelta
+    from models import Group, Idol
+    from services.data_collector import DataCollectorService
+    from services.ingestion import upsert_metrics
+
+    db = empty_db
+    db.add_all([Group(id=1, name='Alpha'), Group(id=2, name='Beta')])
+    db.add_all([
+        Idol(id=idol_id, name=f'Idol {idol_id}', group_id=group_id, is_soloist=group_id is None, is_active=True)
+        for idol_id, group_id in ((1, 1), (2, 1), (3, 2), (4, 2), (5, None))
+    ])
+    db.commit()
+
+    def observe(metric_type, values, hours_ago):
+        upsert_metrics(db, [
+            {'idol_id': idol_id, 'metric_type': metric_type, 'value': value,
+             'date': datetime.now() - timedelta(hours=hours_ago)}
+            for idol_id, value in enumerate(values, 1)
+        ], 60)
+        db.commit()
+
+    collector = DataCollectorService()
+    observe('brand_reputation_ranking', [50, 40, 30, 20, 10], 3)
+    observe('melon_chart', [10, 20, 30, 40, 50], 3)
+    assert collector.update_rankings(db)['status'] == 'success'
+    observe('melon_chart', [100, 20, 30, 40, 5], 1)
+    assert collector.update_rankings(db)['status'] == 'success'
+    return db
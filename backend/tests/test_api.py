@@ -0,0 +1,65 @@
+"""API application: lifespan and request instrumentation"""
+
+import re
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+
+def test_shutdown_stops_the_stream_and_the_parser_pool(api):
+    class Pool:
+        stopped = False
+
+        def shutdown(self):
+            self.stopped = True
+
+    pool = api.data_collector._chart_scraper = Pool()
+    try:
+        with TestClient(api.app) as client:
+            client.portal.call(api.ranking_broadcaster._ensure_started)
+            task = api.ranking_broadcaster._task
+            assert not task.done()
+        assert api.ranking_broadcaster._task is None
+        assert task.cancelled()
+        assert pool.stopped
+    finally:
+        api.data_collector._chart_scraper = None
+
+
+def _sample(metrics: str, series: str) -> float:
+    for line in metrics.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_server_timing_counts_the_queries_of_each_request(api):
+    executed = []
+
+    def count(*_):
+        executed.append(1)
+
+    route = 'method="GET",route="/api/idols/{idol_id}"'
+    event.listen(api.engine, "after_cursor_execute", count)
+    try:
+        with TestClient(api.app) as client:
+            before = client.get("/metrics").text
+            for path, status in (("/api/idols/1", 200), ("/api/idols/999999", 404)):
+                executed.clear()
+                response = client.get(path)
+                assert response.status_code == status
+                db_timing = response.headers["Server-Timing"].split(", ")[0]
+                assert re.fullmatch(r'db;dur=\d+\.\d{2};desc="(\d+) queries"', db_timing).group(1) == str(len(executed))
+                assert executed
+            after = client.get("/metrics").text
+    finally:
+        event.remove(api.engine, "after_cursor_execute", count)
+
+    for status in (200, 404):
+        series = f'http_request_duration_seconds_count{{{route},status="{status}"}}'
+        assert _sample(after, series) == _sample(before, series) + 1
+    # Raw paths are folded into their route template
+    assert "/api/idols/999999" not in after
+    queries = f"http_request_db_queries_count{{{route}}}"
+    assert _sample(after, queries) == _sample(before, queries) + 2
+    assert 'http_request_db_queries_bucket{%s,le="+Inf"}' % route in after
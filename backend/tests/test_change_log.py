@@ -0,0 +1,68 @@
+"""Change feed versions are assigned at commit, so they grow in commit order without gaps"""
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import ChangeLog, Group, Idol
+from services.change_log import IDOL, UPDATE, get_changes, prune, record_changes
+
+
+def _versions(db):
+    return [version for version, in db.query(ChangeLog.version).order_by(ChangeLog.id)]
+
+
+def test_entries_are_versioned_when_their_transaction_commits(empty_db):
+    db = empty_db
+    db.add(Group(name="NewJeans"))
+    db.flush()
+    assert _versions(db) == [None]
+    db.commit()
+    assert _versions(db) == [1]
+
+    # Pending ORM changes flushed by commit itself are versioned too
+    db.add_all([Idol(name="Minji"), Idol(name="Hanni")])
+    db.commit()
+    record_changes(db, IDOL, [1], UPDATE)
+    db.commit()
+    assert _versions(db) == [1, 2, 3, 4]
+
+
+def test_rolled_back_entries_leave_no_gap(empty_db):
+    db = empty_db
+    db.add(Idol(name="IU"))
+    db.commit()
+    db.add(Idol(name="Rolled Back"))
+    db.flush()
+    db.rollback()
+    db.add(Idol(name="SUGA"))
+    db.commit()
+    assert _versions(db) == [1, 2]
+
+    page = get_changes(db, 1)
+    assert [(change['version'], change['data']['name']) for change in page['changes']] == [(2, "SUGA")]
+    assert page['version'] == 2 and not page['reset']
+
+
+def test_entries_without_a_version_are_numbered_after_committed_ones(empty_db):
+    db = empty_db
+    db.add(Idol(name="IU"))
+    db.commit()
+    db.execute(text("INSERT INTO change_log (entity, entity_id, op, changed_at) "
+                    "VALUES ('idol', 1, 'update', CURRENT_TIMESTAMP)"))
+    record_changes(db, IDOL, [1], UPDATE)
+    db.commit()
+    assert _versions(db) == [1, 2, 3]
+    assert get_changes(db, 0)['version'] == 3
+
+
+def test_pruning_keeps_the_newest_entry_so_versions_never_restart(empty_db):
+    db = empty_db
+    db.add_all([Idol(name="IU"), Idol(name="SUGA")])
+    db.commit()
+    db.query(ChangeLog).update({ChangeLog.changed_at: datetime(2000, 1, 1)})
+    assert prune(db, retention_days=1) == 1
+    db.add(Idol(name="Karina"))
+    db.commit()
+    assert _versions(db) == [2, 3]
+    assert get_changes(db, 0)['reset']
@@ -0,0 +1,115 @@
+"""Chart page parsing against saved Melon, Genie and Bugs pages"""
+
+import asyncio
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from services.chart_scraper import CHART_LAYOUTS, ChartScraper, parse_chart, split_artists
+
+ROWS = 200
+
+# First and last entries of each saved page; hidden duplicates and rank-change badges must not leak in
+EXPECTED = {
+    'melon': (('Queencard', 'NewJeans, aespa'), ('Fever', 'Idol 1200')),
+    'genie': (('하루 Shy', 'NewJeans, aespa'), ('Boy 여름 Candy', 'Idol 1029')),
+    'bugs': (('Fever Night', 'NewJeans, aespa'), ('사랑 Boy Dive', 'Idol 1711')),
+}
+
+
+def _page(chart: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, "charts", f"{chart}.html"), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("chart", sorted(CHART_LAYOUTS))
+def test_saved_page_parses_to_a_full_ranked_chart(chart):
+    entries = parse_chart(chart, _page(chart))
+    assert [entry['rank'] for entry in entries] == list(range(1, ROWS + 1))
+    assert all(entry['song'] and entry['artist'] and entry['chart'] == chart for entry in entries)
+    first, last = EXPECTED[chart]
+    assert (entries[0]['song'], entries[0]['artist']) == first
+    assert (entries[-1]['song'], entries[-1]['artist']) == last
+    assert entries[0]['score'] == 100.0
+    assert entries[-1]['score'] == 0.5
+
+
+def test_malformed_markup_and_incomplete_rows():
+    body = (
+        b'<table><tr data-song-no="1"><td><span class="rank">1</span>'
+        b'<div class="rank01"><a>Song &amp; One<span class="checkEllipsis">dup</span></div>'
+        b'<div class="rank02"><a>IU, SUGA</a></div>'
+        b'<tr data-song-no="2"><td><span class="rank">2</span><div class="rank01">No artist</div></tr>'
+        b'</table>'
+    )
+    assert parse_chart('melon', body) == [
+        {'chart': 'melon', 'rank': 1, 'song': 'Song & One', 'artist': 'IU, SUGA', 'score': 100.0}
+    ]
+
+
+def test_split_artists():
+    assert split_artists('IU, SUGA') == ['IU', 'SUGA']
+    assert split_artists('A & B feat. C') == ['A', 'B', 'C']
+
+
+def test_pool_parses_exactly_like_inline():
+    pages = [(chart, _page(chart), 'utf-8') for chart in sorted(CHART_LAYOUTS)]
+    scraper = ChartScraper(2)
+    try:
+        results = asyncio.run(scraper.parse_many(pages))
+    finally:
+        scraper.shutdown()
+    assert results == [parse_chart(*page) for page in pages]
+
+
+def test_failing_chart_site_is_shed_by_its_circuit_breaker():
+    import aiohttp
+    from stub_upstream import Fault, StubUpstream
+    from services.upstream_guard import CircuitOpenError, UpstreamGuard
+
+    guards = {}
+
+    def guard(chart):
+        return guards.setdefault(chart, UpstreamGuard(chart))
+
+    async def run():
+        stub = await StubUpstream().start()
+        stub.inject("melon", Fault(status=503, retry_after="60"))
+        scraper = ChartScraper(1)
+        urls = {chart: stub.chart_url(chart) for chart in sorted(CHART_LAYOUTS)}
+        try:
+            async with aiohttp.ClientSession() as session:
+                first = await scraper.scrape(session, urls, guard)
+                second = await scraper.scrape(session, urls, guard)
+        finally:
+            scraper.shutdown()
+            await stub.stop()
+        return stub.requests_by_api, first, second
+
+    requests, first, second = asyncio.run(run())
+    assert isinstance(first['melon'], aiohttp.ClientResponseError) and first['melon'].status == 503
+    assert isinstance(second['melon'], CircuitOpenError)
+    assert requests['melon'] == 1
+    assert guards['melon'].state == 'open'
+    for chart in ('genie', 'bugs'):
+        assert len(second[chart]) == ROWS
+        assert guards[chart].state == 'closed'
+
+
+def test_cancelled_chart_fetch_cancels_the_collector(empty_db):
+    from models import DataSource
+    from services.data_collector import DataCollectorService
+    from services.refresh_telemetry import SourceTelemetry
+
+    class CancelledScraper:
+        async def scrape(self, session, urls, guard=None):
+            return {'melon': [], 'genie': asyncio.CancelledError(), 'bugs': []}
+
+    collector = DataCollectorService()
+    collector._chart_scraper = CancelledScraper()
+    source = DataSource(name='Chart Scraper', type='scraping')
+    stats = SourceTelemetry(source.name, source.type)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(collector._collect_scraped_charts(empty_db, source, stats))
+    assert stats.error_count == 0
@@ -0,0 +1,72 @@
+"""Collectors stream the roster in batches, so their memory does not grow with it"""
+
+import asyncio
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import DataSource, Idol
+from services.data_collector import DataCollectorService
+from services.refresh_telemetry import SourceTelemetry
+from synthetic_data import generate_dataset
+
+SOURCES = ("Chart Scraper", "Brand Reputation Scraper", "Trend Analysis", "Instagram Graph API")
+BATCH_SIZE = 50
+# A roster RATIO times larger may peak at most MAX_GROWTH times higher
+RATIO = 10
+MAX_GROWTH = 2.0
+
+
+def _roster(tmp_path, idols: int):
+    url = f"sqlite:///{tmp_path / f'roster-{idols}.db'}"
+    generate_dataset(url, groups=max(1, idols // 10), idols=idols, metrics=0, trend_rows=0, verbose=False)
+    return sessionmaker(bind=create_engine(url))()
+
+
+def _collector() -> DataCollectorService:
+    collector = DataCollectorService()
+    collector.idol_batch_size = BATCH_SIZE
+    collector.rate_limit_interval = 0
+    return collector
+
+
+def _peak_bytes(db) -> int:
+    collector = _collector()
+    sources = db.query(DataSource).filter(DataSource.name.in_(SOURCES)).all()
+    tracemalloc.start()
+    try:
+        for source in sources:
+            stats = SourceTelemetry(source.name, source.type)
+            if source.type == "api":
+                asyncio.run(collector._collect_from_api(db, source, stats))
+            else:
+                asyncio.run(collector._collect_from_scraping(db, source, stats))
+            assert not stats.errors_by_type, f"{source.name}: {stats.last_error}"
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_idol_batches_cover_the_active_roster_once(tmp_path):
+    db = _roster(tmp_path, 230)
+    try:
+        db.query(Idol).filter(Idol.id % 7 == 0).update({Idol.is_active: False}, synchronize_session=False)
+        batches = list(_collector()._iter_idol_batches(db))
+        ids = [row[0] for batch in batches for row in batch]
+        active = [idol_id for idol_id, in db.query(Idol.id).filter(Idol.is_active == True).order_by(Idol.id)]
+        assert ids == active
+        assert max(len(batch) for batch in batches) <= BATCH_SIZE
+    finally:
+        db.close()
+
+
+def test_peak_memory_stays_flat_as_the_roster_grows(tmp_path):
+    peaks = []
+    for idols in (150, 150 * RATIO):
+        db = _roster(tmp_path, idols)
+        try:
+            peaks.append(_peak_bytes(db))
+        finally:
+            db.close()
+    assert peaks[1] <= MAX_GROWTH * peaks[0], f"peak grew {peaks[1] / peaks[0]:.2f}x for a {RATIO}x roster"
@@ -0,0 +1,31 @@
+"""Precomputed idol documents stay in step with trend data ingested between ranking runs"""
+
+import json
+from datetime import datetime
+
+from services.idol_documents import DETAIL, TREND_WINDOW_DAYS, TRENDS
+from services.ingestion import upsert_trend_data
+from services.ranking_service import RankingService
+
+
+def test_ingested_trend_data_reaches_the_stored_documents(db):
+    service = RankingService()
+    idol_id = 7
+    before = json.loads(service.get_idol_document(db, TRENDS, idol_id) or 'null')
+
+    upsert_trend_data(db, [{'idol_id': idol_id, 'category': 'music', 'score': 77.5, 'rank': 3,
+                            'source': 'test', 'date': datetime.now()}])
+
+    trends = json.loads(service.get_idol_document(db, TRENDS, idol_id))
+    assert len(trends['trends']) == len(before['trends'] if before else []) + 1
+    # The default window serves the same points as any other window computed live
+    assert trends['trends'] == service.get_idol_trends(db, idol_id, TREND_WINDOW_DAYS)['trends']
+    detail = json.loads(service.get_idol_document(db, DETAIL, idol_id))
+    assert detail['trend_summary']['music']['latest_score'] == 77.5
+
+
+def test_other_idols_keep_their_documents(db):
+    service = RankingService()
+    untouched = service.get_idol_document(db, DETAIL, 8)
+    upsert_trend_data(db, [{'idol_id': 7, 'category': 'social', 'score': 12.0, 'rank': 9, 'date': datetime.now()}])
+    assert service.get_idol_document(db, DETAIL, 8) == untouched
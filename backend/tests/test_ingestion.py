@@ -0,0 +1,75 @@
+"""Ingestion upserts: repeating a refresh updates rows instead of duplicating them"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+from models import Metric, TrendData
+from services import ingestion
+from services.ingestion import upsert_metrics, upsert_trend_data
+from services.partitions import scan
+
+NOW = datetime(2026, 3, 10, 14, 5)
+
+
+def _metrics(value: float, source=None) -> list:
+    return [
+        {'idol_id': idol_id, 'metric_type': metric_type, 'value': value + idol_id, 'source': source, 'date': NOW}
+        for idol_id in (1, 2, 3) for metric_type in ('spotify_followers', 'youtube_views')
+    ]
+
+
+def _rows(db, model, columns) -> list:
+    table = scan(db, model, columns=columns)
+    return sorted(db.query(*[table.c[column] for column in columns]).all())
+
+
+def test_repeated_metric_batch_is_written_once(empty_db):
+    db = empty_db
+    assert upsert_metrics(db, _metrics(1.0, 'Spotify'), 60) == 6
+    assert upsert_metrics(db, _metrics(5.0, 'Spotify'), 60) == 6
+    db.commit()
+
+    rows = _rows(db, Metric, ('idol_id', 'metric_type', 'source', 'value'))
+    assert len(rows) == 6
+    assert {value - idol_id for idol_id, _, _, value in rows} == {5.0}
+
+
+def test_missing_source_defaults_to_empty_and_still_deduplicates(empty_db):
+    db = empty_db
+    upsert_metrics(db, _metrics(1.0, None), 60)
+    upsert_metrics(db, [dict(row, source='') for row in _metrics(2.0)], 60)
+    upsert_trend_data(db, [{'idol_id': 1, 'category': 'music', 'score': 10.0, 'rank': 4, 'date': NOW}] * 2, 60)
+    upsert_trend_data(db, [{'idol_id': 1, 'category': 'music', 'score': 20.0, 'rank': 2, 'date': NOW}], 60)
+    db.commit()
+
+    assert {source for _, source in _rows(db, Metric, ('idol_id', 'source'))} == {''}
+    assert len(_rows(db, Metric, ('idol_id', 'metric_type'))) == 6
+    assert _rows(db, TrendData, ('idol_id', 'source', 'score', 'rank')) == [(1, '', 20.0, 2)]
+
+
+def test_same_bucket_from_another_source_is_kept_apart(empty_db):
+    db = empty_db
+    upsert_metrics(db, _metrics(1.0, 'Spotify'), 60)
+    upsert_metrics(db, _metrics(1.0, 'Chart Scraper'), 60)
+    db.commit()
+    assert db.query(func.count()).select_from(scan(db, Metric, columns=('idol_id',))).scalar() == 12
+
+
+@pytest.mark.parametrize("model, upsert, row", [
+    (Metric, upsert_metrics, {'idol_id': 1, 'metric_type': 'spotify_followers', 'value': 1.0, 'date': NOW}),
+    (TrendData, upsert_trend_data, {'idol_id': 1, 'category': 'music', 'score': 1.0, 'rank': 1, 'date': NOW}),
+])
+def test_merge_fallback_for_dialects_without_on_conflict(empty_db, monkeypatch, model, upsert, row):
+    db = empty_db
+    monkeypatch.setattr(ingestion, '_UPSERT_DIALECTS', {})
+    updates = ('value',) if model is Metric else ('score',)
+    for value in (1.0, 2.0, 3.0):
+        upsert(db, [dict(row, **{updates[0]: value})], 60)
+    db.commit()
+
+    stored = db.query(model).all()
+    assert len(stored) == 1
+    assert getattr(stored[0], updates[0]) == 3.0
+    assert stored[0].source == '' and stored[0].bucket == datetime(2026, 3, 10, 14)
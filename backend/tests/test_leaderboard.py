@@ -0,0 +1,68 @@
+"""In-memory leaderboard store: category lookups and snapshot publishing"""
+
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services import leaderboard
+from services.leaderboard import IdolTable, Leaderboard, read_snapshot_version, write_snapshot
+from services.ranking_service import CATEGORY_COLUMNS, RankingService
+
+
+def test_unknown_category_is_not_cached(db):
+    service = RankingService()
+    store = service.leaderboards
+
+    for name in ("bogus", "overall", "music; drop", "x" * 200):
+        service.get_current_rankings(db, category=name)
+
+    assert set(store._boards) == {"overall"}
+    assert set(store._checked) == {"overall"}
+    assert store.get(db, "bogus", lambda: service._resolve_version(db, "bogus", None)) is None
+    assert len(store.get(db, "overall", lambda: service._resolve_version(db, "overall", None)))
+
+
+@pytest.mark.parametrize("path", [
+    "/api/rankings?category=bogus",
+    "/api/rankings/movers?category=bogus",
+    "/api/groups/rankings?category=bogus",
+    "/api/rankings/stream?category=bogus",
+    "/api/trends?ids=1&category=bogus",
+])
+def test_api_rejects_unknown_category(path):
+    from main import app
+
+    response = TestClient(app).get(path)
+    assert response.status_code == 400
+    assert all(category in response.json()["detail"] for category in CATEGORY_COLUMNS)
+
+
+def _boards(db, version: int, published_as: int):
+    idols = IdolTable.load(db, version)
+    idols.version = published_as
+    return {category: Leaderboard.load(db, category, version, idols) for category in ("overall", "music")}
+
+
+def test_older_snapshot_never_replaces_a_newer_one(db, tmp_path, monkeypatch):
+    version = RankingService().get_latest_version(db)
+    older, newer = _boards(db, version, version), _boards(db, version, version + 1)
+    path = str(tmp_path / "leaderboard.snapshot")
+    replace = os.replace
+    racing = []
+
+    def replace_after_newer(source, target):
+        # The older publisher has checked the file; let the newer one try to publish in between
+        if not racing:
+            racing.append(threading.Thread(target=write_snapshot, args=(path, newer)))
+            racing[0].start()
+            racing[0].join(timeout=0.5)
+        replace(source, target)
+
+    monkeypatch.setattr(leaderboard.os, "replace", replace_after_newer)
+    write_snapshot(path, older)
+    racing[0].join()
+
+    assert read_snapshot_version(path) == version + 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
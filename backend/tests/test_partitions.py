@@ -0,0 +1,92 @@
+"""Monthly partitions: routing, range scans, retention and migration of unpartitioned rows"""
+
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+
+from models import Metric, TrendData
+from services.ingestion import upsert_metrics
+from services.partitions import (
+    RETENTION_CONFIG_KEY, drop_expired, list_partitions, migrate_partitions, partition_table, scan
+)
+from services.platform_config import set_config_value
+
+JANUARY = datetime(2026, 1, 1)
+FEBRUARY = datetime(2026, 2, 1)
+
+
+def _metric(idol_id: int, date: datetime, value: float = 1.0) -> dict:
+    return {'idol_id': idol_id, 'metric_type': 'spotify_followers', 'value': value, 'source': 'test', 'date': date}
+
+
+def _partition_rows(db, model, month: datetime) -> list:
+    table = partition_table(model.__table__, month)
+    return db.execute(select(table.c.idol_id, table.c.value, table.c.date)).all()
+
+
+def test_upserts_are_routed_to_their_month(empty_db):
+    db = empty_db
+    upsert_metrics(db, [_metric(1, datetime(2026, 1, 31, 23, 30)), _metric(1, datetime(2026, 2, 1, 0, 30))], 60)
+    # A repeat observation in the same bucket replaces the original in its partition
+    upsert_metrics(db, [_metric(1, datetime(2026, 1, 31, 23, 50), value=2.0)], 60)
+    db.commit()
+
+    assert set(list_partitions(db.connection(), Metric.__table__)) == {JANUARY, FEBRUARY}
+    assert _partition_rows(db, Metric, JANUARY) == [(1, 2.0, datetime(2026, 1, 31, 23, 50))]
+    assert _partition_rows(db, Metric, FEBRUARY) == [(1, 1.0, datetime(2026, 2, 1, 0, 30))]
+    assert db.query(func.count()).select_from(Metric.__table__).scalar() == 0
+
+
+def test_scan_spans_a_month_boundary(empty_db):
+    db = empty_db
+    upsert_metrics(db, [_metric(idol_id, date) for idol_id, date in (
+        (1, datetime(2026, 1, 15)), (2, datetime(2026, 1, 31, 23, 30)),
+        (3, datetime(2026, 2, 1, 0, 30)), (4, datetime(2026, 2, 20))
+    )], 60)
+    db.commit()
+
+    def idols(start, end=None):
+        table = scan(db, Metric, start, end)
+        assert 'id' not in table.c
+        return sorted(idol_id for idol_id, in db.query(table.c.idol_id))
+
+    assert idols(datetime(2026, 1, 31), datetime(2026, 2, 1, 12)) == [2, 3]
+    assert idols(FEBRUARY) == [3, 4]
+    assert idols(None) == [1, 2, 3, 4]
+    assert idols(datetime(2026, 3, 1)) == []
+
+
+def test_retention_drops_whole_expired_months(empty_db):
+    db = empty_db
+    upsert_metrics(db, [_metric(1, datetime(2026, 1, 10)), _metric(2, datetime(2026, 2, 10))], 60)
+    db.commit()
+
+    assert drop_expired(db, datetime(2026, 3, 15)) == []
+    set_config_value(db, RETENTION_CONFIG_KEY, 1)
+    assert drop_expired(db, datetime(2026, 3, 15)) == ['metrics_2026_01']
+    db.commit()
+
+    assert set(list_partitions(db.connection(), Metric.__table__)) == {FEBRUARY}
+    table = scan(db, Metric)
+    assert [idol_id for idol_id, in db.query(table.c.idol_id)] == [2]
+
+
+def test_migration_moves_unpartitioned_rows_into_their_months(empty_db):
+    db = empty_db
+    conn = db.connection()
+    # Written before partitioning: straight into the base tables, some without a bucket
+    conn.execute(insert(TrendData.__table__), [
+        {'idol_id': 1, 'category': 'music', 'score': 10.0, 'source': '', 'date': datetime(2026, 1, 5), 'bucket': None},
+        {'idol_id': 2, 'category': 'music', 'score': 20.0, 'source': '', 'date': datetime(2026, 2, 5, 10, 15),
+         'bucket': datetime(2026, 2, 5, 10)},
+    ])
+
+    changes = migrate_partitions(conn)
+    db.commit()
+
+    assert changes == ['trend_data -> trend_data_2026_01', 'trend_data -> trend_data_2026_02']
+    assert db.query(func.count()).select_from(TrendData.__table__).scalar() == 0
+    for month, idol_id in ((JANUARY, 1), (FEBRUARY, 2)):
+        table = partition_table(TrendData.__table__, month)
+        assert [row for row, in db.execute(select(table.c.idol_id))] == [idol_id]
+    assert migrate_partitions(db.connection()) == []
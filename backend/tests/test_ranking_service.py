@@ -0,0 +1,117 @@
+"""Ranking service reads: movers, point-in-time snapshots, group boards and trend series"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models import RankingSnapshot
+from services.data_collector import DataCollectorService
+from services.ingestion import upsert_trend_data
+from services.platform_config import set_config_value
+from services.ranking_service import RankingService
+from services.scoring_engine import GROUP_AGGREGATION_CONFIG_KEY
+
+
+def test_movers_report_rank_deltas_between_snapshots(ranked_db):
+    movers = RankingService().get_movers(ranked_db, 'overall')
+
+    assert movers['version'] == 2
+    assert [(m['idol']['id'], m['rank'], m['previous_rank'], m['rank_change']) for m in movers['risers']] == [(1, 1, 5, 4)]
+    assert [(m['idol']['id'], m['rank'], m['previous_rank'], m['rank_change']) for m in movers['fallers']] == [(5, 5, 1, -4)]
+    # Brand signals did not change between the runs
+    assert RankingService().get_movers(ranked_db, 'brand')['risers'] == []
+
+
+def test_movers_are_none_before_the_first_snapshot(empty_db):
+    assert RankingService().get_movers(empty_db) is None
+
+
+def test_top_k_orders_by_value_then_idol_id():
+    top_k = RankingService()._top_k
+    idol_ids = np.array([7, 3, 9, 1, 5, 2])
+    values = np.array([2.0, 5.0, 5.0, 1.0, 5.0, -3.0])
+    everyone = values > -10
+
+    assert top_k(idol_ids, values, 10, everyone) == [3, 5, 9, 7, 1, 2]
+    assert top_k(idol_ids, values, 2, everyone) == [3, 5]
+    assert top_k(idol_ids, values, 4, values > 0) == [3, 5, 9, 7]
+    assert top_k(idol_ids, values, 0, everyone) == []
+    assert top_k(idol_ids, values, 3, values > 10) == []
+
+
+def test_top_k_keeps_the_lowest_ids_of_a_tie_cut_by_the_limit():
+    top_k = RankingService()._top_k
+    idol_ids = np.arange(100, 0, -1)
+    values = np.ones(100)
+
+    assert top_k(idol_ids, values, 3, values > 0) == [1, 2, 3]
+
+
+def test_as_of_serves_the_snapshot_computed_at_or_before_it(ranked_db):
+    service = RankingService()
+    first, second = ranked_db.query(RankingSnapshot).filter(
+        RankingSnapshot.category == 'overall'
+    ).order_by(RankingSnapshot.computed_at).all()
+    between = first.computed_at + (second.computed_at - first.computed_at) / 2
+
+    def leaders(as_of):
+        return [row['idol']['id'] for row in service.get_current_rankings(ranked_db, 'overall', as_of=as_of)]
+
+    assert leaders(None) == [1, 4, 3, 2, 5]
+    assert leaders(second.computed_at) == [1, 4, 3, 2, 5]
+    assert leaders(between) == [5, 4, 3, 2, 1]
+    assert leaders(first.computed_at) == [5, 4, 3, 2, 1]
+    assert leaders(first.computed_at - timedelta(seconds=1)) == []
+    assert service.resolve_snapshot(ranked_db, 'overall', between).version == first.version
+    assert service.get_group_rankings(ranked_db, as_of=first.computed_at - timedelta(seconds=1)) == []
+
+
+@pytest.mark.parametrize('aggregation, scores', [
+    ('mean', [('Alpha', 78.0), ('Beta', 62.0)]),
+    ('max', [('Alpha', 100.0), ('Beta', 64.0)]),
+    ('weighted', [('Alpha', 13136 / 156), ('Beta', 7696 / 124)]),
+])
+def test_group_boards_follow_the_configured_aggregation(ranked_db, aggregation, scores):
+    set_config_value(ranked_db, GROUP_AGGREGATION_CONFIG_KEY, aggregation)
+    assert DataCollectorService().update_rankings(ranked_db)['status'] == 'success'
+
+    board = RankingService().get_group_rankings(ranked_db, 'overall')
+
+    assert [(row['group']['name'], row['score']) for row in board] == [(name, pytest.approx(score)) for name, score in scores]
+    assert [(row['rank'], row['member_count'], row['aggregation']) for row in board] == [
+        (1, 2, aggregation), (2, 2, aggregation)
+    ]
+
+
+def test_trend_series_align_on_one_axis_with_gaps(ranked_db):
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def day(days_ago, hour=0):
+        return midnight - timedelta(days=days_ago) + timedelta(hours=hour)
+
+    upsert_trend_data(ranked_db, [
+        {'idol_id': 3, 'category': 'music', 'score': 10.0, 'rank': 7, 'date': day(4, 1)},
+        {'idol_id': 3, 'category': 'music', 'score': 20.0, 'rank': 5, 'date': day(4, 5)},
+        {'idol_id': 3, 'category': 'music', 'score': 40.0, 'rank': 2, 'date': day(1, 3)},
+        {'idol_id': 1, 'category': 'social', 'score': 50.0, 'rank': 1, 'date': day(0)},
+    ], 60)
+    ranked_db.commit()
+    service = RankingService()
+
+    # Unknown ids are dropped, repeats collapse and idol 2 has no data at all
+    trends = service.get_trend_series(ranked_db, [3, 2, 99, 1, 3], days=5)
+
+    assert trends['timestamps'] == [day(days_ago).isoformat() for days_ago in range(5, -1, -1)]
+    assert [idol['id'] for idol in trends['idols']] == [3, 2, 1]
+    assert trends['series'] == [
+        {'idol_id': 3, 'category': 'music', 'score': [None, 15.0, None, None, 40.0, None],
+         'rank': [None, 5, None, None, 2, None]},
+        {'idol_id': 1, 'category': 'social', 'score': [None, None, None, None, None, 50.0],
+         'rank': [None, None, None, None, None, 1]},
+    ]
+    assert [s['idol_id'] for s in service.get_trend_series(ranked_db, [1, 3], days=5, category='music')['series']] == [3]
+
+    empty = service.get_trend_series(ranked_db, [2], days=5)
+    assert empty['series'] == [] and len(empty['timestamps']) == 6
+    assert service.get_trend_series(ranked_db, [99], days=5) is None
@@ -0,0 +1,36 @@
+"""Ranking stream fan-out: one poll loop per worker however many subscribers connect"""
+
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from services.ranking_stream import RankingBroadcaster
+
+
+def test_concurrent_subscribers_share_one_poll_loop(dataset_url):
+    broadcaster = RankingBroadcaster(sessionmaker(bind=create_engine(dataset_url)), poll_interval=60)
+    loops = []
+    run = broadcaster._run
+
+    async def counting_run():
+        loops.append(1)
+        await run()
+
+    broadcaster._run = counting_run
+
+    async def main():
+        streams = [broadcaster.stream("overall") for _ in range(50)]
+        hellos = await asyncio.gather(*(stream.__anext__() for stream in streams))
+        await asyncio.sleep(0)
+        try:
+            return hellos, broadcaster.subscriber_count
+        finally:
+            for stream in streams:
+                await stream.aclose()
+            await broadcaster.stop()
+
+    hellos, subscribers = asyncio.run(main())
+    assert len(loops) == 1
+    assert subscribers == 50
+    assert len(set(hellos)) == 1 and hellos[0].startswith(b"event: hello\n")
@@ -0,0 +1,55 @@
+"""Read routing: replica reads, except right after this process wrote"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import database
+
+
+def _read_bind():
+    session = next(database.get_read_db())
+    try:
+        return session.get_bind()
+    finally:
+        session.close()
+
+
+def test_reads_use_the_primary_without_a_replica(monkeypatch):
+    monkeypatch.setattr(database, "_last_write", None)
+
+    assert database.read_engine is database.engine
+    assert not database.replica_is_fresh()
+    assert _read_bind() is database.engine
+
+
+def test_a_read_right_after_a_write_goes_to_the_primary(monkeypatch, tmp_path):
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setattr(database, "read_engine", replica)
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(bind=replica))
+    monkeypatch.setattr(database, "_last_write", None)
+
+    assert database.replica_is_fresh()
+    assert _read_bind() is replica
+
+    with database.engine.begin() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert not database.replica_is_fresh()
+    assert _read_bind() is database.engine
+
+    # Once the write has had time to replicate, reads move back to the replica
+    monkeypatch.setattr(database, "READ_AFTER_WRITE_SECONDS", 0)
+    assert database.replica_is_fresh()
+    assert _read_bind() is replica
+
+
+def test_replica_commits_do_not_pin_reads_to_the_primary(monkeypatch, tmp_path):
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setattr(database, "read_engine", replica)
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(bind=replica))
+    monkeypatch.setattr(database, "_last_write", None)
+
+    with replica.begin() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert _read_bind() is replica
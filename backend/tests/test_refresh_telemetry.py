@@ -0,0 +1,44 @@
+"""Source telemetry records source failures but lets cancellation and exits through"""
+
+import asyncio
+
+import pytest
+
+from services.refresh_telemetry import SourceTelemetry
+
+
+def test_source_errors_are_recorded_and_contained():
+    with SourceTelemetry("Spotify Web API", "api") as stats:
+        raise ConnectionError("upstream reset")
+    assert stats.failed
+    assert stats.errors_by_type == {"ConnectionError": 1}
+
+
+@pytest.mark.parametrize("exc", [asyncio.CancelledError, KeyboardInterrupt, SystemExit])
+def test_cancellation_and_exits_propagate_without_a_failure(exc):
+    stats = SourceTelemetry("Spotify Web API", "api")
+    with pytest.raises(exc):
+        with stats:
+            raise exc()
+    assert not stats.failed
+    assert stats.error_count == 0
+
+
+def test_cancelled_refresh_stops():
+    stats = SourceTelemetry("Chart Scraper", "scraping")
+    reached = []
+
+    async def collect():
+        with stats:
+            await asyncio.sleep(10)
+        reached.append("after source")
+
+    async def main():
+        task = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert reached == [] and not stats.failed
@@ -0,0 +1,82 @@
+"""Rolling trend windows kept incrementally agree with a recomputation from trend_data"""
+
+from datetime import datetime, timedelta
+
+from models import TrendWindowStat
+from services import rolling_windows
+from services.ingestion import upsert_trend_data
+
+START = datetime(2026, 3, 1, 12, 0)
+
+
+def _ingest(db, date: datetime, scores: dict):
+    upsert_trend_data(db, [
+        {'idol_id': idol_id, 'category': category, 'score': score, 'rank': 1, 'source': 'test', 'date': date}
+        for (idol_id, category), score in scores.items()
+    ], 60)
+
+
+def _window(db, days: int) -> dict:
+    return {
+        (idol_id, category): (score_sum, count)
+        for idol_id, category, score_sum, count in db.query(
+            TrendWindowStat.idol_id, TrendWindowStat.category, TrendWindowStat.score_sum, TrendWindowStat.score_count
+        ).filter(TrendWindowStat.window_days == days, TrendWindowStat.score_count > 0)
+    }
+
+
+def _assert_consistent(db, now: datetime):
+    report = rolling_windows.verify(db, now)
+    assert report['consistent'], report['mismatches']
+
+
+def test_reingesting_a_bucket_replaces_its_observation(empty_db):
+    db = empty_db
+    rolling_windows.rebuild(db, START)
+    _ingest(db, START, {(1, 'music'): 40.0, (2, 'music'): 10.0})
+    # Same bucket, later in the hour: the new score replaces the old one
+    _ingest(db, START + timedelta(minutes=20), {(1, 'music'): 70.0})
+    _ingest(db, START + timedelta(minutes=30), {(1, 'music'): 70.0})
+
+    assert _window(db, 7) == {(1, 'music'): (70.0, 1), (2, 'music'): (10.0, 1)}
+    _assert_consistent(db, START)
+
+
+def test_days_retire_from_each_window_as_it_advances(empty_db):
+    db = empty_db
+    rolling_windows.rebuild(db, START)
+    for day in range(12):
+        now = START + timedelta(days=day)
+        _ingest(db, now, {(1, 'music'): float(day), (2, 'social'): 50.0 + day})
+        if day % 3 == 0:
+            _ingest(db, now + timedelta(minutes=5), {(1, 'music'): day + 0.5})
+        _assert_consistent(db, now)
+
+    # The 7-day window counts the last seven whole days plus today
+    assert _window(db, 7)[(1, 'music')][1] == 8
+    assert _window(db, 30)[(1, 'music')][1] == 12
+
+
+def test_late_observation_for_a_day_outside_the_short_window(empty_db):
+    db = empty_db
+    now = START + timedelta(days=20)
+    rolling_windows.rebuild(db, now)
+    _ingest(db, now, {(1, 'music'): 30.0})
+    _ingest(db, now - timedelta(days=10), {(1, 'music'): 60.0})
+
+    assert _window(db, 7) == {(1, 'music'): (30.0, 1)}
+    assert _window(db, 30) == {(1, 'music'): (90.0, 2)}
+    _assert_consistent(db, now)
+
+
+def test_incremental_windows_match_a_rebuild(empty_db):
+    db = empty_db
+    rolling_windows.rebuild(db, START)
+    for day in range(9):
+        now = START + timedelta(days=day)
+        _ingest(db, now, {(idol_id, 'music'): float(idol_id * day) for idol_id in range(1, 6)})
+        rolling_windows.advance(db, now)
+
+    incremental = {days: _window(db, days) for days in rolling_windows.WINDOWS}
+    rolling_windows.rebuild(db, now)
+    assert {days: _window(db, days) for days in rolling_windows.WINDOWS} == incremental
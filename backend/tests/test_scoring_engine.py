@@ -0,0 +1,121 @@
+"""Composite scoring: normalization, missing signals and weight redistribution"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models import Idol
+from services.ingestion import upsert_metrics
+from services.scoring_engine import DEFAULT_WEIGHTS, ScoreMatrix, ScoringEngine, aggregate_groups
+
+NOW = datetime(2026, 3, 10, 12)
+IDOL_IDS = np.array([1, 2, 3, 4], dtype=np.int64)
+
+
+def _score(signals: dict, normalization: str = 'percentile', weights: dict = DEFAULT_WEIGHTS):
+    frame = pd.DataFrame(signals, index=IDOL_IDS, dtype=np.float64)
+    return ScoringEngine().score(IDOL_IDS, frame, weights, normalization, NOW)
+
+
+def test_percentile_ranks_each_signal_among_idols_that_have_it():
+    matrix = _score({'spotify_followers': [10, 20, np.nan, 40], 'melon_chart': [np.nan, 50, 60, np.nan]})
+
+    # Missing values neither count as zero nor shift the others' percentiles
+    expected = [100 / 3, (200 / 3 + 50) / 2, 100, 100]
+    np.testing.assert_allclose(matrix['music'], expected)
+    np.testing.assert_allclose(matrix['social'], 0)
+    # Only music has data, so it carries the whole weight
+    np.testing.assert_allclose(matrix['total'], expected)
+
+
+def test_idol_without_any_signal_scores_zero():
+    matrix = _score({'spotify_followers': [10, np.nan, 30, 40], 'instagram_followers': [5, np.nan, 1, 3]})
+    assert matrix['music'][1] == 0 and matrix['social'][1] == 0 and matrix['total'][1] == 0
+
+
+def test_weights_are_redistributed_over_sub_scores_with_data():
+    matrix = _score({'melon_chart': [1, 2, 3, 4], 'brand_reputation_ranking': [4, 3, 2, 1]})
+    music, brand = matrix['music'], matrix['brand']
+    np.testing.assert_allclose(matrix['total'], 0.6 * music + 0.4 * brand)
+
+
+def test_zscore_scales_counts_by_log_and_maps_three_sigma_to_the_range():
+    matrix = _score({'melon_chart': [1, 2, 3, np.nan]}, normalization='zscore')
+    z = np.sqrt(1.5)
+    np.testing.assert_allclose(matrix['music'], [(3 - z) / 6 * 100, 50, (3 + z) / 6 * 100, 0])
+
+    # Followers a thousand times apart sit as far apart as 1, 2 and 3 once logged
+    followers = _score({'spotify_followers': [10 ** 3 - 1, 10 ** 6 - 1, 10 ** 9 - 1, np.nan]}, normalization='zscore')
+    np.testing.assert_allclose(followers['music'][:3], matrix['music'][:3])
+
+
+def test_zscore_of_a_constant_signal_is_the_midpoint():
+    matrix = _score({'google_trends': [7, 7, 7, np.nan]}, normalization='zscore')
+    np.testing.assert_allclose(matrix['search'], [50, 50, 50, 0])
+
+
+def test_unknown_normalization_is_rejected(empty_db):
+    with pytest.raises(ValueError):
+        ScoringEngine(normalization='minmax').compute(empty_db)
+
+
+def test_compute_uses_the_latest_value_in_the_window(empty_db):
+    db = empty_db
+    db.add_all([Idol(id=idol_id, name=f'Idol {idol_id}', is_active=True) for idol_id in (1, 2, 3)])
+    db.add(Idol(id=4, name='Retired', is_active=False))
+    upsert_metrics(db, [
+        {'idol_id': idol_id, 'metric_type': 'melon_chart', 'value': value, 'date': NOW - timedelta(days=days_ago)}
+        for idol_id, value, days_ago in (
+            (1, 90, 3), (1, 10, 1), (2, 50, 2),
+            # Outside the 30-day window, and an inactive idol
+            (3, 99, 45), (4, 99, 1)
+        )
+    ], 60)
+    db.commit()
+
+    matrix = ScoringEngine(window_days=30).compute(db, NOW)
+    assert matrix.idol_ids.tolist() == [1, 2, 3]
+    np.testing.assert_allclose(matrix['total'], [50, 100, 0])
+    assert matrix.order('total').tolist() == [1, 0, 2]
+
+
+def _members_matrix():
+    # Two members in group 1, one in group 2 and a soloist
+    return ScoreMatrix(
+        np.array([1, 2, 3, 4], dtype=np.int64),
+        {'total': np.array([10.0, 30.0, 50.0, 90.0]), 'music': np.array([0.0, 0.0, 40.0, 90.0])},
+        NOW,
+        np.array([1, 1, 2, 0], dtype=np.int64),
+    )
+
+
+@pytest.mark.parametrize('aggregation, total, music', [
+    ('mean', [20.0, 50.0], [0.0, 40.0]),
+    ('max', [30.0, 50.0], [0.0, 40.0]),
+    ('weighted', [25.0, 50.0], [0.0, 40.0]),
+])
+def test_group_aggregations_leave_soloists_out(aggregation, total, music):
+    groups = aggregate_groups(_members_matrix(), aggregation)
+
+    assert groups.group_ids.tolist() == [1, 2]
+    assert groups.member_counts.tolist() == [2, 1]
+    assert groups['total'].tolist() == pytest.approx(total)
+    assert groups['music'].tolist() == pytest.approx(music)
+    assert groups.aggregation == aggregation
+
+
+def test_group_order_breaks_ties_by_group_id():
+    matrix = ScoreMatrix(
+        np.array([1, 2, 3], dtype=np.int64), {'total': np.array([40.0, 40.0, 70.0])}, NOW,
+        np.array([5, 3, 4], dtype=np.int64),
+    )
+    groups = aggregate_groups(matrix, 'max')
+
+    assert groups.group_ids[groups.order('total')].tolist() == [4, 3, 5]
+
+
+def test_unknown_group_aggregation_is_rejected():
+    with pytest.raises(ValueError):
+        aggregate_groups(_members_matrix(), 'median')
@@ -0,0 +1,69 @@
+"""Incremental search index sync replays the change log, deletes included"""
+
+from models import ChangeLog, Group, Idol
+from services.search_index import SearchIndex
+
+
+def _names(index, query):
+    return [result['name'] for result in index.search(query)]
+
+
+def _seed(db):
+    group = Group(name="BTS")
+    db.add(group)
+    db.flush()
+    db.add_all([Idol(name="IU"), Idol(name="SUGA", group_id=group.id), Idol(name="Jimin", group_id=group.id)])
+    db.commit()
+    index = SearchIndex()
+    assert index.sync(db) == 3
+    return index
+
+
+def test_hard_deletes_are_removed(empty_db):
+    index = _seed(empty_db)
+    empty_db.delete(empty_db.query(Idol).filter_by(name="IU").one())
+    empty_db.commit()
+    assert index.sync(empty_db, force=True) == 1
+    assert "IU" not in _names(index, "IU")
+    assert len(index) == 2
+
+
+def test_edits_in_the_same_second_as_the_last_sync_are_indexed(empty_db):
+    index = _seed(empty_db)
+    empty_db.query(Idol).filter_by(name="SUGA").one().name = "Agust D"
+    empty_db.commit()
+    index.sync(empty_db, force=True)
+    assert _names(index, "Agust D")[0] == "Agust D"
+    assert "SUGA" not in _names(index, "SUGA")
+
+
+def test_group_renames_and_deactivation(empty_db):
+    index = _seed(empty_db)
+    empty_db.query(Group).one().name = "Bangtan"
+    empty_db.query(Idol).filter_by(name="Jimin").one().is_active = False
+    empty_db.commit()
+    assert index.sync(empty_db, force=True) == 2
+    assert [result['group']['name'] for result in index.search("Bangtan")] == ["Bangtan"]
+    assert "Jimin" not in _names(index, "Jimin")
+
+
+def test_rebuilds_when_the_log_was_pruned_past_its_version(empty_db):
+    index = _seed(empty_db)
+    empty_db.delete(empty_db.query(Idol).filter_by(name="IU").one())
+    empty_db.add(Idol(name="Taeyeon"))
+    empty_db.commit()
+    # Retention keeps only the newest entry, which is past the index's version
+    newest = max(version for version, in empty_db.query(ChangeLog.version))
+    empty_db.query(ChangeLog).filter(ChangeLog.version < newest).delete()
+    empty_db.add(Idol(name="Karina"))
+    empty_db.commit()
+    index.sync(empty_db, force=True)
+    assert sorted(document['name'] for document in index._documents.values()) == ["Jimin", "Karina", "SUGA", "Taeyeon"]
+
+
+def test_checks_are_throttled_unless_forced(empty_db):
+    index = _seed(empty_db)
+    empty_db.add(Idol(name="Karina"))
+    empty_db.commit()
+    assert index.sync(empty_db) == 0
+    assert index.sync(empty_db, force=True) == 1
@@ -0,0 +1,43 @@
+"""The orjson fast path must produce exactly what the response models would"""
+
+import json
+from datetime import datetime
+
+from schemas import GroupRankingResponse, IdolResponse, RankingResponse
+from serializers import dumps
+from services.ranking_service import RankingService
+from services.scoring_engine import CATEGORY_COLUMNS
+
+# Far enough ahead that ``as_of`` resolves the latest snapshot through the database
+FUTURE = datetime(2999, 1, 1)
+
+
+def _assert_matches_schema(payload, model):
+    assert payload, "nothing to compare"
+    encoded = json.loads(dumps(payload))
+    expected = [json.loads(model.model_validate(item).model_dump_json()) for item in payload]
+    assert encoded == expected
+
+
+def test_rankings_match_schema_on_every_path(db):
+    service = RankingService()
+    for category in CATEGORY_COLUMNS:
+        # In-memory leaderboard and database query
+        _assert_matches_schema(service.get_current_rankings(db, category=category, limit=50), RankingResponse)
+        _assert_matches_schema(service.get_current_rankings(db, category=category, limit=50, as_of=FUTURE),
+                               RankingResponse)
+
+
+def test_leaderboard_and_database_paths_agree(db):
+    service = RankingService()
+    for category in CATEGORY_COLUMNS:
+        assert dumps(service.get_current_rankings(db, category=category, limit=0)) == \
+            dumps(service.get_current_rankings(db, category=category, limit=0, as_of=FUTURE))
+
+
+def test_idols_match_schema(db):
+    _assert_matches_schema(RankingService().get_idols(db)[:50], IdolResponse)
+
+
+def test_group_rankings_match_schema(db):
+    _assert_matches_schema(RankingService().get_group_rankings(db, limit=50), GroupRankingResponse)
@@ -0,0 +1,81 @@
+"""SingleFlight: concurrent identical calls share one execution"""
+
+import asyncio
+import threading
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def compute(value):
+        runs.append(value)
+        release.wait(5)
+        return value * 2
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.do('key', compute, 21)) for _ in range(5)]
+        other = asyncio.ensure_future(flight.do('other', compute, 1))
+        await asyncio.sleep(0.05)
+        assert flight.in_flight == 2
+        release.set()
+        return await asyncio.gather(*callers), await other
+
+    results, other = asyncio.run(main())
+
+    assert results == [42] * 5
+    assert other == 2
+    assert sorted(runs) == [1, 21]
+    assert (flight.calls, flight.shared, flight.in_flight) == (2, 4, 0)
+
+
+def test_an_exception_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError('upstream down')
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.do('key', fail)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        outcomes = await asyncio.gather(*callers, return_exceptions=True)
+        # The failure is not cached: the next call runs again
+        retried = await flight.do('key', lambda: 'ok')
+        return outcomes, retried
+
+    outcomes, retried = asyncio.run(main())
+
+    assert [type(outcome) for outcome in outcomes] == [RuntimeError] * 3
+    assert all(str(outcome) == 'upstream down' for outcome in outcomes)
+    assert retried == 'ok'
+    assert flight.calls == 2
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        return 'done'
+
+    async def main():
+        first = asyncio.ensure_future(flight.do('key', compute))
+        second = asyncio.ensure_future(flight.do('key', compute))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 'done'
@@ -0,0 +1,28 @@
+"""Importing the API stays cheap: heavy dependencies load lazily and the database is untouched"""
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+# Only the code paths that need these import them
+LAZY_MODULES = ("pandas", "numpy", "aiohttp", "requests")
+
+
+def _import_main(tmp_path) -> list:
+    script = f"import json, sys, main; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}")
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_heavy_dependencies_are_not_imported_on_startup(tmp_path):
+    assert _import_main(tmp_path) == []
+
+
+def test_importing_does_not_create_the_database(tmp_path):
+    _import_main(tmp_path)
+    assert not (tmp_path / "startup.db").exists()
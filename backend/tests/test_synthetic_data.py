@@ -0,0 +1,29 @@
+"""Synthetic dataset: observations carry the bucket and source ingestion would give them"""
+
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import Metric, TrendData
+from services import rolling_windows
+from services.ingestion import DEFAULT_BUCKET_MINUTES, METRIC_KEY, TREND_DATA_KEY, bucket_start
+from services.partitions import scan
+from synthetic_data import SOURCE
+
+
+def test_observations_are_bucketed_like_ingestion(db):
+    for model, key in ((Metric, METRIC_KEY), (TrendData, TREND_DATA_KEY)):
+        table = scan(db, model, columns=key + ('date',))
+        rows = db.query(*[table.c[column] for column in key + ('date',)]).all()
+        assert rows
+        assert {row.source for row in rows} == {SOURCE}
+        assert all(row.bucket == bucket_start(row.date, DEFAULT_BUCKET_MINUTES) for row in rows)
+        assert len({tuple(row[:len(key)]) for row in rows}) == len(rows)
+
+
+def test_rolling_windows_match_a_recomputation(db):
+    now = datetime.now()
+    rolling_windows.rebuild(db, now)
+    report = rolling_windows.verify(db, now)
+    assert report['consistent'], report['mismatches']
+    assert db.query(func.count()).select_from(scan(db, TrendData, columns=('idol_id',))).scalar() == 2000
@@ -0,0 +1,89 @@
+"""Ranking runs: per-category leaderboards and distinct snapshot versions"""
+
+import shutil
+import threading
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from models import Ranking, RankingSnapshot
+from services.data_collector import DataCollectorService
+from services.ranking_service import CATEGORY_COLUMNS
+
+
+def test_overlapping_runs_get_distinct_versions(dataset_url, tmp_path):
+    path = tmp_path / "overlap.db"
+    shutil.copy(dataset_url[len("sqlite:///"):], path)
+    session_factory = sessionmaker(bind=create_engine(f"sqlite:///{path}"))
+    db = session_factory()
+    before = db.query(func.max(Ranking.version)).scalar()
+    db.close()
+
+    # Both runs finish scoring before either picks its version
+    scored = threading.Barrier(2)
+    results = []
+
+    def run():
+        collector = DataCollectorService()
+        compute = collector.scoring_engine.compute
+
+        def compute_then_wait(session):
+            matrix = compute(session)
+            scored.wait()
+            return matrix
+
+        collector.scoring_engine.compute = compute_then_wait
+        session = session_factory()
+        try:
+            results.append(collector.update_rankings(session))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [result['status'] for result in results] == ['success', 'success']
+    assert sorted(result['version'] for result in results) == [before + 1, before + 2]
+    db = session_factory()
+    try:
+        for version in (before + 1, before + 2):
+            rows = db.query(func.count(Ranking.id)).filter(Ranking.version == version).scalar()
+            assert rows == results[0]['rankings_updated']
+            snapshots = db.query(RankingSnapshot.category).filter(RankingSnapshot.version == version).all()
+            assert sorted(category for category, in snapshots) == sorted(CATEGORY_COLUMNS)
+    finally:
+        db.close()
+
+
+def test_one_run_ranks_every_category_from_shared_sub_scores(ranked_db):
+    db = ranked_db
+    version = db.query(func.max(Ranking.version)).scalar()
+    rows = db.query(Ranking).filter(Ranking.version == version).order_by(Ranking.category, Ranking.rank).all()
+    boards = {}
+    for row in rows:
+        boards.setdefault(row.category, []).append(row)
+
+    assert set(boards) == set(CATEGORY_COLUMNS)
+    for category, column in CATEGORY_COLUMNS.items():
+        board = boards[category]
+        assert [row.rank for row in board] == [1, 2, 3, 4, 5]
+        assert [row.score for row in board] == [getattr(row, f'{column}_score') for row in board]
+        # Highest score first; equal scores fall back to idol id
+        assert [(-row.score, row.idol_id) for row in board] == sorted((-row.score, row.idol_id) for row in board)
+
+    assert [row.idol_id for row in boards['overall']] == [1, 4, 3, 2, 5]
+    assert [row.idol_id for row in boards['brand']] == [1, 2, 3, 4, 5]
+    # Nobody has social data: everyone ties at zero
+    assert [row.idol_id for row in boards['social']] == [1, 2, 3, 4, 5]
+    assert {row.score for row in boards['social']} == {0.0}
+
+    # Every category row of an idol carries the same sub-scores
+    for idol_id in range(1, 6):
+        sub_scores = {
+            tuple(getattr(row, f'{name}_score') for name in ('total', 'music', 'social', 'brand', 'search', 'award'))
+            for row in rows if row.idol_id == idol_id
+        }
+        assert len(sub_scores) == 1
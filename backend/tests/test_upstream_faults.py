@@ -0,0 +1,82 @@
+"""Collectors against the fault-injecting stub upstream: failing sources are shed, healthy ones unaffected"""
+
+import asyncio
+import socket
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from stub_upstream import Fault, StubUpstream
+from synthetic_data import generate_dataset
+
+IDOLS = 60
+# A shed upstream stops receiving requests after a handful, not one per idol
+MAX_SHED_REQUESTS = 15
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    port = _free_port()
+    monkeypatch.setenv("YOUTUBE_API_URL", f"http://127.0.0.1:{port}/youtube/v3")
+    monkeypatch.setenv("SPOTIFY_API_URL", f"http://127.0.0.1:{port}/spotify/v1")
+    monkeypatch.setenv("UPSTREAM_RATE_LIMIT_SECONDS", "0")
+    url = f"sqlite:///{tmp_path / 'faults.db'}"
+    generate_dataset(url, groups=6, idols=IDOLS, metrics=0, trend_rows=0,
+                     upstream_url=f"http://127.0.0.1:{port}", verbose=False)
+    return port, sessionmaker(bind=create_engine(url))
+
+
+def _collect(upstream, fault) -> dict:
+    from models import DataSource
+    from services.data_collector import DataCollectorService
+    from services.refresh_telemetry import RefreshTelemetry
+
+    port, session_factory = upstream
+
+    async def run():
+        stub = await StubUpstream(latency=0.002).start(port=port)
+        stub.inject("spotify", fault)
+        collector = DataCollectorService()
+        telemetry = RefreshTelemetry()
+        report = {}
+        db = session_factory()
+        try:
+            async with collector:
+                for source in db.query(DataSource).filter(DataSource.type == "api").order_by(DataSource.id):
+                    name = source.name.lower()
+                    api = "youtube" if "youtube" in name else "spotify" if "spotify" in name else None
+                    if api is None:
+                        continue
+                    with telemetry.source(source) as stats:
+                        stats.record_rows(await collector._collect_from_api(db, source, stats))
+                    report[api] = {"requests": stub.requests_by_api[api], "rows": stats.rows_written,
+                                   "state": collector.upstream_guard(source.name).state}
+        finally:
+            db.close()
+            await stub.stop()
+        return report
+
+    return asyncio.run(run())
+
+
+def test_healthy_upstreams_are_fully_collected(upstream):
+    report = _collect(upstream, None)
+    assert report["youtube"]["rows"] == 2 * IDOLS
+    assert report["spotify"]["rows"] == IDOLS
+    assert report["spotify"]["state"] == "closed"
+
+
+@pytest.mark.parametrize("fault", [Fault(status=503), Fault(status=429, retry_after="60")],
+                         ids=["down", "throttled"])
+def test_failing_upstream_is_shed_without_hurting_the_healthy_one(upstream, fault):
+    report = _collect(upstream, fault)
+    assert report["spotify"]["state"] == "open"
+    assert report["spotify"]["requests"] <= MAX_SHED_REQUESTS
+    assert report["youtube"]["rows"] == 2 * IDOLS
@@ -0,0 +1,110 @@
+"""Circuit breaker state transitions and AIMD concurrency of UpstreamGuard"""
+
+import asyncio
+
+import pytest
+
+from services.upstream_guard import (
+    CLOSED, HALF_OPEN, OPEN, CircuitOpenError, UpstreamGuard, parse_retry_after
+)
+
+
+def _guard(**kwargs) -> UpstreamGuard:
+    options = dict(window=4, min_requests=4, cooldown=30.0, max_concurrency=8)
+    options.update(kwargs)
+    return UpstreamGuard("test", **options)
+
+
+def _acquire(guard: UpstreamGuard, timeout: float = 0.5):
+    async def run():
+        await asyncio.wait_for(guard.acquire(), timeout)
+    asyncio.run(run())
+
+
+def test_opens_once_the_error_rate_crosses_the_threshold():
+    guard = _guard()
+    for _ in range(3):
+        guard.record(503, 0.01)
+        assert guard.state == CLOSED
+    guard.record(None, 0.01)
+    assert guard.state == OPEN
+    assert guard.trips == 1
+    with pytest.raises(CircuitOpenError):
+        _acquire(guard)
+
+
+def test_client_errors_do_not_count_as_failures():
+    guard = _guard()
+    for _ in range(10):
+        guard.record(404, 0.01)
+    assert guard.state == CLOSED
+    assert guard.error_rate == 0.0
+
+
+def test_retry_after_opens_immediately_for_that_long():
+    guard = _guard()
+    guard.record(429, 0.01, retry_after="60")
+    assert guard.state == OPEN
+    assert 59 < guard.to_dict()["retry_in"] <= 60
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_half_open_lets_one_probe_through_and_success_closes():
+    guard = _guard(cooldown=0.01)
+    guard.record(429, 0.01, retry_after="0.01")
+    _acquire(guard)
+    assert guard.state == HALF_OPEN
+    # Only the probe is in flight; anyone else waits for its outcome
+    with pytest.raises(asyncio.TimeoutError):
+        _acquire(guard, timeout=0.05)
+    guard.record(200, 0.01)
+    guard.release()
+    assert guard.state == CLOSED
+    assert guard.cooldown == 0.01
+
+
+def test_failed_probe_reopens_with_the_cooldown_doubled():
+    guard = _guard(cooldown=0.01)
+    guard.record(503, 0.01, retry_after="0.01")
+    _acquire(guard)
+    guard.record(503, 0.01)
+    guard.release()
+    assert guard.state == OPEN
+    assert guard.cooldown == 0.02
+    assert guard.trips == 2
+
+
+def test_limit_grows_additively_and_halves_on_throttling():
+    guard = _guard()
+    assert guard.limit == 1.0
+    for _ in range(200):
+        guard.record(200, 0.01)
+    assert guard.limit == 8.0
+    guard.record(429, 0.01)
+    assert guard.limit == 4.0
+
+
+def test_slow_responses_shrink_the_limit():
+    guard = _guard(latency_floor=0.01)
+    for _ in range(50):
+        guard.record(200, 0.01)
+    before = guard.limit
+    guard.record(200, 0.5)
+    assert guard.limit == before / 2
+    assert guard.state == CLOSED
+
+
+def test_exceptions_count_as_failures_but_cancellation_does_not():
+    guard = _guard(min_requests=1, window=1)
+
+    async def fail(exc):
+        async with guard.call():
+            raise exc
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(fail(asyncio.CancelledError()))
+    assert guard.state == CLOSED and guard.in_flight == 0
+    with pytest.raises(ConnectionError):
+        asyncio.run(fail(ConnectionError()))
+    assert guard.state == OPEN and guard.in_flight == 0